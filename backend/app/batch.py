@@ -0,0 +1,93 @@
+"""Replay a JSONL file of ChatRequests through the chain, writing NDJSON results.
+
+Usage::
+
+    python -m app.batch questions.jsonl results.ndjson --concurrency 16
+
+Re-running with the same output file resumes: items that already succeeded
+are skipped and new results are appended.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from app.config import async_openai_client, ld_client
+from app.chain.batch import BatchError, load_completed, parse_batch, run_batch
+from app.chain.orchestrator import close_stores, judge_queue, shutdown_stages, summary_queue
+
+
+async def _shutdown() -> None:
+    """The server lifespan's teardown: drain background work, then close stores and clients."""
+    await judge_queue.close()
+    await summary_queue.close()
+    shutdown_stages()
+    await close_stores()
+    if async_openai_client.initialized:
+        await async_openai_client.close()
+    if ld_client.initialized:
+        ld_client.close()
+
+
+async def _run(items, output: Path, concurrency: int) -> None:
+    try:
+        await _run_items(items, output, concurrency)
+    finally:
+        await _shutdown()
+
+
+async def _run_items(items, output: Path, concurrency: int) -> None:
+    start = time.perf_counter()
+    latencies = []
+    errors = 0
+    passed = 0
+    with output.open("a") as out:
+        async for result in run_batch(items, concurrency):
+            out.write(result.model_dump_json() + "\n")
+            out.flush()
+            if result.error is not None:
+                errors += 1
+            else:
+                latencies.append(result.result_ms)
+                passed += result.response.quality.passed
+            done = len(latencies) + errors
+            if done % 50 == 0:
+                print(f"{done}/{len(items)} done", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"Ran {len(items)} items in {elapsed:.1f}s ({len(items) / elapsed:.1f}/s), {errors} errors")
+    if latencies:
+        print(
+            f"result latency p50 {statistics.median(latencies):.0f} ms, "
+            f"max {max(latencies):.0f} ms; quality passed {passed}/{len(latencies)}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="JSONL file of ChatRequests (optional \"id\" per line)")
+    parser.add_argument("output", type=Path, help="NDJSON results file; appended to and used to resume")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max requests in flight")
+    args = parser.parse_args()
+
+    try:
+        items = parse_batch(args.input.read_text().splitlines())
+    except BatchError as exc:
+        parser.error(f"{args.input}: {exc}")
+
+    completed = load_completed(args.output)
+    remaining = [item for item in items if item.id not in completed]
+    if len(remaining) < len(items):
+        print(f"Resuming: {len(items) - len(remaining)} of {len(items)} items already completed")
+    if not remaining:
+        return
+    asyncio.run(_run(remaining, args.output, max(1, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Admission control for chain requests and sized concurrency stages for steps."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.chain.metrics import admission_active, admission_queued, admission_rejected, admission_wait
+
+
+class Rejected(Exception):
+    """A request refused by admission control; maps to an HTTP error with Retry-After."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Ticket:
+    """An admitted request's slot. Release exactly once; releasing again is a no-op.
+
+    Also released on garbage collection, in case a streaming response is
+    dropped before its body iterator ever starts.
+    """
+
+    __slots__ = ("_controller", "admitted_at", "_released")
+
+    def __init__(self, controller: AdmissionController):
+        self._controller = controller
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self.admitted_at)
+
+    def __del__(self):
+        self.release()
+
+
+class AdmissionController:
+    """Caps concurrent chains, with a bounded priority queue in front.
+
+    Higher priority waiters are admitted first (FIFO within a priority); when
+    the queue is full a new request displaces the lowest-priority waiter if it
+    outranks it, otherwise it is rejected immediately with 429. Waiters that
+    are not admitted within queue_timeout get 503. Only used from the event loop.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Heap of (-priority, arrival, future)
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        # Smoothed time a request holds its slot, for Retry-After estimates
+        self._hold_seconds = 1.0
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._hold_seconds * backlog / self.max_concurrent))
+
+    def _reject(self, status_code: int, reason: str) -> Rejected:
+        self.rejected += 1
+        admission_rejected.inc(1, str(status_code))
+        return Rejected(status_code, self._retry_after(), reason)
+
+    def _remove(self, entry: tuple) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        admission_queued.set(len(self._waiters))
+
+    def _admit(self) -> Ticket:
+        self.admitted += 1
+        admission_active.set(self.active)
+        return Ticket(self)
+
+    async def acquire(self, priority: int = 0) -> Ticket:
+        """Wait for a slot; raises Rejected when the queue is full or the wait times out."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            admission_wait.observe(0.0)
+            return self._admit()
+
+        if len(self._waiters) >= self.max_queue:
+            lowest = max(self._waiters, default=None)
+            if lowest is None or lowest[0] <= -priority:
+                raise self._reject(429, "Server is at capacity; try again shortly")
+            self._remove(lowest)
+            lowest[2].set_exception(self._reject(429, "Displaced by a higher-priority request"))
+
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (-priority, next(self._arrivals), future)
+        heapq.heappush(self._waiters, entry)
+        admission_queued.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except TimeoutError:
+            self._remove(entry)
+            raise self._reject(503, "Timed out waiting for capacity") from None
+        except asyncio.CancelledError:
+            self._remove(entry)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the client went away
+                self._release(0.0)
+            raise
+        admission_wait.observe(time.monotonic() - start)
+        return self._admit()
+
+    def _release(self, held: float) -> None:
+        self._hold_seconds += 0.1 * (held - self._hold_seconds)
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter; active is unchanged
+                future.set_result(None)
+                admission_queued.set(len(self._waiters))
+                return
+        self.active -= 1
+        admission_active.set(self.active)
+        admission_queued.set(0)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class Stage:
+    """A concurrency limit for a class of chain steps.
+
+    Async steps hold the semaphore while calling upstream; thread-mode steps run
+    on the stage's own executor, so slow stages can't exhaust the threads
+    that fast ones need.
+    """
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"chain-{name}")
@@ -0,0 +1,80 @@
+"""Bounded background worker queue for work kept off the response path."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundQueue:
+    """A fixed pool of asyncio workers draining a bounded job queue.
+
+    Jobs are zero-argument coroutine factories. When the queue is full, new
+    jobs are dropped rather than queued so overload never grows memory or
+    latency. Workers start lazily on the first submit, inside the running loop.
+    """
+
+    def __init__(self, name: str, maxsize: int, workers: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.workers = workers
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    def submit(self, job: Callable[[], Awaitable]) -> asyncio.Future | None:
+        """Enqueue job; return a future for its result, or None if dropped."""
+        if self._queue is None:
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("%s queue full (%d); dropping job", self.name, self.maxsize)
+            return None
+        self.submitted += 1
+        return future
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self) -> None:
+        while True:
+            job, future = await self._queue.get()
+            try:
+                result = await job()
+            except Exception as exc:
+                self.failed += 1
+                logger.exception("%s job failed", self.name)
+                if not future.done():
+                    future.set_exception(exc)
+                    # Nobody may be awaiting this; mark the exception retrieved.
+                    future.exception()
+            else:
+                self.completed += 1
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def close(self) -> None:
+        """Cancel the workers; queued jobs that have not started are discarded."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
@@ -0,0 +1,156 @@
+"""Run many chat requests through the chain with bounded concurrency."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from app.models import BatchItem, BatchResult, ChatRequest
+from app.chain.admission import Ticket
+from app.chain.coalesce import SingleFlight
+from app.chain.events import QualityEvent, ResultEvent
+from app.chain.orchestrator import chain_events, retrieval_scope
+
+
+class BatchError(ValueError):
+    """A malformed batch file."""
+
+
+# Admits one item's chain, e.g. through the server's admission controller
+Admit = Callable[[ChatRequest], Awaitable[Ticket]]
+
+
+def parse_batch(lines: Iterable[str]) -> list[BatchItem]:
+    """Parse JSONL ChatRequests, assigning line-number ids where missing."""
+    items = []
+    seen = set()
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = BatchItem.model_validate_json(line)
+        except ValidationError as exc:
+            raise BatchError(f"line {number}: {exc.errors()[0]['msg']}") from exc
+        item.id = item.id or str(number)
+        if item.id in seen:
+            raise BatchError(f"line {number}: duplicate id {item.id!r}")
+        seen.add(item.id)
+        items.append(item)
+    return items
+
+
+def load_completed(path: Path) -> dict[str, str]:
+    """Map id -> NDJSON line for items that already succeeded in a results file.
+
+    Lines for the same id supersede earlier ones, so a retried item's success
+    replaces its earlier error. A truncated last line (from a crash) is ignored.
+    """
+    completed: dict[str, str] = {}
+    if not path.exists():
+        return completed
+    with path.open() as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("error") is None:
+                completed[result["id"]] = line if line.endswith("\n") else line + "\n"
+            else:
+                completed.pop(result["id"], None)
+    return completed
+
+
+async def _run_item(item: BatchItem, run_id: str, admit: Admit | None = None) -> BatchResult:
+    request = ChatRequest(
+        message=item.message,
+        session_id=item.session_id or f"batch-{run_id}-{item.id}",
+        conversation_history=item.conversation_history,
+    )
+    start = time.perf_counter()
+    result = BatchResult(id=item.id)
+    ticket = None
+    try:
+        if admit is not None:
+            ticket = await admit(request)
+        # Consume the whole stream so deferred quality scores are included. Items
+        # without a session_id are one-off: nothing is stored for their fresh sessions.
+        async for event in chain_events(request, persist=bool(item.session_id)):
+            if isinstance(event, ResultEvent):
+                result.response = event.response
+                result.result_ms = round((time.perf_counter() - start) * 1000, 1)
+                # Wait for a deferred quality score outside admission
+                if ticket is not None:
+                    ticket.release()
+            elif isinstance(event, QualityEvent) and result.response is not None:
+                result.response.quality = event.quality
+    except Exception as exc:
+        result.error = f"{type(exc).__name__}: {exc}"
+    finally:
+        if ticket is not None:
+            ticket.release()
+    result.elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def run_batch(
+    items: list[BatchItem], concurrency: int, admit: Admit | None = None
+) -> AsyncIterator[BatchResult]:
+    """Yield one result per item in completion order, running at most concurrency at once.
+
+    Retrieval results are shared across the whole batch, so items whose
+    rewritten queries match search only once. With admit, each item also
+    holds an admission ticket while it runs; a rejected item is reported as
+    an error result.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    flights = SingleFlight("batch-retrieval", retain=True)
+    pending = iter(items)
+    results: asyncio.Queue[BatchResult] = asyncio.Queue()
+
+    async def worker() -> None:
+        retrieval_scope.set(flights)
+        for item in pending:
+            await results.put(await _run_item(item, run_id, admit))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def stream_batch(
+    items: list[BatchItem], concurrency: int, checkpoint: Path | None = None, admit: Admit | None = None
+) -> AsyncIterator[str]:
+    """NDJSON lines for a batch, resuming from and appending to checkpoint if given.
+
+    Items already completed in the checkpoint are replayed first without
+    re-running them.
+    """
+    completed = load_completed(checkpoint) if checkpoint is not None else {}
+    ids = {item.id for item in items}
+    for item_id, line in completed.items():
+        if item_id in ids:
+            yield line
+    remaining = [item for item in items if item.id not in completed]
+
+    out = checkpoint.open("a") if checkpoint is not None else None
+    try:
+        async for result in run_batch(remaining, concurrency, admit):
+            line = result.model_dump_json() + "\n"
+            if out is not None:
+                out.write(line)
+                out.flush()
+            yield line
+    finally:
+        if out is not None:
+            out.close()
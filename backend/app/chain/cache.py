@@ -0,0 +1,279 @@
+"""In-process TTL/LRU cache and a SQLite key/value tier.
+
+Both back the response caches and the session/tracker stores in
+:mod:`app.chain.state`; the stores use them with sliding expiry.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "nbytes")
+
+    def __init__(self, value: Any, expires_at: float, nbytes: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.nbytes = nbytes
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    With sliding=True every read refreshes an entry's expiry. max_bytes (0 for
+    none) bounds the total of sizeof(value) over all entries; the entry just
+    written is never evicted, even if it alone exceeds the budget. Safe to
+    share between the event loop and executor threads.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        max_bytes: int = 0,
+        sliding: bool = False,
+        sizeof: Callable[[Any], int] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sliding = sliding
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, key: str) -> _Entry:
+        entry = self._data.pop(key)
+        self.nbytes -= entry.nbytes
+        return entry
+
+    def _live(self, key: str, now: float) -> _Entry | None:
+        entry = self._data.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def _insert(self, key: str, value: Any, expires_at: float, now: float) -> None:
+        if key in self._data:
+            self._remove(key)
+        nbytes = self.sizeof(value) if self.sizeof is not None else 0
+        self._data[key] = _Entry(value, expires_at, nbytes)
+        self.nbytes += nbytes
+        # Drop expired entries from the LRU end, then enforce the budgets there
+        while self._data:
+            oldest = next(iter(self._data.values()))
+            if oldest.expires_at > now:
+                break
+            self._remove(next(iter(self._data)))
+            self.expirations += 1
+        while len(self._data) > 1 and (
+            len(self._data) > self.max_entries or (self.max_bytes and self.nbytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self.sliding:
+                entry.expires_at = now + self.ttl
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: str, value: Any, ttl: float | None = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._insert(key, value, now + (self.ttl if ttl is None else ttl), now)
+
+    def update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        """Atomically replace key's value (None if absent) with fn(value); returns the new value."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            value = fn(None if entry is None else entry.value)
+            self._insert(key, value, now + self.ttl, now)
+            return value
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None:
+                return default
+            return self._remove(key).value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SqliteCache:
+    """Persistent JSON key/value table with per-entry expiry, surviving restarts.
+
+    WAL mode lets worker processes on one host share the file. With
+    sliding=True every read refreshes an entry's expiry; pop is a single
+    DELETE ... RETURNING, so exactly one worker gets a popped value. Expired
+    entries are purged, and the oldest beyond max_entries (0 for no limit)
+    evicted, every purge_every writes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        ttl: float,
+        max_entries: int = 0,
+        sliding: bool = False,
+        purge_every: int = 256,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sliding = sliding
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._table = table
+        self._purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+
+    def _result(self, row: tuple | None, default: Any) -> Any:
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def lookup(self, key: str) -> tuple[Any, float] | None:
+        """(value, seconds until it expires) for a live entry, else None."""
+        now = time.time()
+        with self._lock:
+            if self.sliding:
+                row = self._conn.execute(
+                    f"UPDATE {self._table} SET expires_at = ? WHERE key = ? AND expires_at > ? "
+                    "RETURNING value, expires_at",
+                    (now + self.ttl, key, now),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at FROM {self._table} WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1] - now
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.lookup(key)
+        return default if entry is None else entry[0]
+
+    def _write(self, key: str, value: Any) -> None:
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl),
+        )
+        self._writes += 1
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._write(key, value)
+            if self._writes % self._purge_every == 0:
+                self._purge()
+
+    def update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        """Atomically replace key's value (None if absent) with fn(value), across processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT value FROM {self._table} WHERE key = ? AND expires_at > ?", (key, time.time())
+                ).fetchone()
+                value = fn(None if row is None else json.loads(row[0]))
+                self._write(key, value)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            if self._writes % self._purge_every == 0:
+                self._purge()
+        return value
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                f"DELETE FROM {self._table} WHERE key = ? AND expires_at > ? RETURNING value", (key, time.time())
+            ).fetchone()
+        return self._result(row, default)
+
+    def _purge(self) -> None:
+        self.expirations += self._conn.execute(
+            f"DELETE FROM {self._table} WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+        if self.max_entries:
+            self.evictions += self._conn.execute(
+                f"DELETE FROM {self._table} WHERE key IN "
+                f"(SELECT key FROM {self._table} ORDER BY expires_at LIMIT "
+                f"max(0, (SELECT count(*) FROM {self._table}) - ?))",
+                (self.max_entries,),
+            ).rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT count(*) FROM {self._table}").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
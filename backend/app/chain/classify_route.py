@@ -0,0 +1,131 @@
+"""Span 1 (fused): Intent classification and routing in a single LLM call."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+from ldclient.context import Context
+from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
+
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate
+from app.chain.memo import step_memo
+from app.chain.history import fit_history, history_budget
+from app.chain.tracking import atrack_openai_metrics, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-intent-router"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ("user_message",)
+
+DEFAULT_CONFIG = AICompletionConfigDefault(
+    enabled=True,
+    model=ModelConfig(name="gpt-4o-mini", parameters={"temperature": 0}),
+    provider=ProviderConfig("openai"),
+    messages=[
+        LDMessage(
+            role="system",
+            content=(
+                "You are the intake assistant for a LaunchDarkly support chatbot. "
+                "Given the user message and conversation history, classify the intent, "
+                "extract key entities, and decide the best action.\n\n"
+                "Categories: billing, feature-question, troubleshooting, integration, general\n\n"
+                "Routes:\n"
+                '- "search": The user has a specific question that requires searching LaunchDarkly documentation. '
+                "Use this for feature questions, troubleshooting, integration help, billing questions, etc.\n"
+                '- "clarify": The user\'s question is too vague or ambiguous to search for. '
+                'Ask a clarifying question to understand what they need. Examples: "help me", "I have a problem", "how does it work"\n'
+                '- "direct": The user\'s message doesn\'t need documentation. '
+                "Use this for greetings, thanks, goodbyes, or simple conversational messages.\n\n"
+                "Respond with JSON only:\n"
+                '{"intent": "<category>", "entities": ["<entity1>", ...], '
+                '"route": "<search|clarify|direct>", "message": "<response if route is clarify or direct, empty string if search>"}'
+            ),
+        ),
+    ],
+)
+
+# Default history token budget; override with the AI Config's history_token_budget parameter
+HISTORY_TOKEN_BUDGET = 600
+
+_FALLBACK = {"intent": "general", "entities": [], "route": "search", "message": ""}
+
+_memo = step_memo("intent_router")
+
+
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
+
+def _build_request(config, user_message: str, conversation_history: list[dict]) -> dict:
+    messages = config.render(user_message=user_message)
+
+    # Include as much recent conversation as fits the token budget
+    messages.extend(fit_history(conversation_history, history_budget(config, HISTORY_TOKEN_BUDGET)))
+
+    messages.append({"role": "user", "content": user_message})
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse(result) -> dict:
+    try:
+        parsed = json.loads(result.choices[0].message.content)
+    except (json.JSONDecodeError, IndexError):
+        return dict(_FALLBACK)
+    return {**_FALLBACK, **parsed}
+
+
+def _complete(config, request: dict) -> dict:
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
+async def _acomplete(config, request: dict) -> dict:
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
+def classify_and_route(
+    user_message: str,
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> dict:
+    """Return {"intent": str, "entities": list[str], "route": str, "message": str}."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return dict(_FALLBACK)
+
+    request = _build_request(config, user_message, conversation_history)
+    return _memo.call(config, request, lambda: _complete(config, request))
+
+
+async def aclassify_and_route(
+    user_message: str,
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> dict:
+    """Async variant of :func:`classify_and_route` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return dict(_FALLBACK)
+
+    request = _build_request(config, user_message, conversation_history)
+    return await _memo.acall(config, request, lambda: _acomplete(config, request))
@@ -0,0 +1,130 @@
+"""Single-flight coalescing of identical concurrent work."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, TypeVar
+
+from app.chain.metrics import coalesced
+
+T = TypeVar("T")
+
+
+def flight_key(*parts: Any) -> str:
+    """Stable key for JSON-serializable request parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _retrieve_exception(future: asyncio.Future) -> None:
+    # Avoid "exception was never retrieved" when every caller has gone away
+    if not future.cancelled():
+        future.exception()
+
+
+class _Broadcast:
+    """Replays one async iterator's items to any number of subscribers.
+
+    Items are buffered for the lifetime of the flight, so late subscribers
+    still see every event from the start.
+    """
+
+    def __init__(self, events: AsyncIterator):
+        self.items: list = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(events))
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self, events: AsyncIterator) -> None:
+        try:
+            async for item in events:
+                self.items.append(item)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = RuntimeError(f"shared execution {self.task.get_name()} was cancelled")
+            raise
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator:
+        i = 0
+        while True:
+            while i < len(self.items):
+                yield self.items[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """Shares one in-flight execution among concurrent callers with the same key.
+
+    ``call`` coalesces a coroutine; ``stream`` coalesces an async iterator and
+    fans its items out to every subscriber. Keys are forgotten as soon as the
+    work finishes, so this never serves stale results; it only deduplicates
+    work that overlaps in time. With ``retain``, successful ``call`` results are
+    kept for the object's lifetime instead (e.g. one batch run). Must be used
+    from the event loop.
+    """
+
+    def __init__(self, name: str, retain: bool = False):
+        self.name = name
+        self.retain = retain
+        self._calls: dict[str, asyncio.Future] = {}
+        self._streams: dict[str, _Broadcast] = {}
+
+    def _count(self, role: str) -> None:
+        coalesced.inc(1, self.name, role)
+
+    async def call(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            self._count("leader")
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+            future.add_done_callback(_retrieve_exception)
+        else:
+            self._count("follower")
+        # A caller that disconnects must not cancel the work others are awaiting
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if not self.retain or future.cancelled() or future.exception() is not None:
+            self._calls.pop(key, None)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator]) -> AsyncIterator:
+        flight = self._streams.get(key)
+        if flight is None:
+            self._count("leader")
+            flight = _Broadcast(factory())
+            self._streams[key] = flight
+            flight.task.add_done_callback(lambda _: self._streams.pop(key, None))
+        else:
+            self._count("follower")
+        flight.subscribers += 1
+        try:
+            async for item in flight.subscribe():
+                yield item
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Everyone disconnected; stop the shared work like an unshared request would
+                flight.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._streams)
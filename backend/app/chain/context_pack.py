@@ -0,0 +1,232 @@
+"""Context packing: dedupe, rank and token-budget retrieved documents.
+
+Retrieval can return the same page several times (repeated citations) and
+whole web-search answers as one document. :func:`pack_context` runs once per
+chain, after retrieval: it dedupes documents by URL and content, splits them
+into passages and ranks the passages against the search query with a local
+BM25 scorer. The generator and judge then render the same packed context into
+their own token budgets.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, urlunsplit
+
+from app.chain.history import count_tokens
+from app.chain.local_index import tokenize
+
+# Target passage size; paragraphs are merged up to it and longer ones split
+PASSAGE_TOKENS = 160
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def context_budget(config, default: int) -> int:
+    """Per-step document token budget from the AI Config's "context_token_budget" parameter."""
+    return int(config.model.get_parameter("context_token_budget") or default)
+
+
+@dataclass(slots=True)
+class Passage:
+    doc: int  # index into PackedContext.documents
+    position: int  # order within its document
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+@dataclass(slots=True)
+class PackedContext:
+    """Deduped documents and their passages, best first.
+
+    ``documents`` keeps retrieval order and is what callers report as sources.
+    """
+
+    documents: list[dict]
+    passages: list[Passage]
+    _rendered: dict[int, str] = field(default_factory=dict, repr=False)
+
+    def select(self, budget: int) -> tuple[list[Passage], int]:
+        """The highest-ranked passages that fit in budget tokens, and the tokens left over."""
+        selected = []
+        remaining = budget
+        for passage in self.passages:
+            if passage.tokens <= remaining:
+                selected.append(passage)
+                remaining -= passage.tokens
+        return selected, remaining
+
+    def render(self, budget: int, empty: str = "No documents.") -> str:
+        """Selected passages grouped under their document's title and URL.
+
+        Documents appear in order of their best passage and passages in their
+        original order, so related text stays together. Documents without any
+        content (bare citations) are listed by title and URL while budget
+        remains. Rendering is memoized per budget, so steps with the same
+        budget share one string.
+        """
+        text = self._rendered.get(budget)
+        if text is not None:
+            return text or empty
+
+        selected, remaining = self.select(budget)
+        by_doc: dict[int, list[Passage]] = {}
+        for passage in selected:
+            by_doc.setdefault(passage.doc, []).append(passage)
+        blocks = []
+        for doc, passages in by_doc.items():
+            body = "\n\n".join(p.text for p in sorted(passages, key=lambda p: p.position))
+            blocks.append(f"{_heading(self.documents[doc])}\n{body}")
+        for d in self.documents:
+            if d.get("url") and not (d.get("content") or "").strip():
+                heading = _heading(d)
+                remaining -= count_tokens(heading)
+                if remaining < 0:
+                    break
+                blocks.append(heading)
+        text = self._rendered[budget] = "\n\n".join(blocks)
+        return text or empty
+
+
+def _heading(d: dict) -> str:
+    return f"[{d.get('title') or 'Source'}]({d.get('url', '')})"
+
+
+EMPTY_CONTEXT = PackedContext(documents=[], passages=[])
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(_WHITESPACE.sub(" ", text.lower()).strip().encode()).hexdigest()
+
+
+def dedupe(documents: list[dict]) -> list[dict]:
+    """Drop repeated URLs and repeated content, keeping the first occurrence.
+
+    When a URL repeats, its first entry takes the content of a later
+    duplicate if it had none (web search citations often arrive empty).
+    """
+    kept: list[dict] = []
+    by_url: dict[str, dict] = {}
+    seen_content: set[str] = set()
+    for d in documents:
+        content = d.get("content") or ""
+        digest = _content_hash(content) if content.strip() else None
+        if digest is not None and digest in seen_content:
+            continue
+        url = _normalize_url(d.get("url") or "")
+        first = by_url.get(url) if url else None
+        if first is not None:
+            if digest is not None and not first.get("content"):
+                first["content"] = content
+                seen_content.add(digest)
+            continue
+        d = dict(d)
+        kept.append(d)
+        if url:
+            by_url[url] = d
+        if digest is not None:
+            seen_content.add(digest)
+    return kept
+
+
+def _split_long(text: str, max_tokens: int) -> list[str]:
+    """Split one oversized paragraph on sentence, then word, boundaries."""
+    pieces: list[str] = []
+    current = ""
+    for sentence in _SENTENCES.split(text):
+        if count_tokens(sentence) > max_tokens:
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // count_tokens(sentence))
+            sentence_parts = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            sentence_parts = [sentence]
+        for part in sentence_parts:
+            candidate = f"{current} {part}" if current else part
+            if current and count_tokens(candidate) > max_tokens:
+                pieces.append(current)
+                current = part
+            else:
+                current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_passages(text: str, max_tokens: int = PASSAGE_TOKENS) -> list[str]:
+    """Split text into passages of up to about max_tokens, on paragraph boundaries where possible."""
+    passages: list[str] = []
+    current = ""
+    for paragraph in _PARAGRAPHS.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) > max_tokens:
+            if current:
+                passages.append(current)
+                current = ""
+            passages.extend(_split_long(paragraph, max_tokens))
+            continue
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if current and count_tokens(candidate) > max_tokens:
+            passages.append(current)
+            current = paragraph
+        else:
+            current = candidate
+    if current:
+        passages.append(current)
+    return passages
+
+
+def _bm25(query: str, passages: list[Passage]) -> None:
+    """Score passages against query in place, with IDF taken over the passages themselves."""
+    terms = set(tokenize(query))
+    if not terms or not passages:
+        return
+    counts = [Counter(t for t in tokenize(p.text) if t in terms) for p in passages]
+    lengths = [max(1, p.tokens) for p in passages]
+    avg_len = sum(lengths) / len(lengths)
+    n = len(passages)
+    for term in terms:
+        df = sum(1 for c in counts if term in c)
+        if df == 0:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for passage, c, length in zip(passages, counts, lengths):
+            tf = c.get(term)
+            if tf:
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * length / avg_len)
+                passage.score += idf * tf * (_BM25_K1 + 1) / (tf + norm)
+
+
+def pack_context(query: str, documents: list[dict]) -> PackedContext:
+    """Dedupe documents and rank their passages against query."""
+    documents = dedupe(documents)
+    passages: list[Passage] = []
+    seen: set[str] = set()
+    for doc, d in enumerate(documents):
+        for position, text in enumerate(split_passages(d.get("content") or "")):
+            digest = _content_hash(text)
+            if digest in seen:
+                continue
+            seen.add(digest)
+            passages.append(Passage(doc=doc, position=position, text=text, tokens=count_tokens(text)))
+
+    _bm25(query, passages)
+    # Ties (e.g. no query terms matched) keep retrieval order
+    passages.sort(key=lambda p: (-p.score, p.doc, p.position))
+    return PackedContext(documents=documents, passages=passages)
@@ -0,0 +1,86 @@
+"""Pluggable text embedders used by the semantic cache and local retrieval."""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Protocol
+
+import numpy as np
+
+from app.config import async_openai_client, openai_client
+
+_TOKEN = re.compile(r"\w+")
+
+
+class Embedder(Protocol):
+    """Maps texts to an (n, dim) float32 matrix of L2-normalized rows."""
+
+    name: str
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+    async def aembed(self, texts: list[str]) -> np.ndarray: ...
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: signed feature hashing of word uni/bigrams.
+
+    No network and no model files, so it is suitable for tests and offline use.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = _TOKEN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize_rows(matrix)
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings API on the shared sync/async clients."""
+
+    name = "openai"
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 1536):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        response = openai_client.embeddings.create(model=self.model, input=texts)
+        return _normalize_rows(np.array([d.embedding for d in response.data], dtype=np.float32))
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        response = await async_openai_client.embeddings.create(model=self.model, input=texts)
+        return _normalize_rows(np.array([d.embedding for d in response.data], dtype=np.float32))
+
+
+def get_embedder(name: str) -> Embedder | None:
+    """Return the embedder registered under name, or None for "" (disabled)."""
+    if not name:
+        return None
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "openai":
+        return OpenAIEmbedder()
+    raise ValueError(f"Unknown embedder: {name!r}")
@@ -0,0 +1,76 @@
+"""Typed chain events and their wire encodings.
+
+The orchestrator yields these objects; ``/chat`` takes the result straight
+off the stream while ``/chat/stream`` encodes each event as an SSE frame.
+"""
+
+from __future__ import annotations
+
+import zlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from functools import lru_cache
+
+import orjson
+
+from app.models import ChatResponse, QualityMetadata
+
+
+@dataclass(slots=True, frozen=True)
+class StepEvent:
+    step: str
+    status: str  # "running" or "done"
+    label: str
+    detail: dict | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class DeltaEvent:
+    text: str
+
+
+@dataclass(slots=True, frozen=True)
+class ResultEvent:
+    response: ChatResponse
+
+
+@dataclass(slots=True, frozen=True)
+class QualityEvent:
+    """A deferred judge score, sent after the result."""
+
+    response_id: str
+    quality: QualityMetadata
+
+
+ChainEvent = StepEvent | DeltaEvent | ResultEvent | QualityEvent
+
+
+@lru_cache(maxsize=1024)
+def _step_frame(step: str, status: str, label: str) -> bytes:
+    # Most step events ("Classifying intent...", "Response ready") repeat verbatim
+    return b"event: step\ndata: " + orjson.dumps({"step": step, "status": status, "label": label}) + b"\n\n"
+
+
+def encode_sse(event: ChainEvent) -> bytes:
+    """One SSE frame for event."""
+    if isinstance(event, DeltaEvent):
+        return b"event: delta\ndata: " + orjson.dumps({"text": event.text}) + b"\n\n"
+    if isinstance(event, StepEvent):
+        if event.detail is None:
+            return _step_frame(event.step, event.status, event.label)
+        data = {"step": event.step, "status": event.status, "label": event.label, "detail": event.detail}
+        return b"event: step\ndata: " + orjson.dumps(data) + b"\n\n"
+    if isinstance(event, ResultEvent):
+        return b"event: result\ndata: " + event.response.model_dump_json().encode() + b"\n\n"
+    data = {"response_id": event.response_id, **event.quality.model_dump()}
+    return b"event: quality\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes | str], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a streamed body, flushing after every chunk so events aren't held back."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
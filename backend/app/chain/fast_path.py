@@ -0,0 +1,168 @@
+"""In-process fast path for trivial messages (greetings, thanks, vague asks).
+
+A hashed n-gram softmax model, trained by ``python -m app.train_fast_path``,
+scores short messages in microseconds. Confident hits skip the intent and
+router LLM calls and answer from a template; everything else takes the LLM path.
+So does any message with a word outside the vocabulary of the canned-phrase
+training examples: "thanks, but it's still broken" must not read as thanks.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import zlib
+from dataclasses import dataclass
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+SEED_DATA = Path(__file__).with_name("fast_path_seed.jsonl")
+
+# Class for messages that must go through the LLM chain
+LLM_LABEL = "llm"
+
+# label -> (route, templated reply)
+TEMPLATES = {
+    "greeting": (
+        "direct",
+        "Hi! I'm the LaunchDarkly support assistant. What can I help you with today?",
+    ),
+    "thanks": (
+        "direct",
+        "You're welcome! Let me know if there's anything else I can help with.",
+    ),
+    "goodbye": (
+        "direct",
+        "Goodbye! Come back any time you have LaunchDarkly questions.",
+    ),
+    "direct": (
+        "direct",
+        "Happy to help! What would you like to know about LaunchDarkly?",
+    ),
+    "clarify": (
+        "clarify",
+        "Could you tell me a bit more about what you're trying to do? For example, "
+        "which SDK or feature you're using and what you've tried so far.",
+    ),
+}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def phrase_vocabulary(examples: Iterable[tuple[str, str]]) -> frozenset[str]:
+    """Every word in the examples labelled with a template (not LLM_LABEL)."""
+    return frozenset(word for message, label in examples if label != LLM_LABEL for word in _words(message))
+
+
+def seed_examples() -> list[tuple[str, str]]:
+    examples = []
+    with SEED_DATA.open() as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["message"], row["label"]))
+    return examples
+
+
+def features(text: str) -> list[str]:
+    """Word uni/bigrams plus character trigrams (robust to "thx"/"thanx" variants)."""
+    words = _words(text)
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams.extend(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return grams or ["<empty>"]
+
+
+def hash_features(text: str, dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """Signed feature hashing: (column indices, +/-1 values)."""
+    hashes = np.fromiter((zlib.crc32(f.encode()) for f in features(text)), dtype=np.uint32)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+    return (hashes % dim).astype(np.intp), signs
+
+
+@dataclass(slots=True)
+class FastPathResult:
+    label: str
+    route: str
+    reply: str
+    confidence: float
+
+
+class FastPathClassifier:
+    """Softmax regression over hashed features; weights are (dim, classes).
+
+    vocabulary is the :func:`phrase_vocabulary` of the training examples.
+    """
+
+    def __init__(
+        self, weights: np.ndarray, bias: np.ndarray, labels: list[str], max_words: int, vocabulary: frozenset[str]
+    ):
+        self.weights = weights
+        self.bias = bias
+        self.labels = labels
+        self.max_words = max_words
+        self.vocabulary = vocabulary
+        self.dim = weights.shape[0]
+
+    @classmethod
+    def load(cls, path: str | Path) -> FastPathClassifier:
+        with np.load(path, allow_pickle=False) as data:
+            if "vocabulary" in data:
+                vocabulary = frozenset(str(word) for word in data["vocabulary"])
+            else:  # trained before models stored it
+                vocabulary = phrase_vocabulary(seed_examples())
+            return cls(
+                data["weights"].astype(np.float32),
+                data["bias"].astype(np.float32),
+                [str(label) for label in data["labels"]],
+                int(data["max_words"]),
+                vocabulary,
+            )
+
+    def save(self, path: str | Path) -> None:
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            labels=np.array(self.labels),
+            max_words=np.array(self.max_words),
+            vocabulary=np.array(sorted(self.vocabulary)),
+        )
+
+    def probabilities(self, text: str) -> np.ndarray:
+        indices, signs = hash_features(text, self.dim)
+        logits = signs @ self.weights[indices] + self.bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def classify(self, text: str, threshold: float, allow_clarify: bool = True) -> FastPathResult | None:
+        """Return a templated route if the model is at least threshold confident, else None."""
+        if len(text.split()) > self.max_words:
+            return None
+        if not self.vocabulary.issuperset(_words(text)):
+            # Says more than a canned phrase, e.g. "thanks, but it still fails"
+            return None
+        probs = self.probabilities(text)
+        best = int(probs.argmax())
+        label = self.labels[best]
+        if label == LLM_LABEL or label not in TEMPLATES or probs[best] < threshold:
+            return None
+        route, reply = TEMPLATES[label]
+        if route == "clarify" and not allow_clarify:
+            return None
+        return FastPathResult(label=label, route=route, reply=reply, confidence=float(probs[best]))
+
+
+def load_fast_path(path: str) -> FastPathClassifier | None:
+    """Load the trained model at path, or None for "" (disabled)."""
+    if not path:
+        return None
+    return FastPathClassifier.load(path)
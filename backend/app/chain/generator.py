@@ -2,10 +2,24 @@
 
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING
+
 from ldclient.context import Context
 from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
 
-from app.config import ai_client, openai_client
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate, prompt_layout
+from app.chain.context_pack import PackedContext, context_budget
+from app.chain.history import fit_history, history_budget
+from app.chain.tracking import atrack_openai_metrics, atrack_openai_stream, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-response-generator"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ("intent", "docs", "entities")
 
 DEFAULT_CONFIG = AICompletionConfigDefault(
     enabled=True,
@@ -27,52 +41,140 @@ DEFAULT_CONFIG = AICompletionConfigDefault(
     ],
 )
 
+# Default history token budget; override with the AI Config's history_token_budget parameter
+HISTORY_TOKEN_BUDGET = 2000
+# Default documentation token budget; override with the context_token_budget parameter
+CONTEXT_TOKEN_BUDGET = 3000
+
+_DISABLED_REPLY = "I'm sorry, I'm unable to help right now. Please try again later."
+
+
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
+
+def generator_config_version(context: Context, snapshot: ChainConfigSnapshot | None = None) -> str:
+    """Variation/version of the generator AI Config served to this context."""
+    return _config(context, snapshot).version
+
+
+def _build_request(
+    config: StepConfig,
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    packed: PackedContext,
+    conversation_history: list[dict],
+) -> dict:
+    docs_text = packed.render(context_budget(config, CONTEXT_TOKEN_BUDGET), "No documentation found.")
+
+    variables = {"intent": intent, "docs": docs_text, "entities": ", ".join(entities)}
+    context_message = None
+    if prompt_layout(config) == "prefix":
+        messages, context_message = config.render_prefix(**variables)
+    else:
+        messages = config.render(**variables)
+
+    # Add as much recent conversation history as fits the token budget
+    messages.extend(fit_history(conversation_history, history_budget(config, HISTORY_TOKEN_BUDGET)))
+
+    # Per-request context goes after the history so the prefix before it stays cacheable
+    if context_message is not None:
+        messages.append(context_message)
+    messages.append({"role": "user", "content": user_message})
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0.3,
+    }
+
+
+def _parse(result) -> str:
+    return result.choices[0].message.content or "I couldn't generate a response."
+
 
 def generate_response(
     user_message: str,
     intent: str,
     entities: list[str],
-    documents: list[dict],
+    packed: PackedContext,
     conversation_history: list[dict],
     context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
 ) -> tuple[str, object]:
-    """Generate the final response using retrieved docs and intent.
+    """Generate the final response using the packed documentation context and intent.
 
     Returns (reply_text, tracker) so the tracker can be used for feedback later.
     """
-    docs_text = "\n\n".join(
-        f"[{d.get('title', 'Source')}]({d.get('url', '')})\n{d.get('content', '')}"
-        for d in documents
-    ) or "No documentation found."
-
-    config = ai_client.completion_config(
-        "ld-bot-response-generator",
-        context,
-        DEFAULT_CONFIG,
-        variables={
-            "intent": intent,
-            "docs": docs_text,
-            "entities": ", ".join(entities),
-        },
-    )
+    config = _config(context, snapshot)
     if not config.enabled:
-        return "I'm sorry, I'm unable to help right now. Please try again later.", None
+        return _DISABLED_REPLY, None
 
-    messages = [{"role": m.role, "content": m.content} for m in config.messages]
+    request = _build_request(config, user_message, intent, entities, packed, conversation_history)
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result), config.tracker
 
-    # Add conversation history
-    for msg in conversation_history[-6:]:
-        messages.append({"role": msg["role"], "content": msg["content"]})
 
-    messages.append({"role": "user", "content": user_message})
+async def agenerate_response(
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    packed: PackedContext,
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> tuple[str, object]:
+    """Async variant of :func:`generate_response` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return _DISABLED_REPLY, None
 
-    result = config.tracker.track_openai_metrics(
-        lambda: openai_client.chat.completions.create(
-            model=config.model.name,
-            messages=messages,
-            temperature=config.model.get_parameter("temperature") or 0.3,
-        )
+    request = _build_request(config, user_message, intent, entities, packed, conversation_history)
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
     )
+    return _parse(result), config.tracker
+
+
+def stream_response(
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    packed: PackedContext,
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> tuple[AsyncIterator[str], object]:
+    """Streaming variant of :func:`agenerate_response`.
+
+    Returns (deltas, tracker) where deltas is an async iterator over the reply's
+    completion tokens. The AI Config is evaluated eagerly so the tracker is
+    available before streaming starts.
+    """
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return _single(_DISABLED_REPLY), None
+
+    request = _build_request(config, user_message, intent, entities, packed, conversation_history)
+    request["stream"] = True
+    request["stream_options"] = {"include_usage": True}
+    return _deltas(config.tracker, request), config.tracker
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
 
-    reply = result.choices[0].message.content or "I couldn't generate a response."
-    return reply, config.tracker
+async def _deltas(tracker, request: dict) -> AsyncIterator[str]:
+    async for chunk in atrack_openai_stream(
+        tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    ):
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,165 @@
+"""Token-budgeted conversation history with a rolling per-session summary."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.chain.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # not installed, or the BPE file can't be fetched offline
+    _encoding = None
+
+# Per-message framing tokens in the chat format
+_MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Count tokens locally; approximates 4 chars/token without tiktoken."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + _MESSAGE_OVERHEAD
+
+
+def history_budget(config, default: int) -> int:
+    """Per-step history token budget from the AI Config's "history_token_budget" parameter."""
+    return int(config.model.get_parameter("history_token_budget") or default)
+
+
+def fit_history(conversation_history: list[dict], budget: int) -> list[dict]:
+    """Return the most recent messages that fit in budget tokens, oldest first.
+
+    A leading summary message (see :meth:`HistoryManager.prepare`) is kept
+    whenever it fits, since it stands in for everything older.
+    """
+    summary = None
+    turns = conversation_history
+    if turns and turns[0].get("summary"):
+        summary, turns = turns[0], turns[1:]
+
+    remaining = budget
+    if summary is not None:
+        remaining -= message_tokens(summary)
+        if remaining < 0:
+            summary, remaining = None, budget
+
+    kept: list[dict] = []
+    for msg in reversed(turns):
+        cost = message_tokens(msg)
+        if cost > remaining:
+            break
+        remaining -= cost
+        kept.append({"role": msg["role"], "content": msg["content"]})
+    kept.reverse()
+
+    if summary is not None:
+        kept.insert(0, {"role": summary["role"], "content": summary["content"]})
+    return kept
+
+
+@dataclass(slots=True)
+class _Summary:
+    text: str
+    covered: int  # number of leading conversation messages folded into text
+    fingerprint: str  # of the last folded message
+
+
+def _fingerprint(message: dict) -> str:
+    return hashlib.sha1(f"{message['role']}:{message['content']}".encode()).hexdigest()
+
+
+class HistoryManager:
+    """Caches a rolling summary per session and decides when to extend it.
+
+    Once the unsummarized tail of a conversation grows past trigger_tokens,
+    the oldest messages are folded into the summary until only about
+    keep_recent_tokens remain verbatim. Summaries are built off the request
+    path; a request simply uses whatever summary is cached at that moment.
+
+    Positions are absolute: callers pass start, the index of history[0] in
+    the whole conversation, so a summary stays valid after the session store
+    trims old turns.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, trigger_tokens: int, keep_recent_tokens: int):
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent_tokens = keep_recent_tokens
+        self._summaries = TTLCache(max_entries, ttl, sliding=True)
+        self._in_flight: set[str] = set()
+
+    def _valid_summary(self, session_id: str, history: list[dict], start: int) -> tuple[_Summary | None, int]:
+        """The cached summary, if it still applies, and how many of history's messages it covers."""
+        summary = self._summaries.get(session_id)
+        if summary is None:
+            return None, 0
+        covered = summary.covered - start
+        if covered > len(history):
+            return None, 0
+        if covered > 0 and summary.fingerprint != _fingerprint(history[covered - 1]):
+            # History was replaced (e.g. a client-supplied history); don't trust it.
+            return None, 0
+        # covered <= 0: the last folded message has been trimmed; the summary
+        # still stands in for everything before history
+        return summary, max(covered, 0)
+
+    def prepare(self, session_id: str, history: list[dict], start: int = 0) -> list[dict]:
+        """History with summarized turns replaced by one leading summary message."""
+        summary, covered = self._valid_summary(session_id, history, start)
+        if summary is None:
+            return history
+        return [
+            {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary.text}",
+                "summary": True,
+            },
+            *history[covered:],
+        ]
+
+    def pending_fold(
+        self, session_id: str, history: list[dict], start: int = 0
+    ) -> tuple[str, list[dict], int] | None:
+        """Return (previous summary, messages to fold, new absolute covered count) or None.
+
+        Marks the session in flight; callers must follow up with :meth:`update`
+        or :meth:`abandon`.
+        """
+        if session_id in self._in_flight:
+            return None
+        summary, covered = self._valid_summary(session_id, history, start)
+        tail = history[covered:]
+        tail_tokens = sum(message_tokens(m) for m in tail)
+        if tail_tokens <= self.trigger_tokens:
+            return None
+
+        fold = 0
+        while fold < len(tail) - 1 and tail_tokens > self.keep_recent_tokens:
+            tail_tokens -= message_tokens(tail[fold])
+            fold += 1
+        if fold == 0:
+            return None
+        self._in_flight.add(session_id)
+        return (summary.text if summary else ""), tail[:fold], start + covered + fold
+
+    def update(self, session_id: str, history: list[dict], text: str, covered: int, start: int = 0) -> None:
+        self._in_flight.discard(session_id)
+        self._summaries.put(
+            session_id,
+            _Summary(text=text, covered=covered, fingerprint=_fingerprint(history[covered - start - 1])),
+        )
+
+    def abandon(self, session_id: str) -> None:
+        self._in_flight.discard(session_id)
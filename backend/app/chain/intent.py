@@ -3,11 +3,22 @@
 from __future__ import annotations
 
 import json
+from typing import TYPE_CHECKING
 
 from ldclient.context import Context
 from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
 
-from app.config import ai_client, openai_client
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate
+from app.chain.memo import step_memo
+from app.chain.tracking import atrack_openai_metrics, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-intent-classifier"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ("user_message",)
 
 DEFAULT_CONFIG = AICompletionConfigDefault(
     enabled=True,
@@ -28,32 +39,68 @@ DEFAULT_CONFIG = AICompletionConfigDefault(
 )
 
 
+_memo = step_memo("intent")
+
+
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
+
+def _build_request(config, user_message: str) -> dict:
+    messages = config.render(user_message=user_message)
+    messages.append({"role": "user", "content": user_message})
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse(result) -> dict:
+    try:
+        return json.loads(result.choices[0].message.content)
+    except (json.JSONDecodeError, IndexError):
+        return {"intent": "general", "entities": []}
+
+
+def _complete(config, request: dict) -> dict:
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
+async def _acomplete(config, request: dict) -> dict:
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
 def classify_intent(
-    user_message: str, context: Context
+    user_message: str, context: Context, snapshot: ChainConfigSnapshot | None = None
 ) -> dict:
     """Return {"intent": str, "entities": list[str]}."""
-    config = ai_client.completion_config(
-        "ld-bot-intent-classifier",
-        context,
-        DEFAULT_CONFIG,
-        variables={"user_message": user_message},
-    )
+    config = _config(context, snapshot)
     if not config.enabled:
         return {"intent": "general", "entities": []}
 
-    messages = [{"role": m.role, "content": m.content} for m in config.messages]
-    messages.append({"role": "user", "content": user_message})
+    request = _build_request(config, user_message)
+    return _memo.call(config, request, lambda: _complete(config, request))
 
-    result = config.tracker.track_openai_metrics(
-        lambda: openai_client.chat.completions.create(
-            model=config.model.name,
-            messages=messages,
-            temperature=config.model.get_parameter("temperature") or 0,
-            response_format={"type": "json_object"},
-        )
-    )
 
-    try:
-        return json.loads(result.choices[0].message.content)
-    except (json.JSONDecodeError, IndexError):
+async def aclassify_intent(
+    user_message: str, context: Context, snapshot: ChainConfigSnapshot | None = None
+) -> dict:
+    """Async variant of :func:`classify_intent` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
         return {"intent": "general", "entities": []}
+
+    request = _build_request(config, user_message)
+    return await _memo.acall(config, request, lambda: _acomplete(config, request))
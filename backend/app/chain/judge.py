@@ -3,11 +3,22 @@
 from __future__ import annotations
 
 import json
+from typing import TYPE_CHECKING
 
 from ldclient.context import Context
 from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
 
-from app.config import ai_client, openai_client
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate
+from app.chain.context_pack import PackedContext, context_budget
+from app.chain.tracking import atrack_openai_metrics, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-quality-judge"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ()
 
 DEFAULT_CONFIG = AICompletionConfigDefault(
     enabled=True,
@@ -30,27 +41,21 @@ DEFAULT_CONFIG = AICompletionConfigDefault(
     ],
 )
 
+# Default documentation token budget; the generator's default too, so the judge
+# scores faithfulness against the same text the reply was generated from
+CONTEXT_TOKEN_BUDGET = 3000
 
-def judge_quality(
-    user_message: str,
-    response_text: str,
-    documents: list[dict],
-    context: Context,
-) -> dict:
-    """Return {"relevance": float, "faithfulness": float, "pass": bool}."""
-    config = ai_client.completion_config(
-        "ld-bot-quality-judge",
-        context,
-        DEFAULT_CONFIG,
-    )
-    if not config.enabled:
-        return {"relevance": 1.0, "faithfulness": 1.0, "pass": True}
 
-    docs_text = "\n\n".join(
-        f"[{d.get('title', 'Source')}]\n{d.get('content', '')}" for d in documents
-    ) or "No documents."
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
 
-    messages = [{"role": m.role, "content": m.content} for m in config.messages]
+def _build_request(config: StepConfig, user_message: str, response_text: str, packed: PackedContext) -> dict:
+    docs_text = packed.render(context_budget(config, CONTEXT_TOKEN_BUDGET), "No documents.")
+
+    messages = config.render()
     messages.append(
         {
             "role": "user",
@@ -61,17 +66,56 @@ def judge_quality(
             ),
         }
     )
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0,
+        "response_format": {"type": "json_object"},
+    }
 
-    result = config.tracker.track_openai_metrics(
-        lambda: openai_client.chat.completions.create(
-            model=config.model.name,
-            messages=messages,
-            temperature=config.model.get_parameter("temperature") or 0,
-            response_format={"type": "json_object"},
-        )
-    )
 
+def _parse(result) -> dict:
     try:
         return json.loads(result.choices[0].message.content)
     except (json.JSONDecodeError, IndexError):
         return {"relevance": 0.0, "faithfulness": 0.0, "pass": False}
+
+
+def judge_quality(
+    user_message: str,
+    response_text: str,
+    packed: PackedContext,
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> dict:
+    """Return {"relevance": float, "faithfulness": float, "pass": bool}."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return {"relevance": 1.0, "faithfulness": 1.0, "pass": True}
+
+    request = _build_request(config, user_message, response_text, packed)
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
+async def ajudge_quality(
+    user_message: str,
+    response_text: str,
+    packed: PackedContext,
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> dict:
+    """Async variant of :func:`judge_quality` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return {"relevance": 1.0, "faithfulness": 1.0, "pass": True}
+
+    request = _build_request(config, user_message, response_text, packed)
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
@@ -0,0 +1,334 @@
+"""Local pre-built documentation index: BM25 inverted index plus optional dense vectors.
+
+Index files are plain NumPy arrays loaded with ``mmap_mode="r"``, and string
+tables (UTF-8 strings concatenated in ``<name>.bin`` with int64 byte offsets
+in ``<name>_offsets.npy``) are memory-mapped too, so every worker process on
+a host shares the same page-cache pages and loading parses nothing but
+meta.json.
+
+Layout of an index directory::
+
+    meta.json             counts, BM25 parameters, embedder name, format
+    vocab.bin/_offsets    string table of terms, sorted by UTF-8 bytes; term id = position
+    titles.bin/_offsets   string table of document titles
+    urls.bin/_offsets     string table of document URLs
+    chunk_doc.npy         int32 document id per chunk
+    chunks.bin/_offsets   string table of chunk texts
+    postings_indptr.npy   int64 (n_terms + 1) CSR row pointers per term
+    postings_chunks.npy   int32 chunk ids
+    postings_tf.npy       float32 term frequencies
+    idf.npy               float32 per term
+    chunk_len.npy         float32 tokens per chunk
+    dense.npy             float32 (n_chunks, dim), only with an embedder
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import re
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+_HEADING = re.compile(r"^#{1,6}\s+(.*)$", re.MULTILINE)
+_FRONT_MATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+
+DOC_SUFFIXES = {".md", ".markdown", ".mdx", ".html", ".htm"}
+# Bumped when the file layout changes; older indexes must be rebuilt
+INDEX_FORMAT = 2
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+@dataclass(slots=True)
+class Chunk:
+    title: str
+    url: str
+    content: str
+
+
+class _HTMLText(HTMLParser):
+    """Collect visible text and the <title> from an HTML page."""
+
+    _SKIP = {"script", "style", "nav", "footer", "header"}
+
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.parts: list[str] = []
+        self._stack: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        self._stack.append(tag)
+        if tag in ("p", "li", "h1", "h2", "h3", "h4", "pre", "br", "tr"):
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        while self._stack and self._stack.pop() != tag:
+            pass
+
+    def handle_data(self, data):
+        if "title" in self._stack:
+            self.title += data.strip()
+        elif not self._SKIP.intersection(self._stack):
+            self.parts.append(data)
+
+
+def _read_document(path: Path) -> tuple[str, str]:
+    """Return (title, plain text) for a markdown or HTML file."""
+    raw = path.read_text(encoding="utf-8", errors="replace")
+    if path.suffix in (".html", ".htm"):
+        parser = _HTMLText()
+        parser.feed(raw)
+        return parser.title or path.stem, "".join(parser.parts)
+    raw = _FRONT_MATTER.sub("", raw)
+    heading = _HEADING.search(raw)
+    return (heading.group(1).strip() if heading else path.stem), raw
+
+
+def chunk_text(text: str, max_words: int = 200, overlap: int = 40) -> list[str]:
+    """Split text into paragraph-aligned chunks of at most max_words words.
+
+    Consecutive chunks share overlap words, which must be fewer than max_words.
+    """
+    if max_words < 1 or not 0 <= overlap < max_words:
+        raise ValueError(f"need max_words >= 1 and 0 <= overlap < max_words, got {max_words} and {overlap}")
+    chunks: list[str] = []
+    current: list[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and len(current) + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+        current.extend(words)
+        while len(current) > max_words:
+            chunks.append(" ".join(current[:max_words]))
+            current = current[max_words - overlap:]
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def iter_chunks(docs_dir: Path, base_url: str, max_words: int) -> list[Chunk]:
+    chunks = []
+    for path in sorted(docs_dir.rglob("*")):
+        if path.suffix not in DOC_SUFFIXES or not path.is_file():
+            continue
+        title, text = _read_document(path)
+        rel = path.relative_to(docs_dir).with_suffix("").as_posix()
+        url = f"{base_url.rstrip('/')}/{rel}" if base_url else rel
+        for content in chunk_text(text, max_words, min(40, max_words // 5)):
+            chunks.append(Chunk(title=title, url=url, content=content))
+    return chunks
+
+
+def build_index(
+    docs_dir: Path,
+    index_dir: Path,
+    base_url: str = "",
+    embedder_name: str = "",
+    max_words: int = 200,
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> int:
+    """Chunk every doc under docs_dir and write the index files. Returns the chunk count."""
+    chunks = iter_chunks(docs_dir, base_url, max_words)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    counts_per_chunk = [Counter(tokenize(f"{chunk.title} {chunk.content}")) for chunk in chunks]
+    # Term ids follow the vocabulary's byte order, so lookups can binary-search it
+    terms = sorted({term for counts in counts_per_chunk for term in counts}, key=str.encode)
+    vocab = {term: term_id for term_id, term in enumerate(terms)}
+    postings: list[list[tuple[int, int]]] = [[] for _ in terms]
+    chunk_len = np.zeros(len(chunks), dtype=np.float32)
+    for chunk_id, counts in enumerate(counts_per_chunk):
+        chunk_len[chunk_id] = sum(counts.values())
+        for term, tf in counts.items():
+            postings[vocab[term]].append((chunk_id, tf))
+
+    indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(p) for p in postings])
+    flat = [pair for plist in postings for pair in plist]
+    n = max(len(chunks), 1)
+    idf = np.array(
+        [math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for p in postings], dtype=np.float32
+    )
+
+    np.save(index_dir / "postings_indptr.npy", indptr)
+    np.save(index_dir / "postings_chunks.npy", np.array([c for c, _ in flat], dtype=np.int32))
+    np.save(index_dir / "postings_tf.npy", np.array([tf for _, tf in flat], dtype=np.float32))
+    np.save(index_dir / "idf.npy", idf)
+    np.save(index_dir / "chunk_len.npy", chunk_len)
+
+    docs: dict[tuple[str, str], int] = {}
+    chunk_doc = np.array([docs.setdefault((c.title, c.url), len(docs)) for c in chunks], dtype=np.int32)
+    np.save(index_dir / "chunk_doc.npy", chunk_doc)
+    _StringTable.write(index_dir, "titles", [title for title, _ in docs])
+    _StringTable.write(index_dir, "urls", [url for _, url in docs])
+    _StringTable.write(index_dir, "chunks", [c.content for c in chunks])
+    _StringTable.write(index_dir, "vocab", terms)
+
+    dim = 0
+    if embedder_name:
+        from app.chain.embeddings import get_embedder
+
+        embedder = get_embedder(embedder_name)
+        dim = embedder.dim
+        dense = np.zeros((len(chunks), dim), dtype=np.float32)
+        for start in range(0, len(chunks), 256):
+            batch = chunks[start:start + 256]
+            dense[start:start + len(batch)] = embedder.embed([f"{c.title}\n{c.content}" for c in batch])
+        np.save(index_dir / "dense.npy", dense)
+
+    (index_dir / "meta.json").write_text(
+        json.dumps(
+            {
+                "n_chunks": len(chunks),
+                "n_terms": len(vocab),
+                "avg_len": float(chunk_len.mean()) if len(chunks) else 0.0,
+                "k1": k1,
+                "b": b,
+                "embedder": embedder_name,
+                "dim": dim,
+                "format": INDEX_FORMAT,
+            }
+        )
+    )
+    return len(chunks)
+
+
+class _StringTable:
+    """Memory-mapped UTF-8 strings: ``<name>.bin`` plus int64 offsets in ``<name>_offsets.npy``."""
+
+    def __init__(self, index_dir: Path, name: str):
+        self.offsets = np.load(index_dir / f"{name}_offsets.npy", mmap_mode="r")
+        self._file = open(index_dir / f"{name}.bin", "rb")
+        # mmap can't map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] > 0 else b""
+
+    @staticmethod
+    def write(index_dir: Path, name: str, strings: list[str]) -> None:
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        (index_dir / f"{name}.bin").write_bytes(b"".join(encoded))
+        np.save(index_dir / f"{name}_offsets.npy", offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self._data[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    def index(self, string: str) -> int | None:
+        """Position of string in a table sorted by UTF-8 bytes, or None."""
+        key = string.encode("utf-8")
+        i = bisect_left(range(len(self)), key, key=self.raw)
+        return i if i < len(self) and self.raw(i) == key else None
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class LocalIndex:
+    """Read-only, memory-mapped view of an index directory built by :func:`build_index`."""
+
+    def __init__(self, index_dir: Path):
+        self.meta = json.loads((index_dir / "meta.json").read_text())
+        if self.meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"{index_dir} is in an older index format; rebuild it with python -m app.ingest_docs")
+        self.vocab = _StringTable(index_dir, "vocab")
+        self.titles = _StringTable(index_dir, "titles")
+        self.urls = _StringTable(index_dir, "urls")
+        self.chunks = _StringTable(index_dir, "chunks")
+        self.chunk_doc = np.load(index_dir / "chunk_doc.npy", mmap_mode="r")
+        self.indptr = np.load(index_dir / "postings_indptr.npy", mmap_mode="r")
+        self.postings_chunks = np.load(index_dir / "postings_chunks.npy", mmap_mode="r")
+        self.postings_tf = np.load(index_dir / "postings_tf.npy", mmap_mode="r")
+        self.idf = np.load(index_dir / "idf.npy", mmap_mode="r")
+        self.chunk_len = np.load(index_dir / "chunk_len.npy", mmap_mode="r")
+        self.dense = None
+        self.embedder = None
+        if self.meta.get("embedder"):
+            from app.chain.embeddings import get_embedder
+
+            self.dense = np.load(index_dir / "dense.npy", mmap_mode="r")
+            self.embedder = get_embedder(self.meta["embedder"])
+
+        k1, b = self.meta["k1"], self.meta["b"]
+        avg_len = self.meta["avg_len"] or 1.0
+        # BM25 length normalization depends only on the chunk, so precompute it.
+        self._norm = (k1 * (1 - b + b * np.asarray(self.chunk_len) / avg_len)).astype(np.float32)
+        self._k1 = k1
+
+    def __len__(self) -> int:
+        return self.meta["n_chunks"]
+
+    def bm25(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.index(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            chunk_ids = self.postings_chunks[start:end]
+            tf = self.postings_tf[start:end]
+            scores[chunk_ids] += self.idf[term_id] * tf * (self._k1 + 1) / (tf + self._norm[chunk_ids])
+        return scores
+
+    def _chunk(self, chunk_id: int) -> dict:
+        doc = int(self.chunk_doc[chunk_id])
+        return {"title": self.titles[doc], "url": self.urls[doc], "content": self.chunks[chunk_id]}
+
+    def search(
+        self, query: str, k: int = 5, dense_weight: float = 0.5, query_vector: np.ndarray | None = None
+    ) -> list[dict]:
+        """Top-k hybrid search; returns {"title", "url", "content"} dicts like retrieve_docs.
+
+        query_vector is the query's embedding, if the caller already has it.
+        """
+        if not len(self):
+            return []
+        scores = self.bm25(query)
+        if self.dense is not None and dense_weight > 0:
+            top = scores.max()
+            if top > 0:
+                scores /= top
+            if query_vector is None:
+                query_vector = self.embedder.embed([query])[0]
+            dense = self.dense @ query_vector
+            scores = (1 - dense_weight) * scores + dense_weight * dense
+        elif not scores.any():
+            return []
+
+        k = min(k, len(self))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [self._chunk(int(i)) for i in best if scores[i] > 0]
+
+    async def asearch(self, query: str, k: int = 5, dense_weight: float = 0.5) -> list[dict]:
+        """:meth:`search` with the query embedded on the async client (the embedder may be remote)."""
+        query_vector = None
+        if len(self) and self.dense is not None and dense_weight > 0:
+            query_vector = (await self.embedder.aembed([query]))[0]
+        return self.search(query, k, dense_weight, query_vector)
+
+    def close(self) -> None:
+        for table in (self.vocab, self.titles, self.urls, self.chunks):
+            table.close()
@@ -0,0 +1,77 @@
+"""Memoization of deterministic chain steps keyed on the fully rendered request."""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from opentelemetry import trace
+
+from app.config import MEMO_SETTINGS
+from app.chain.cache import TTLCache
+
+_MISS = object()
+
+
+class StepMemo:
+    """Per-step memo table for temperature-0 LLM calls.
+
+    The key is a SHA-256 of the AI Config variation/version plus the exact
+    request sent to OpenAI (model, rendered messages including history,
+    temperature, response format), so any prompt or config change is a miss.
+    Requests with temperature > 0 are never cached. Hits and misses are
+    recorded on the current (step) span.
+    """
+
+    def __init__(self, step: str, ttl: float, max_entries: int):
+        self.step = step
+        self.enabled = ttl > 0 and max_entries > 0
+        self.cache = TTLCache(max_entries, ttl)
+
+    def key(self, config, request: dict) -> str | None:
+        if not self.enabled or (request.get("temperature") or 0) > 0:
+            return None
+        payload = json.dumps(
+            {"config": f"{config.key}:{config.version}", "request": request},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _lookup(self, key: str | None) -> Any:
+        span = trace.get_current_span()
+        if key is None:
+            span.set_attribute("memo.cacheable", False)
+            return _MISS
+        value = self.cache.get(key, _MISS)
+        span.set_attribute("memo.hit", value is not _MISS)
+        return _MISS if value is _MISS else copy.deepcopy(value)
+
+    def _store(self, key: str | None, value: Any) -> None:
+        if key is not None:
+            self.cache.put(key, copy.deepcopy(value))
+
+    def call(self, config, request: dict, fn: Callable[[], Any]) -> Any:
+        key = self.key(config, request)
+        value = self._lookup(key)
+        if value is _MISS:
+            value = fn()
+            self._store(key, value)
+        return value
+
+    async def acall(self, config, request: dict, fn: Callable[[], Awaitable[Any]]) -> Any:
+        key = self.key(config, request)
+        value = self._lookup(key)
+        if value is _MISS:
+            value = await fn()
+            self._store(key, value)
+        return value
+
+
+def step_memo(step: str) -> StepMemo:
+    ttl, max_entries = MEMO_SETTINGS[step]
+    return StepMemo(step, ttl, max_entries)
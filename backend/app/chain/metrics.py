@@ -0,0 +1,217 @@
+"""In-process Prometheus metrics for the chain, rendered by ``/metrics``.
+
+Counters and histograms are sharded per thread: each thread only ever updates
+its own pre-allocated series, so recording takes no locks even from executor
+threads, and rendering sums the shards. Gauges are only touched from the
+event loop.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUEUE_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+STREAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Sharded:
+    """Per-thread series storage: ``{thread id: {label values: series}}``.
+
+    Subclasses add recording methods and render(), like every registered metric.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._shards: dict[int, dict[tuple, object]] = {}
+
+    def _shard(self) -> dict[tuple, object]:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            shard = self._shards.setdefault(ident, {})
+        return shard
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, amount: float, *labels: str) -> None:
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0.0]
+        series[0] += amount
+
+    def render(self) -> list[str]:
+        totals: dict[tuple, float] = {}
+        for shard in list(self._shards.values()):
+            for labels, series in list(shard.items()):
+                totals[labels] = totals.get(labels, 0.0) + series[0]
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_format(v)}" for labels, v in sorted(totals.items())]
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # One count per bucket plus +Inf, then the running sum
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        merged: dict[tuple, list] = {}
+        for shard in list(self._shards.values()):
+            for labels, series in list(shard.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(series)
+                else:
+                    for i, v in enumerate(series):
+                        total[i] += v
+        lines = []
+        for labels, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format(bound)
+                bucket_labels = _labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A single value, updated from the event loop only."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.labelnames = ()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> list[str]:
+        return [f"{self.name} {_format(self.value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+step_duration = registry.register(
+    Histogram("chain_step_duration_seconds", "Chain step latency by span name.", ("step",))
+)
+executor_queue_wait = registry.register(
+    Histogram(
+        "chain_executor_queue_wait_seconds",
+        "Time a step waits for a stage slot (async) or executor worker (thread).",
+        ("step",),
+        QUEUE_WAIT_BUCKETS,
+    )
+)
+chains_in_flight = registry.register(Gauge("chain_in_flight", "Chain requests currently executing."))
+tokens = registry.register(
+    Counter("chain_tokens_total", "OpenAI tokens by AI Config key and kind (prompt, completion, cached).", ("config_key", "kind"))
+)
+routes = registry.register(Counter("chain_routes_total", "Router decisions by route.", ("route",)))
+coalesced = registry.register(
+    Counter("chain_coalesced_total", "Single-flight executions started (leader) or joined (follower).", ("flight", "role"))
+)
+step_timeouts = registry.register(Counter("chain_step_timeouts_total", "Steps that hit their deadline.", ("step",)))
+step_retries = registry.register(Counter("chain_step_retries_total", "Budgeted step retries.", ("step",)))
+step_hedges = registry.register(Counter("chain_step_hedges_total", "Hedged duplicate step requests.", ("step",)))
+retries_denied = registry.register(
+    Counter("chain_retry_budget_denied_total", "Retries or hedges refused by the retry budget.", ("step",))
+)
+admission_active = registry.register(Gauge("chain_admission_active", "Admitted chain requests in progress."))
+admission_queued = registry.register(Gauge("chain_admission_queued", "Requests waiting for admission."))
+admission_wait = registry.register(
+    Histogram("chain_admission_wait_seconds", "Time admitted requests waited in the admission queue.", (), QUEUE_WAIT_BUCKETS)
+)
+admission_rejected = registry.register(
+    Counter("chain_admission_rejected_total", "Requests rejected by admission control, by HTTP status.", ("status",))
+)
+retrieval_cache_lookups = registry.register(
+    Counter("chain_retrieval_cache_lookups_total", "Retrieval cache lookups by result (memory, sqlite, miss).", ("result",))
+)
+speculations = registry.register(
+    Counter(
+        "chain_speculations_total",
+        "Speculative retrievals by mode and outcome (used, wasted_route, wasted_cache).",
+        ("mode", "outcome"),
+    )
+)
+speculation_wasted = registry.register(
+    Histogram("chain_speculation_wasted_seconds", "Time speculative retrievals ran before being discarded.", ("mode",))
+)
+sse_duration = registry.register(
+    Histogram("chain_sse_stream_duration_seconds", "Wall time of /chat/stream responses.", (), STREAM_BUCKETS)
+)
+
+
+def record_usage(config_key: str, usage) -> None:
+    """Count an OpenAI usage object's tokens against an AI Config key."""
+    if usage is None:
+        return
+    tokens.inc(usage.prompt_tokens or 0, config_key, "prompt")
+    tokens.inc(usage.completion_tokens or 0, config_key, "completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    if cached:
+        tokens.inc(cached, config_key, "cached")
@@ -3,34 +3,154 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import contextvars
+import logging
+import random
+import time
 import uuid
-from collections import defaultdict
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import partial
 
 from ldclient.context import Context
 from opentelemetry import trace, context as otel_context
 
+from app.config import (
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+    CHAIN_DEADLINE,
+    CHAIN_EXECUTION_MODE,
+    COALESCE_STEPS,
+    FAST_PATH_MODEL,
+    FAST_STAGE_CONCURRENCY,
+    HISTORY_KEEP_RECENT_TOKENS,
+    HISTORY_SUMMARY_TRIGGER_TOKENS,
+    JUDGE_DEFERRED_STREAM_TIMEOUT,
+    JUDGE_QUEUE_SIZE,
+    JUDGE_WORKERS,
+    MAX_CONCURRENT_CHAINS,
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_EMBEDDER,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SESSION_MAX_BYTES,
+    SESSION_MAX_ENTRIES,
+    SESSION_MAX_TURNS,
+    SESSION_TTL,
+    SLOW_STAGE_CONCURRENCY,
+    SUMMARY_QUEUE_SIZE,
+    SUMMARY_WORKERS,
+    TRACKER_MAX_ENTRIES,
+    TRACKER_TTL,
+    ld_client,
+)
 from app.models import ChatRequest, ChatResponse, QualityMetadata
-from app.chain.intent import classify_intent
-from app.chain.router import route_query
-from app.chain.rewriter import rewrite_query
-from app.chain.retrieval import retrieve_docs
-from app.chain.generator import generate_response
-from app.chain.judge import judge_quality
+from app.chain.admission import AdmissionController, Stage
+from app.chain.background import BackgroundQueue
+from app.chain.events import ChainEvent, DeltaEvent, QualityEvent, ResultEvent, StepEvent, encode_sse
+from app.chain.context_pack import EMPTY_CONTEXT, PackedContext, pack_context
+from app.chain.coalesce import SingleFlight, flight_key
+from app.chain.classify_route import aclassify_and_route, classify_and_route
+from app.chain.intent import CONFIG_KEY as INTENT_CONFIG_KEY, aclassify_intent, classify_intent
+from app.chain.router import aroute_query, route_query
+from app.chain.rewriter import arewrite_query, rewrite_query
+from app.chain.resilience import Deadline, guarded
+from app.chain.retrieval import RETRIEVAL_BACKEND_FLAG, RetrievalCache, aretrieve_docs, retrieval_cache, retrieve_docs
+from app.chain.embeddings import get_embedder
+from app.chain.fast_path import load_fast_path
+from app.chain.history import HistoryManager
+from app.chain.generator import (
+    CONFIG_KEY as GENERATOR_CONFIG_KEY,
+    agenerate_response,
+    generate_response,
+    generator_config_version,
+    stream_response,
+)
+from app.chain.judge import ajudge_quality, judge_quality
+from app.chain.metrics import (
+    chains_in_flight,
+    executor_queue_wait,
+    routes,
+    speculation_wasted,
+    speculations,
+    step_duration,
+    step_timeouts,
+)
+from app.chain.semantic_cache import CachedAnswer, SemanticCache
+from app.chain.snapshot import ChainConfigSnapshot
+from app.chain.state import SessionStore, Turn, history_version, open_store
+from app.chain.summarizer import asummarize_history, summarize_history
+from app.chain.tracking import restore_tracker, serialize_tracker
+
+# Conversation store keyed by session_id, bounded by TTL and memory budget;
+# on a shared STATE_BACKEND every worker sees the same sessions
+_sessions = SessionStore(SESSION_TTL, SESSION_MAX_ENTRIES, SESSION_MAX_BYTES, SESSION_MAX_TURNS)
+
+# Trackers for feedback, keyed by response_id; expire after the feedback window.
+# Serialized on shared backends so /feedback can land on any worker.
+_trackers = open_store(
+    "trackers", TRACKER_TTL, TRACKER_MAX_ENTRIES, encode=serialize_tracker, decode=restore_tracker
+)
 
-# In-memory conversation store keyed by session_id
-_sessions: dict[str, list[dict]] = defaultdict(list)
+_tracer = trace.get_tracer("ld-support-chatbot.chain")
+logger = logging.getLogger(__name__)
 
-# Store trackers for feedback, keyed by response_id.
-# In production, use a TTL cache. For this prototype, a simple dict suffices.
-_trackers: dict[str, object] = {}
+# LD flag: when on, intent classification and routing share one LLM call
+FUSED_ROUTING_FLAG = "chain-fused-intent-routing"
 
-_tracer = trace.get_tracer("ld-support-chatbot.chain")
+# LD flag: admission priority for a context (higher is admitted first under load)
+ADMISSION_PRIORITY_FLAG = "chain-admission-priority"
+
+# Reply when generation produced nothing before its deadline
+_TIMEOUT_REPLY = "Sorry, this is taking longer than expected. Please try again in a moment."
+
+# LD flag: minimum fast-path classifier confidence to skip the LLM router (0 disables)
+FAST_PATH_THRESHOLD_FLAG = "chain-fast-path-threshold"
+
+# LD flag: start retrieval speculatively, alongside intent/routing: "off",
+# "rewrite" (rewrite without intent, then search) or "raw" (search the message as is)
+SPECULATIVE_RETRIEVAL_FLAG = "chain-speculative-retrieval"
+
+# LD flags: judge mode ("inline" | "deferred" | "sampled") and sampled fraction
+JUDGE_MODE_FLAG = "chain-judge-mode"
+JUDGE_SAMPLE_RATE_FLAG = "chain-judge-sample-rate"
+
+# Optional in-process classifier answering greetings/thanks/vague asks from templates
+fast_path = load_fast_path(FAST_PATH_MODEL)
 
+# Optional semantic answer cache (disabled unless an embedder is configured)
+_embedder = get_embedder(SEMANTIC_CACHE_EMBEDDER)
+semantic_cache = (
+    SemanticCache(_embedder, SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL)
+    if _embedder is not None
+    else None
+)
 
-def _sse(event: str, data: dict) -> str:
-    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+# Rolling conversation summaries, built on a background queue
+history_manager = HistoryManager(
+    SESSION_TTL, SESSION_MAX_ENTRIES, HISTORY_SUMMARY_TRIGGER_TOKENS, HISTORY_KEEP_RECENT_TOKENS
+)
+summary_queue = BackgroundQueue("summary", SUMMARY_QUEUE_SIZE, SUMMARY_WORKERS)
+
+# Deferred judge jobs; drops work when full instead of queueing unboundedly
+judge_queue = BackgroundQueue("judge", JUDGE_QUEUE_SIZE, JUDGE_WORKERS)
+
+# Identical concurrent requests (or steps, see COALESCE_STEPS) share one execution
+_chain_flights = SingleFlight("chain")
+_step_flights = SingleFlight("step")
+
+# Caps concurrent chains; excess requests queue briefly, then get 429/503
+admission = AdmissionController(MAX_CONCURRENT_CHAINS, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+
+# Separately sized stages so slow retrieval/generation can't starve the fast
+# classification steps; steps not listed run in the fast stage
+_fast_stage = Stage("fast", FAST_STAGE_CONCURRENCY)
+_slow_stage = Stage("slow", SLOW_STAGE_CONCURRENCY)
+_SLOW_STEPS = frozenset({"Search LD Docs", "Generate Response"})
+
+# Set by batch runs: retrieval results are then shared across every item of the batch
+retrieval_scope: ContextVar[SingleFlight | None] = ContextVar("retrieval_scope", default=None)
 
 
 def _run_step(span_name: str, fn, parent_ctx):
@@ -43,16 +163,338 @@ def _run_step(span_name: str, fn, parent_ctx):
         otel_context.detach(ctx)
 
 
-async def run_chain_stream(req: ChatRequest) -> AsyncGenerator[str, None]:
-    """Execute the chain, yielding SSE events for each step."""
-    ld_context = Context.create(req.session_id)
+def _stage(span_name: str) -> Stage:
+    return _slow_stage if span_name in _SLOW_STEPS else _fast_stage
+
 
-    history = _sessions[req.session_id]
+def shutdown_stages() -> None:
+    for stage in (_fast_stage, _slow_stage):
+        stage.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _call_step(span_name: str, parent_ctx, sync_fn, async_fn, *args):
+    """Run one chain step as a child span of parent_ctx.
+
+    In "async" mode the coroutine runs on the event loop, holding a slot in its
+    stage, and the span is parented directly via contextvars; in "thread" mode
+    the sync function runs on its stage's executor.
+    """
+    stage = _stage(span_name)
+    start = time.perf_counter()
+    try:
+        if CHAIN_EXECUTION_MODE == "async":
+            async with stage.semaphore:
+                executor_queue_wait.observe(time.perf_counter() - start, span_name)
+                with _tracer.start_as_current_span(span_name, context=parent_ctx):
+                    return await async_fn(*args)
+
+        def run():
+            executor_queue_wait.observe(time.perf_counter() - start, span_name)
+            return _run_step(span_name, lambda: sync_fn(*args), parent_ctx)
+
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(stage.executor, context.run, run)
+    finally:
+        step_duration.observe(time.perf_counter() - start, span_name)
+
+
+def _search_docs(parent_ctx, query: str, ld_context: Context, deadline: Deadline) -> Awaitable[list[dict]]:
+    """Retrieval for query within its share of deadline, coalesced when configured."""
+    search = partial(_call_step, "Search LD Docs", parent_ctx, retrieve_docs, aretrieve_docs, query, ld_context)
+    flights = retrieval_scope.get()
+    if flights is None and "retrieval" in COALESCE_STEPS:
+        flights = _step_flights
+    if flights is not None:
+        backend = ld_client.variation(RETRIEVAL_BACKEND_FLAG, ld_context, "web")
+        key = flight_key("retrieval", backend, RetrievalCache.normalize(query))
+        search = partial(flights.call, key, search)
+    return guarded("retrieval", deadline, search, [])
+
+
+def _consume(task: asyncio.Future) -> None:
+    # Mark a discarded task's exception as retrieved so asyncio doesn't log it
+    if not task.cancelled():
+        task.exception()
+
+
+class _Speculation:
+    """Search query and retrieval started before routing, betting on the "search" route.
+
+    Exactly one of :meth:`use` or :meth:`discard` should be called; tasks left
+    behind (e.g. a failed classification) run out within the chain deadline.
+    """
+
+    def __init__(self, mode: str, query: Awaitable[str], search):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.query = asyncio.ensure_future(query)
+        self.documents = asyncio.ensure_future(self._retrieve(search))
+        for task in (self.query, self.documents):
+            task.add_done_callback(_consume)
+
+    async def _retrieve(self, search) -> list[dict]:
+        return await search(await self.query)
+
+    def use(self) -> str:
+        speculations.inc(1, self.mode, "used")
+        return "used"
+
+    def discard(self, outcome: str) -> str:
+        self.query.cancel()
+        self.documents.cancel()
+        speculations.inc(1, self.mode, outcome)
+        speculation_wasted.observe(time.perf_counter() - self.started, self.mode)
+        return outcome
+
+
+async def _raw_query(message: str) -> str:
+    return message
+
+
+def _speculate(
+    mode: str,
+    message: str,
+    history: list[dict],
+    ld_context: Context,
+    snapshot: ChainConfigSnapshot,
+    parent_ctx,
+    deadline: Deadline,
+) -> _Speculation:
+    if mode == "rewrite":
+        # Intent and entities aren't known yet; the rewriter works from the message and history
+        rewrite = partial(
+            _call_step, "Rewrite Search Query", parent_ctx, rewrite_query, arewrite_query, message, "general", [], history, ld_context, snapshot
+        )
+        query = guarded("rewriter", deadline, rewrite, message)
+    else:
+        query = _raw_query(message)
+    return _Speculation(mode, query, lambda q: _search_docs(parent_ctx, q, ld_context, deadline))
+
+
+def _judge_mode(ld_context: Context) -> str:
+    """Resolve the judge mode for this request to "inline", "deferred" or "skipped"."""
+    mode = ld_client.variation(JUDGE_MODE_FLAG, ld_context, "inline")
+    if mode == "sampled":
+        rate = ld_client.variation(JUDGE_SAMPLE_RATE_FLAG, ld_context, 0.1)
+        return "deferred" if random.random() < rate else "skipped"
+    return mode if mode in ("inline", "deferred") else "inline"
+
+
+def _set_quality_attributes(span, quality: dict) -> None:
+    span.set_attribute("chain.quality.relevance", quality.get("relevance", 0.0))
+    span.set_attribute("chain.quality.faithfulness", quality.get("faithfulness", 0.0))
+    span.set_attribute("chain.quality.passed", quality.get("pass", False))
+
+
+def _quality_metadata(quality: dict, status: str) -> QualityMetadata:
+    return QualityMetadata(
+        relevance=quality.get("relevance", 0.0),
+        faithfulness=quality.get("faithfulness", 0.0),
+        passed=quality.get("pass", True),
+        status=status,
+    )
+
+
+async def _deferred_judge(
+    parent_ctx,
+    user_message: str,
+    reply: str,
+    packed: PackedContext,
+    ld_context: Context,
+    snapshot: ChainConfigSnapshot,
+    on_judged=None,
+) -> dict:
+    """Judge a response from the background queue, recording the score on its own span."""
+    with _tracer.start_as_current_span("Deferred Quality Check", context=parent_ctx) as span:
+        judge = partial(
+            _call_step, "Judge Quality", otel_context.get_current(), judge_quality, ajudge_quality, user_message, reply, packed, ld_context, snapshot
+        )
+        quality = await guarded("judge", Deadline(CHAIN_DEADLINE), judge)
+        _set_quality_attributes(span, quality)
+    if on_judged is not None:
+        on_judged(quality)
+    return quality
+
+
+def _cache_answer(query_vector, generator_version: str, reply: str, documents: list[dict], quality: dict) -> None:
+    """Store a judged answer in the semantic cache if it passed."""
+    if not quality.get("pass", False):
+        return
+    semantic_cache.store(
+        query_vector,
+        generator_version,
+        CachedAnswer(
+            reply=reply,
+            documents=[{"title": d.get("title", ""), "url": d.get("url", "")} for d in documents],
+            quality=quality,
+        ),
+    )
+
+
+def _pack_context(parent_ctx, query: str, documents: list[dict]) -> PackedContext:
+    """Dedupe and rank retrieved documents once for the generator and judge."""
+    with _tracer.start_as_current_span("Pack Context", context=parent_ctx) as span:
+        packed = pack_context(query, documents)
+        span.set_attribute("context.documents_in", len(documents))
+        span.set_attribute("context.documents", len(packed.documents))
+        span.set_attribute("context.passages", len(packed.passages))
+        span.set_attribute("context.tokens", sum(p.tokens for p in packed.passages))
+    return packed
+
+
+async def _stream_step(
+    span_name: str, parent_ctx, deltas: AsyncIterator[str], timeout: float | None = None
+) -> AsyncGenerator[str, None]:
+    """Relay a streaming step's deltas inside one child span of parent_ctx.
+
+    The span context is only current while awaiting the next delta, so
+    events can be yielded between deltas without leaking it to the caller.
+    Raises TimeoutError once the whole stream has taken longer than timeout.
+    """
+    start = time.perf_counter()
+    expires = time.monotonic() + timeout if timeout is not None else None
+    stage = _stage(span_name)
+    await stage.semaphore.acquire()
+    executor_queue_wait.observe(time.perf_counter() - start, span_name)
+    span = _tracer.start_span(span_name, context=parent_ctx)
+    span_ctx = trace.set_span_in_context(span, parent_ctx)
+    try:
+        while True:
+            token = otel_context.attach(span_ctx)
+            try:
+                if expires is None:
+                    delta = await anext(deltas)
+                else:
+                    delta = await asyncio.wait_for(anext(deltas), max(0.0, expires - time.monotonic()))
+            except StopAsyncIteration:
+                break
+            except TimeoutError:
+                await deltas.aclose()
+                raise
+            finally:
+                otel_context.detach(token)
+            yield delta
+    except Exception as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        span.end()
+        stage.semaphore.release()
+        step_duration.observe(time.perf_counter() - start, span_name)
+
+
+@dataclass(slots=True)
+class _Outcome:
+    """What one chain execution produced, independent of who is subscribed to it."""
+
+    intent: str
+    entities: list[str]
+    reply: str
+    documents: list[dict]
+    quality: dict
+    quality_status: str
+    deferred_quality: asyncio.Future | None
+    generated: bool
+    # Parent-span attributes describing how the execution ran
+    attributes: dict
+    trace_id: int
+
+
+def _chain_flight_key(message: str, history: list[dict], ld_context: Context, snapshot: ChainConfigSnapshot) -> str:
+    """Requests share an execution only if every input and flag/config variation matches."""
+    flags = {
+        flag: ld_client.variation(flag, ld_context, None)
+        for flag in (
+            FAST_PATH_THRESHOLD_FLAG,
+            FUSED_ROUTING_FLAG,
+            JUDGE_MODE_FLAG,
+            JUDGE_SAMPLE_RATE_FLAG,
+            RETRIEVAL_BACKEND_FLAG,
+            SPECULATIVE_RETRIEVAL_FLAG,
+        )
+    }
+    # Evaluates every chain config, so requests in different variations never share
+    return flight_key(RetrievalCache.normalize(message), history, snapshot.versions(), flags)
+
+
+def request_priority(req: ChatRequest) -> int:
+    """Admission priority for a request's LD context."""
+    return ld_client.variation(ADMISSION_PRIORITY_FLAG, Context.create(req.session_id), 0)
+
+
+class ResyncRequired(Exception):
+    """The request's history_version doesn't match the session's stored history.
+
+    Maps to HTTP 409; the client resends the full conversation_history.
+    """
+
+
+async def resolve_history(req: ChatRequest) -> tuple[list[dict], int]:
+    """The conversation so far: the client's full history if sent, else the stored one.
+
+    Returns (history, start), start being the index of history[0] in the whole
+    conversation (the stored history drops old turns). Raises ResyncRequired
+    when the client sent a history_version instead and the stored history has
+    changed or expired since.
+    """
     if req.conversation_history:
-        history = [{"role": m.role, "content": m.content} for m in req.conversation_history]
+        return [{"role": m.role, "content": m.content} for m in req.conversation_history], 0
+    history, start = await _sessions.history(req.session_id)
+    if req.history_version is not None and req.history_version != history_version(history):
+        raise ResyncRequired("Conversation history is out of sync; resend the full conversation_history")
+    return history, start
+
+
+async def chain_events(
+    req: ChatRequest, history: tuple[list[dict], int] | None = None, persist: bool = True
+) -> AsyncGenerator[ChainEvent, None]:
+    """Execute the chain, yielding typed events for each step, then the result.
+
+    history is the request's :func:`resolve_history`, if the caller already
+    resolved it. With persist=False the exchange is one-off: the session
+    history isn't stored or summarized and no feedback tracker is kept, so
+    the result has no history_version and feedback on it isn't tracked.
+    """
+    chains_in_flight.inc()
+    try:
+        if history is None:
+            history = await resolve_history(req)
+        async for event in _chain_events(req, *history, persist):
+            yield event
+    finally:
+        chains_in_flight.dec()
+
+
+async def run_chain_stream(
+    req: ChatRequest,
+    history: tuple[list[dict], int] | None = None,
+    on_result: Callable[[], None] | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """Execute the chain, yielding an SSE frame for each event.
+
+    on_result is called once the result frame has been yielded, e.g. to
+    release the request's admission ticket while the stream waits on a
+    deferred quality score.
+    """
+    async for event in chain_events(req, history):
+        yield encode_sse(event)
+        if on_result is not None and isinstance(event, ResultEvent):
+            on_result()
+
+
+async def _chain_events(
+    req: ChatRequest, full_history: list[dict], start: int, persist: bool = True
+) -> AsyncGenerator[ChainEvent, None]:
+    ld_context = Context.create(req.session_id)
+    # Each chain AI Config is evaluated at most once for this request, on first use
+    snapshot = ChainConfigSnapshot(ld_context)
+
+    # Older turns are replaced by the session's cached rolling summary, if any;
+    # each step then fits the rest into its own token budget.
+    history = history_manager.prepare(req.session_id, full_history, start)
 
     # Create parent span that lives for the entire chain.
-    # We manage it manually so we can yield SSE events between child spans.
+    # We manage it manually so we can yield events between child spans.
     parent_span = _tracer.start_span(
         "Support Chat Request",
         attributes={
@@ -63,114 +505,375 @@ async def run_chain_stream(req: ChatRequest) -> AsyncGenerator[str, None]:
     parent_ctx = trace.set_span_in_context(parent_span)
 
     try:
-        # Step 1: Intent classification
-        yield _sse("step", {"step": "intent", "status": "running", "label": "Classifying intent..."})
-        intent_result = await asyncio.to_thread(
-            lambda: _run_step("Classify Intent", lambda: classify_intent(req.message, ld_context), parent_ctx)
+        if "chain" in COALESCE_STEPS:
+            # Identical concurrent requests attach to one execution and replay its events
+            key = _chain_flight_key(req.message, history, ld_context, snapshot)
+            events = _chain_flights.stream(
+                key, lambda: _execute_chain(req.message, history, ld_context, snapshot, parent_ctx)
+            )
+        else:
+            events = _execute_chain(req.message, history, ld_context, snapshot, parent_ctx)
+
+        outcome = None
+        async for event in events:
+            if isinstance(event, _Outcome):
+                outcome = event
+            else:
+                yield event
+
+        parent_span.set_attributes(outcome.attributes)
+        if outcome.trace_id != parent_span.get_span_context().trace_id:
+            # The step spans live in the trace of the request that ran the chain
+            parent_span.set_attribute("chain.coalesced_from", format(outcome.trace_id, "032x"))
+        parent_span.set_attribute("chain.intent", outcome.intent)
+        parent_span.set_attribute("chain.entities", outcome.entities)
+        if outcome.quality_status == "complete":
+            _set_quality_attributes(parent_span, outcome.quality)
+        parent_span.set_attribute("retrieval.doc_count", len(outcome.documents))
+        parent_span.set_attribute("response.length", len(outcome.reply))
+
+    finally:
+        # Only the configs this request evaluated (see ChainConfigSnapshot)
+        parent_span.set_attribute(
+            "chain.config_versions",
+            [f"{key}={version}" for key, version in snapshot.versions(evaluated_only=True).items()],
+        )
+        parent_span.end()
+
+    reply = outcome.reply
+    response_id = str(uuid.uuid4())
+    version = ""
+    if persist:
+        if outcome.generated:
+            # Each subscriber gets a tracker bound to its own context, so feedback is
+            # attributed per user; generation metrics were tracked once by the execution.
+            await _trackers.set(response_id, snapshot.step(GENERATOR_CONFIG_KEY).tracker)
+
+        # Update conversation history; a client-sent history replaces the stored
+        # one, so the client can send just the version next turn
+        version = await _sessions.append(
+            req.session_id,
+            Turn("user", req.message),
+            Turn("assistant", reply),
+            base=full_history if req.conversation_history else None,
+        )
+        _schedule_summary(
+            req.session_id,
+            [*full_history, {"role": "user", "content": req.message}, {"role": "assistant", "content": reply}],
+            start,
+            ld_context,
+            snapshot,
         )
+
+    sources = [
+        {"title": d.get("title", ""), "url": d.get("url", "")}
+        for d in outcome.documents
+        if d.get("url")
+    ]
+
+    result = ChatResponse(
+        reply=reply,
+        response_id=response_id,
+        intent=outcome.intent,
+        entities=outcome.entities,
+        quality=_quality_metadata(outcome.quality, outcome.quality_status),
+        sources=sources,
+        history_version=version,
+    )
+
+    yield ResultEvent(result)
+
+    if outcome.deferred_quality is not None:
+        # Keep the stream open briefly to push the deferred score as a follow-up event.
+        try:
+            quality = await asyncio.wait_for(
+                asyncio.shield(outcome.deferred_quality), JUDGE_DEFERRED_STREAM_TIMEOUT
+            )
+        except Exception:
+            # Timed out or the judge failed; the score still lands on the span if it completes.
+            return
+        yield QualityEvent(response_id, _quality_metadata(quality, "complete"))
+
+
+async def _execute_chain(
+    message: str,
+    history: list[dict],
+    ld_context: Context,
+    snapshot: ChainConfigSnapshot,
+    parent_ctx,
+) -> AsyncGenerator[StepEvent | DeltaEvent | _Outcome, None]:
+    """Run the chain steps, yielding step/delta events and finally an _Outcome.
+
+    Every step runs within its share of a CHAIN_DEADLINE budget; on expiry it
+    degrades (intent "general", route "search", the original message as the
+    query, no documents, judge skipped) instead of stalling the stream.
+    """
+    attributes = {}
+    deadline = Deadline(CHAIN_DEADLINE)
+
+    fast = None
+    if fast_path is not None:
+        threshold = ld_client.variation(FAST_PATH_THRESHOLD_FLAG, ld_context, 0.0)
+        if threshold > 0:
+            # Vague messages mid-conversation usually make sense given the history,
+            # so only the LLM router may ask for clarification then
+            fast = fast_path.classify(message, threshold, allow_clarify=not history)
+            attributes["chain.fast_path"] = fast is not None
+
+    speculation = None
+    if fast is None:
+        # Overlap the slow retrieval with the classification round trips
+        mode = ld_client.variation(SPECULATIVE_RETRIEVAL_FLAG, ld_context, "off")
+        if mode in ("rewrite", "raw"):
+            speculation = _speculate(mode, message, history, ld_context, snapshot, parent_ctx, deadline)
+            attributes["chain.speculation"] = mode
+
+    if fast is not None:
+        # Steps 1+2 answered locally: no intent or router LLM calls
+        intent = "general"
+        entities = []
+        route = fast.route
+        route_message = fast.reply
+        attributes["chain.routing_mode"] = "fast_path"
+        attributes["chain.fast_path.label"] = fast.label
+        attributes["chain.fast_path.confidence"] = fast.confidence
+        yield StepEvent("intent", "done", f"Intent: {intent}", {"intent": intent, "entities": entities})
+        yield StepEvent("router", "done", f"Route: {route} (fast path)")
+    elif ld_client.variation(FUSED_ROUTING_FLAG, ld_context, False):
+        # Steps 1+2 fused: one LLM call returns intent, entities and route
+        yield StepEvent("intent", "running", "Classifying intent...")
+        yield StepEvent("router", "running", "Deciding approach...")
+        classify = partial(
+            _call_step, "Classify And Route", parent_ctx, classify_and_route, aclassify_and_route, message, history, ld_context, snapshot
+        )
+        fused_result = await guarded("intent_router", deadline, classify, {})
+        intent = fused_result.get("intent", "general")
+        entities = fused_result.get("entities", [])
+        route = fused_result.get("route", "search")
+        route_message = fused_result.get("message", "")
+        attributes["chain.routing_mode"] = "fused"
+        yield StepEvent("intent", "done", f"Intent: {intent}", {"intent": intent, "entities": entities})
+        yield StepEvent("router", "done", f"Route: {route}")
+    else:
+        # Step 1: Intent classification (depends only on the message, so it can be
+        # shared across requests whose histories differ)
+        yield StepEvent("intent", "running", "Classifying intent...")
+        classify = partial(
+            _call_step, "Classify Intent", parent_ctx, classify_intent, aclassify_intent, message, ld_context, snapshot
+        )
+        if "intent" in COALESCE_STEPS:
+            version = snapshot.step(INTENT_CONFIG_KEY).version
+            classify = partial(_step_flights.call, flight_key("intent", version, message), classify)
+        intent_result = await guarded("intent", deadline, classify, {})
         intent = intent_result.get("intent", "general")
         entities = intent_result.get("entities", [])
-        yield _sse("step", {"step": "intent", "status": "done", "label": f"Intent: {intent}", "detail": {"intent": intent, "entities": entities}})
+        yield StepEvent("intent", "done", f"Intent: {intent}", {"intent": intent, "entities": entities})
 
         # Step 2: Route decision
-        yield _sse("step", {"step": "router", "status": "running", "label": "Deciding approach..."})
-        route_result = await asyncio.to_thread(
-            lambda: _run_step("Route Query", lambda: route_query(req.message, intent, entities, history, ld_context), parent_ctx)
+        yield StepEvent("router", "running", "Deciding approach...")
+        decide = partial(
+            _call_step, "Route Query", parent_ctx, route_query, aroute_query, message, intent, entities, history, ld_context, snapshot
         )
+        route_result = await guarded("router", deadline, decide, {})
         route = route_result.get("route", "search")
         route_message = route_result.get("message", "")
-        parent_span.set_attribute("chain.route", route)
-        yield _sse("step", {"step": "router", "status": "done", "label": f"Route: {route}"})
-
-        response_id = str(uuid.uuid4())
-        reply = ""
-        documents = []
-        quality = {"relevance": 1.0, "faithfulness": 1.0, "pass": True}
-
-        if route in ("direct", "clarify"):
-            # Short-circuit: respond directly without doc search
-            reply = route_message
-            parent_span.set_attribute("chain.intent", intent)
-            parent_span.set_attribute("chain.entities", entities)
-            parent_span.set_attribute("retrieval.doc_count", 0)
-            parent_span.set_attribute("response.length", len(reply))
-
+        attributes["chain.routing_mode"] = "split"
+        yield StepEvent("router", "done", f"Route: {route}")
+
+    attributes["chain.route"] = route
+    routes.inc(1, route)
+
+    reply = ""
+    documents = []
+    packed = EMPTY_CONTEXT
+    quality = {"relevance": 1.0, "faithfulness": 1.0, "pass": True}
+    quality_status = "complete"
+    deferred_quality = None
+    generated = False
+
+    if route in ("direct", "clarify"):
+        # Short-circuit: respond directly without doc search
+        reply = route_message
+        if speculation is not None:
+            attributes["chain.speculation.outcome"] = speculation.discard("wasted_route")
+
+    else:
+        # Full search chain: rewrite → retrieve → generate → judge
+
+        # Step 3: Query rewriting
+        yield StepEvent("rewrite", "running", "Rewriting search query...")
+        if speculation is not None:
+            search_query = await speculation.query
         else:
-            # Full search chain: rewrite → retrieve → generate → judge
-
-            # Step 3: Query rewriting
-            yield _sse("step", {"step": "rewrite", "status": "running", "label": "Rewriting search query..."})
-            search_query = await asyncio.to_thread(
-                lambda: _run_step("Rewrite Search Query", lambda: rewrite_query(req.message, intent, entities, history, ld_context), parent_ctx)
+            rewrite = partial(
+                _call_step, "Rewrite Search Query", parent_ctx, rewrite_query, arewrite_query, message, intent, entities, history, ld_context, snapshot
             )
-            yield _sse("step", {"step": "rewrite", "status": "done", "label": f"Query: {search_query}"})
-
-            # Step 4: Document retrieval
-            yield _sse("step", {"step": "retrieval", "status": "running", "label": "Searching LaunchDarkly docs..."})
-            documents = await asyncio.to_thread(
-                lambda: _run_step("Search LD Docs", lambda: retrieve_docs(search_query), parent_ctx)
+            search_query = await guarded("rewriter", deadline, rewrite, message)
+        yield StepEvent("rewrite", "done", f"Query: {search_query}")
+
+        # Step 3b: Semantic answer cache for near-duplicate questions
+        cached_answer = None
+        if semantic_cache is not None:
+            generator_version = generator_config_version(ld_context, snapshot)
+            lookup = partial(
+                _call_step, "Semantic Cache Lookup", parent_ctx, semantic_cache.lookup, semantic_cache.alookup, search_query, intent, generator_version
             )
-            yield _sse("step", {"step": "retrieval", "status": "done", "label": f"Found {len(documents)} source(s)"})
+            try:
+                cached_answer, query_vector = await guarded("semantic_cache", deadline, lookup, (None, None))
+            except Exception:
+                # The cache is optional: an embedder failure is a miss, not a failed chat
+                logger.warning("semantic cache lookup failed; continuing without it", exc_info=True)
+                semantic_cache.record_failure()
+                cached_answer, query_vector = None, None
+            attributes["chain.semantic_cache_hit"] = cached_answer is not None
+
+        if cached_answer is not None:
+            reply = cached_answer.reply
+            documents = cached_answer.documents
+            quality = cached_answer.quality
+            if speculation is not None:
+                attributes["chain.speculation.outcome"] = speculation.discard("wasted_cache")
+            yield StepEvent("retrieval", "done", "Answered from cache")
+            yield DeltaEvent(reply)
+        else:
+            # Step 4: Document retrieval
+            yield StepEvent("retrieval", "running", "Searching LaunchDarkly docs...")
+            if speculation is not None:
+                retrieved = await speculation.documents
+                attributes["chain.speculation.outcome"] = speculation.use()
+            else:
+                retrieved = await _search_docs(parent_ctx, search_query, ld_context, deadline)
+            packed = _pack_context(parent_ctx, search_query, retrieved)
+            documents = packed.documents
+            yield StepEvent("retrieval", "done", f"Found {len(documents)} source(s)")
 
             # Step 5: Response generation
-            yield _sse("step", {"step": "generate", "status": "running", "label": "Generating response..."})
-            reply, generator_tracker = await asyncio.to_thread(
-                lambda: _run_step("Generate Response", lambda: generate_response(req.message, intent, entities, documents, history, ld_context), parent_ctx)
-            )
-            if generator_tracker is not None:
-                _trackers[response_id] = generator_tracker
-            yield _sse("step", {"step": "generate", "status": "done", "label": "Response ready"})
+            yield StepEvent("generate", "running", "Generating response...")
+            if CHAIN_EXECUTION_MODE == "async":
+                deltas, generator_tracker = stream_response(
+                    message, intent, entities, packed, history, ld_context, snapshot
+                )
+                parts = []
+                try:
+                    async for delta in _stream_step(
+                        "Generate Response", parent_ctx, deltas, deadline.timeout("generator")
+                    ):
+                        parts.append(delta)
+                        yield DeltaEvent(delta)
+                except TimeoutError:
+                    # Keep whatever was streamed before the deadline
+                    step_timeouts.inc(1, "generator")
+                    deadline.degraded.append("generator")
+                if parts:
+                    reply = "".join(parts)
+                else:
+                    reply = _TIMEOUT_REPLY if "generator" in deadline.degraded else "I couldn't generate a response."
+            else:
+                generate = partial(
+                    _call_step, "Generate Response", parent_ctx, generate_response, agenerate_response, message, intent, entities, packed, history, ld_context, snapshot
+                )
+                reply, generator_tracker = await guarded("generator", deadline, generate, (_TIMEOUT_REPLY, None))
+                yield DeltaEvent(reply)
+            generated = generator_tracker is not None
+            yield StepEvent("generate", "done", "Response ready")
+
+            # Only answers that pass the judge are stored in the semantic cache
+            on_judged = None
+            if semantic_cache is not None and query_vector is not None and "generator" not in deadline.degraded:
+                on_judged = partial(_cache_answer, query_vector, generator_version, reply, documents)
 
             # Step 6: Quality check
-            yield _sse("step", {"step": "judge", "status": "running", "label": "Checking quality..."})
-            quality = await asyncio.to_thread(
-                lambda: _run_step("Judge Quality", lambda: judge_quality(req.message, reply, documents, ld_context), parent_ctx)
-            )
-            passed = quality.get("pass", False)
-            yield _sse("step", {"step": "judge", "status": "done", "label": f"Quality: {'PASS' if passed else 'FAIL'}"})
+            judge_mode = _judge_mode(ld_context)
+            attributes["chain.judge_mode"] = judge_mode
+            if judge_mode == "inline":
+                yield StepEvent("judge", "running", "Checking quality...")
+                judge = partial(
+                    _call_step, "Judge Quality", parent_ctx, judge_quality, ajudge_quality, message, reply, packed, ld_context, snapshot
+                )
+                judged = await guarded("judge", deadline, judge, None)
+                if judged is None:
+                    quality_status = "skipped"
+                    yield StepEvent("judge", "done", "Quality: skipped (timed out)")
+                else:
+                    quality = judged
+                    passed = quality.get("pass", False)
+                    if on_judged is not None:
+                        on_judged(quality)
+                    yield StepEvent("judge", "done", f"Quality: {'PASS' if passed else 'FAIL'}")
+            else:
+                if judge_mode == "deferred":
+                    judge_args = (parent_ctx, message, reply, packed, ld_context, snapshot, on_judged)
+                    deferred_quality = judge_queue.submit(lambda: _deferred_judge(*judge_args))
+                quality_status = "pending" if deferred_quality is not None else "skipped"
+                yield StepEvent("judge", "done", f"Quality: {quality_status}")
+
+    if deadline.degraded:
+        attributes["chain.degraded_steps"] = deadline.degraded
+
+    yield _Outcome(
+        intent=intent,
+        entities=entities,
+        reply=reply,
+        documents=documents,
+        quality=quality,
+        quality_status=quality_status,
+        deferred_quality=deferred_quality,
+        generated=generated,
+        attributes=attributes,
+        trace_id=trace.get_current_span(parent_ctx).get_span_context().trace_id,
+    )
 
-            parent_span.set_attribute("chain.intent", intent)
-            parent_span.set_attribute("chain.entities", entities)
-            parent_span.set_attribute("chain.quality.relevance", quality.get("relevance", 0.0))
-            parent_span.set_attribute("chain.quality.faithfulness", quality.get("faithfulness", 0.0))
-            parent_span.set_attribute("chain.quality.passed", quality.get("pass", False))
-            parent_span.set_attribute("retrieval.doc_count", len(documents))
-            parent_span.set_attribute("response.length", len(reply))
 
-    finally:
-        parent_span.end()
+def _schedule_summary(
+    session_id: str, history: list[dict], start: int, ld_context: Context, snapshot: ChainConfigSnapshot
+) -> None:
+    """Fold older turns into the session summary in the background once history grows."""
+    pending = history_manager.pending_fold(session_id, history, start)
+    if pending is None:
+        return
+    previous, turns, covered = pending
+
+    async def job() -> None:
+        try:
+            with _tracer.start_as_current_span("Summarize History", attributes={"session.id": session_id}):
+                if CHAIN_EXECUTION_MODE == "async":
+                    text = await asummarize_history(previous, turns, ld_context, snapshot)
+                else:
+                    text = await asyncio.to_thread(summarize_history, previous, turns, ld_context, snapshot)
+        except Exception:
+            history_manager.abandon(session_id)
+            raise
+        if text is None:
+            history_manager.abandon(session_id)
+        else:
+            history_manager.update(session_id, history, text, covered, start)
 
-    # Update conversation history
-    _sessions[req.session_id].append({"role": "user", "content": req.message})
-    _sessions[req.session_id].append({"role": "assistant", "content": reply})
+    if summary_queue.submit(job) is None:
+        history_manager.abandon(session_id)
 
-    sources = [
-        {"title": d.get("title", ""), "url": d.get("url", "")}
-        for d in documents
-        if d.get("url")
-    ]
 
-    result = ChatResponse(
-        reply=reply,
-        response_id=response_id,
-        intent=intent,
-        entities=entities,
-        quality=QualityMetadata(
-            relevance=quality.get("relevance", 0.0),
-            faithfulness=quality.get("faithfulness", 0.0),
-            passed=quality.get("pass", True),
-        ),
-        sources=sources,
-    )
+async def store_stats() -> dict:
+    """Current size and eviction gauges for the state stores and the retrieval cache."""
+    return {
+        "sessions": await _sessions.stats(),
+        "trackers": await _trackers.stats(),
+        "admission": admission.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+    }
+
 
-    yield _sse("result", result.model_dump())
+async def close_stores() -> None:
+    """Close the state stores' and the retrieval cache's connections."""
+    await _sessions.close()
+    await _trackers.close()
+    retrieval_cache.close()
 
 
-def submit_feedback(response_id: str, kind: str) -> bool:
+async def submit_feedback(response_id: str, kind: str) -> bool:
     """Submit feedback for a previous response. Returns True if tracked successfully."""
     from ldai.tracker import FeedbackKind
 
-    tracker = _trackers.pop(response_id, None)
+    tracker = await _trackers.pop(response_id, None)
     if tracker is None:
         return False
 
@@ -188,11 +891,14 @@ def submit_feedback(response_id: str, kind: str) -> bool:
     return True
 
 
-async def run_chain(req: ChatRequest) -> ChatResponse:
-    """Non-streaming fallback."""
+async def run_chain(req: ChatRequest, history: tuple[list[dict], int] | None = None) -> ChatResponse:
+    """Non-streaming fallback: the result event's response, without encoding any events."""
     result = None
-    async for event_str in run_chain_stream(req):
-        if event_str.startswith("event: result"):
-            data_line = event_str.split("data: ", 1)[1].strip()
-            result = ChatResponse.model_validate_json(data_line)
+    events = chain_events(req, history)
+    async for event in events:
+        if isinstance(event, ResultEvent):
+            result = event.response
+            # Don't wait on deferred follow-up events.
+            break
+    await events.aclose()
     return result
@@ -0,0 +1,104 @@
+"""Evaluated AI Configs with pre-compiled prompt templates."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from ldclient.context import Context
+from ldai import AICompletionConfigDefault
+
+from app.config import PROMPT_LAYOUT, ai_client
+from app.chain.tracking import config_version
+
+# Variables are evaluated as "\x1f<name>\x1f" placeholders, which survive the
+# SDK's mustache rendering (and its HTML escaping) untouched, then substituted
+# per request by plain string joins.
+_MARK = "\x1f"
+
+
+@lru_cache(maxsize=512)
+def _compile(key: str, version: str, messages: tuple[tuple[str, str], ...]) -> tuple[tuple[str, tuple[str, ...]], ...]:
+    """Split each message into alternating literal / variable-name parts.
+
+    Cached per config key and variation version (and the placeholder-rendered
+    text, which can differ per context when a prompt uses ``ldctx``).
+    """
+    return tuple((role, tuple(content.split(_MARK))) for role, content in messages)
+
+
+def _reference(name: str) -> str:
+    return f"({name}: see the request context below)"
+
+
+def prompt_layout(config) -> str:
+    """"prefix" or "inline", from the AI Config's "prompt_layout" parameter or PROMPT_LAYOUT."""
+    layout = config.model.get_parameter("prompt_layout") or PROMPT_LAYOUT
+    return layout if layout in ("prefix", "inline") else "inline"
+
+
+class StepConfig:
+    """One evaluated AI Config: model, tracker and a ready-to-render message prefix."""
+
+    __slots__ = ("key", "enabled", "model", "tracker", "version", "_template")
+
+    def __init__(self, key: str, config):
+        self.key = key
+        self.enabled = config.enabled
+        self.model = config.model
+        self.tracker = config.tracker
+        self.version = config_version(config) if config.tracker is not None else ""
+        messages = tuple((m.role, m.content) for m in (config.messages or ()))
+        self._template = _compile(key, self.version, messages)
+
+    def render(self, **variables: str) -> list[dict]:
+        """Return a fresh message list with variables substituted."""
+        messages = []
+        for role, parts in self._template:
+            if len(parts) == 1:
+                content = parts[0]
+            else:
+                content = "".join(
+                    part if i % 2 == 0 else variables.get(part, "") for i, part in enumerate(parts)
+                )
+            messages.append({"role": role, "content": content})
+        return messages
+
+    def render_prefix(self, **variables: str) -> tuple[list[dict], dict | None]:
+        """Return (static messages, context message) for a cache-friendly layout.
+
+        The static messages are identical for every request with this
+        variation: each variable is replaced by a fixed reference, and its
+        value goes in the context message instead, which callers place after
+        history, just before the user message, so the provider can reuse its
+        cached prefix. The context message is None when the template has no
+        variables.
+        """
+        messages = []
+        names: list[str] = []
+        for role, parts in self._template:
+            if len(parts) == 1:
+                content = parts[0]
+            else:
+                names.extend(part for part in parts[1::2] if part not in names)
+                content = "".join(part if i % 2 == 0 else _reference(part) for i, part in enumerate(parts))
+            messages.append({"role": role, "content": content})
+        if not names:
+            return messages, None
+        context = "\n\n".join(f"{name}:\n{variables.get(name, '')}" for name in names)
+        return messages, {"role": "system", "content": f"Request context\n\n{context}"}
+
+
+def evaluate(
+    key: str,
+    default: AICompletionConfigDefault,
+    variable_names: tuple[str, ...],
+    context: Context,
+) -> StepConfig:
+    """Evaluate an AI Config for context with placeholder variables."""
+    config = ai_client.completion_config(
+        key,
+        context,
+        default,
+        variables={name: f"{_MARK}{name}{_MARK}" for name in variable_names},
+    )
+    return StepConfig(key, config)
@@ -0,0 +1,187 @@
+"""Step deadlines with degraded fallbacks, hedged requests and a global retry budget."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+import numpy as np
+import openai
+
+from app.config import (
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGE_STEPS,
+    RETRY_BUDGET_MIN_PER_SECOND,
+    RETRY_BUDGET_RATIO,
+    STEP_MAX_RETRIES,
+    STEP_TIMEOUTS,
+)
+from app.chain.metrics import retries_denied, step_hedges, step_retries, step_timeouts
+
+T = TypeVar("T")
+
+# Sentinel fallback: re-raise TimeoutError instead of degrading
+RAISE: Any = object()
+
+_RETRYABLE = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class Deadline:
+    """An end-to-end time budget that bounds each step's own timeout.
+
+    ``degraded`` lists the steps that fell back to their degraded output.
+    """
+
+    __slots__ = ("expires", "degraded")
+
+    def __init__(self, budget: float):
+        self.expires = time.monotonic() + budget
+        self.degraded: list[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, step: str) -> float:
+        return min(STEP_TIMEOUTS.get(step, float("inf")), self.remaining())
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of traffic.
+
+    Each call deposits ``ratio`` tokens and the bucket refills at
+    ``min_per_second`` so low-traffic periods can still retry; a retry or
+    hedge spends one token. Only touched from the event loop.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, capacity: float | None = None):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity if capacity is not None else max(10.0, min_per_second * 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class LatencyWindow:
+    """Recent successful latencies per step, for the hedging threshold."""
+
+    def __init__(self, percentile: float, min_samples: int, size: int = 512):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.size = size
+        self._samples: dict[str, deque[float]] = {}
+        self._thresholds: dict[str, float] = {}
+        self._since_update: dict[str, int] = {}
+
+    def observe(self, step: str, seconds: float) -> None:
+        samples = self._samples.get(step)
+        if samples is None:
+            samples = self._samples[step] = deque(maxlen=self.size)
+        samples.append(seconds)
+        # Recompute the percentile every few samples rather than per call
+        count = self._since_update.get(step, 0) + 1
+        if count >= 16 and len(samples) >= self.min_samples:
+            self._thresholds[step] = float(np.percentile(np.fromiter(samples, dtype=np.float64), self.percentile))
+            count = 0
+        self._since_update[step] = count
+
+    def threshold(self, step: str) -> float | None:
+        return self._thresholds.get(step)
+
+
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND)
+latencies = LatencyWindow(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+
+
+async def _hedged(step: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run call; if it outlives the step's latency percentile, race a duplicate."""
+    delay = latencies.threshold(step)
+    if delay is None:
+        return await call()
+    first = asyncio.ensure_future(call())
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+    except asyncio.CancelledError:
+        # asyncio.wait doesn't cancel what it waits on (e.g. when guarded() times out)
+        first.cancel()
+        raise
+    if done:
+        return first.result()
+    if not retry_budget.withdraw():
+        retries_denied.inc(1, step)
+        return await first
+    step_hedges.inc(1, step)
+    pending = {first, asyncio.ensure_future(call())}
+    try:
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return task.result()
+            if not pending:
+                return done.pop().result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def guarded(step: str, deadline: Deadline, call: Callable[[], Awaitable[T]], fallback: T = RAISE) -> T:
+    """Await call() within the step's share of deadline.
+
+    On expiry, returns fallback (the step's degraded output) or raises
+    TimeoutError if there is none. Transient OpenAI errors are retried with
+    jittered backoff while the retry budget and the deadline allow. call must
+    return a fresh awaitable each time it is invoked.
+    """
+    expires = time.monotonic() + deadline.timeout(step)
+    attempt = 0
+    retry_budget.deposit()
+    while True:
+        remaining = expires - time.monotonic()
+        start = time.monotonic()
+        try:
+            if remaining <= 0:
+                raise TimeoutError
+            awaitable = _hedged(step, call) if step in HEDGE_STEPS else call()
+            result = await asyncio.wait_for(awaitable, remaining)
+        except TimeoutError:
+            step_timeouts.inc(1, step)
+            if fallback is RAISE:
+                raise
+            deadline.degraded.append(step)
+            return fallback
+        except _RETRYABLE:
+            if attempt >= STEP_MAX_RETRIES or not retry_budget.withdraw():
+                if attempt < STEP_MAX_RETRIES:
+                    retries_denied.inc(1, step)
+                raise
+            attempt += 1
+            step_retries.inc(1, step)
+            await asyncio.sleep(min(0.1 * 2**attempt * random.random(), max(0.0, expires - time.monotonic())))
+            continue
+        latencies.observe(step, time.monotonic() - start)
+        return result
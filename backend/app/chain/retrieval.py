@@ -1,27 +1,140 @@
-"""Span 3: Document retrieval via OpenAI web search."""
+"""Span 3: Document retrieval via OpenAI web search or a local docs index."""
 
 from __future__ import annotations
 
-from app.config import openai_client
+import asyncio
+import re
+import threading
+from pathlib import Path
+from typing import Protocol
 
+from ldclient.context import Context
+from opentelemetry import trace
 
-def retrieve_docs(query: str) -> list[dict]:
-    """Search LaunchDarkly docs using OpenAI Responses API with web_search tool.
+from app.config import (
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_TOP_K,
+    RETRIEVAL_CACHE_MAX_ENTRIES,
+    RETRIEVAL_CACHE_SQLITE_PATH,
+    RETRIEVAL_CACHE_TTL,
+    async_openai_client,
+    ld_client,
+    openai_client,
+)
+from app.chain.cache import SqliteCache, TTLCache
+from app.chain.local_index import LocalIndex
+from app.chain.metrics import retrieval_cache_lookups
 
-    Returns a list of {"title": str, "url": str, "content": str}.
-    OpenLLMetry auto-instruments this OpenAI call.
+# LD flag: retrieval backend per context, "web" (default) or "local"
+RETRIEVAL_BACKEND_FLAG = "chain-retrieval-backend"
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RetrievalCache:
+    """Retrieval results keyed on the normalized query: in-memory LRU over optional SQLite.
+
+    The async methods run SQLite reads and writes on a worker thread.
     """
-    response = openai_client.responses.create(
-        model="gpt-4o",
-        tools=[
+
+    def __init__(self, max_entries: int, ttl: float, sqlite_path: str = ""):
+        self.memory = TTLCache(max_entries, ttl)
+        self.disk = SqliteCache(sqlite_path, "retrieval_cache", ttl) if sqlite_path else None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", query.lower())).strip()
+
+    def get(self, query: str) -> list[dict] | None:
+        key = self.normalize(query)
+        documents = self.memory.get(key)
+        if documents is None and self.disk is not None:
+            return self._promote(key, self.disk.lookup(key))
+        return self._result(documents, "memory")
+
+    async def aget(self, query: str) -> list[dict] | None:
+        key = self.normalize(query)
+        documents = self.memory.get(key)
+        if documents is None and self.disk is not None:
+            return self._promote(key, await asyncio.to_thread(self.disk.lookup, key))
+        return self._result(documents, "memory")
+
+    def _promote(self, key: str, entry: tuple[list[dict], float] | None) -> list[dict] | None:
+        if entry is None:
+            return self._result(None, "sqlite")
+        documents, remaining = entry
+        # Keep the disk entry's expiry; a fresh TTL would serve stale results for longer
+        self.memory.put(key, documents, ttl=remaining)
+        return self._result(documents, "sqlite")
+
+    @staticmethod
+    def _result(documents: list[dict] | None, tier: str) -> list[dict] | None:
+        span = trace.get_current_span()
+        span.set_attribute("retrieval.cache_hit", documents is not None)
+        if documents is None:
+            retrieval_cache_lookups.inc(1, "miss")
+            return None
+        retrieval_cache_lookups.inc(1, tier)
+        span.set_attribute("retrieval.cache_tier", tier)
+        # Callers may mutate documents; never hand out the cached objects.
+        return [dict(d) for d in documents]
+
+    def put(self, query: str, documents: list[dict]) -> None:
+        if not documents:
+            return
+        key = self.normalize(query)
+        documents = [dict(d) for d in documents]
+        self.memory.put(key, documents)
+        if self.disk is not None:
+            self.disk.put(key, documents)
+
+    async def aput(self, query: str, documents: list[dict]) -> None:
+        if not documents:
+            return
+        key = self.normalize(query)
+        documents = [dict(d) for d in documents]
+        self.memory.put(key, documents)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, documents)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> dict:
+        stats = {
+            "entries": len(self.memory),
+            "hits": self.memory.hits,
+            "misses": self.memory.misses,
+            "evictions": self.memory.evictions,
+        }
+        if self.disk is not None:
+            stats["sqlite_hits"] = self.disk.hits
+            stats["sqlite_misses"] = self.disk.misses
+            stats["sqlite_expirations"] = self.disk.expirations
+        return stats
+
+
+retrieval_cache = RetrievalCache(
+    RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL, RETRIEVAL_CACHE_SQLITE_PATH
+)
+
+
+def _build_request(query: str) -> dict:
+    return {
+        "model": "gpt-4o",
+        "tools": [
             {
                 "type": "web_search_preview",
                 "search_context_size": "high",
             }
         ],
-        input=f"site:launchdarkly.com {query}",
-    )
+        "input": f"site:launchdarkly.com {query}",
+    }
+
 
+def _parse(response) -> list[dict]:
     documents = []
     content_text = ""
 
@@ -52,3 +165,107 @@ def retrieve_docs(query: str) -> list[dict]:
         documents[0]["content"] = content_text
 
     return documents
+
+
+class RetrievalBackend(Protocol):
+    """Returns documents shaped like {"title": str, "url": str, "content": str}."""
+
+    name: str
+
+    def retrieve(self, query: str) -> list[dict]: ...
+
+    async def aretrieve(self, query: str) -> list[dict]: ...
+
+
+class WebSearchBackend:
+    """Live site:launchdarkly.com web search via the Responses API, behind the retrieval cache."""
+
+    name = "web"
+
+    def retrieve(self, query: str) -> list[dict]:
+        cached = retrieval_cache.get(query)
+        if cached is not None:
+            return cached
+        documents = _parse(openai_client.responses.create(**_build_request(query)))
+        retrieval_cache.put(query, documents)
+        return documents
+
+    async def aretrieve(self, query: str) -> list[dict]:
+        cached = await retrieval_cache.aget(query)
+        if cached is not None:
+            return cached
+        documents = _parse(await async_openai_client.responses.create(**_build_request(query)))
+        await retrieval_cache.aput(query, documents)
+        return documents
+
+
+class LocalIndexBackend:
+    """Hybrid BM25/dense search over a memory-mapped index built by app.ingest_docs."""
+
+    name = "local"
+
+    def __init__(self, index_dir: str, top_k: int):
+        self.index_dir = index_dir
+        self.top_k = top_k
+        self._index: LocalIndex | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.index_dir)
+
+    def _load(self) -> LocalIndex:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = LocalIndex(Path(self.index_dir))
+        return self._index
+
+    def retrieve(self, query: str) -> list[dict]:
+        return self._load().search(query, self.top_k)
+
+    async def aretrieve(self, query: str) -> list[dict]:
+        # BM25 and the hashing embedder take milliseconds on the event loop; a
+        # remote dense embedder (--embedder openai) is awaited on the async client.
+        return await self._load().asearch(query, self.top_k)
+
+
+web_backend = WebSearchBackend()
+local_backend = LocalIndexBackend(LOCAL_INDEX_DIR, LOCAL_INDEX_TOP_K)
+
+
+def _select_backend(context: Context | None) -> RetrievalBackend:
+    if context is None or not local_backend.available:
+        return web_backend
+    name = ld_client.variation(RETRIEVAL_BACKEND_FLAG, context, "web")
+    return local_backend if name == "local" else web_backend
+
+
+def retrieve_docs(query: str, context: Context | None = None) -> list[dict]:
+    """Search LaunchDarkly docs with the backend the LD flag selects for context.
+
+    Returns a list of {"title": str, "url": str, "content": str}.
+    The web backend uses the OpenAI Responses API with the web_search tool
+    (auto-instrumented by OpenLLMetry) and is also the fallback when the local
+    index finds nothing.
+    """
+    backend = _select_backend(context)
+    span = trace.get_current_span()
+    span.set_attribute("retrieval.backend", backend.name)
+    documents = backend.retrieve(query)
+    if not documents and backend is not web_backend:
+        span.set_attribute("retrieval.fallback", True)
+        documents = web_backend.retrieve(query)
+    return documents
+
+
+async def aretrieve_docs(query: str, context: Context | None = None) -> list[dict]:
+    """Async variant of :func:`retrieve_docs`."""
+    backend = _select_backend(context)
+    span = trace.get_current_span()
+    span.set_attribute("retrieval.backend", backend.name)
+    documents = await backend.aretrieve(query)
+    if not documents and backend is not web_backend:
+        span.set_attribute("retrieval.fallback", True)
+        documents = await web_backend.aretrieve(query)
+    return documents
@@ -3,11 +3,23 @@
 from __future__ import annotations
 
 import json
+from typing import TYPE_CHECKING
 
 from ldclient.context import Context
 from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
 
-from app.config import ai_client, openai_client
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate
+from app.chain.memo import step_memo
+from app.chain.history import fit_history, history_budget
+from app.chain.tracking import atrack_openai_metrics, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-query-rewriter"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ("user_message", "intent", "entities")
 
 DEFAULT_CONFIG = AICompletionConfigDefault(
     enabled=True,
@@ -27,6 +39,61 @@ DEFAULT_CONFIG = AICompletionConfigDefault(
     ],
 )
 
+# Default history token budget; override with the AI Config's history_token_budget parameter
+HISTORY_TOKEN_BUDGET = 600
+
+_memo = step_memo("rewriter")
+
+
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
+
+def _build_request(
+    config: StepConfig,
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    conversation_history: list[dict],
+) -> dict:
+    messages = config.render(user_message=user_message, intent=intent, entities=", ".join(entities))
+
+    # Include as much recent conversation as fits the token budget
+    messages.extend(fit_history(conversation_history, history_budget(config, HISTORY_TOKEN_BUDGET)))
+
+    messages.append({"role": "user", "content": user_message})
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse(result, user_message: str) -> str:
+    try:
+        return json.loads(result.choices[0].message.content).get("query", user_message)
+    except (json.JSONDecodeError, IndexError):
+        return user_message
+
+
+def _complete(config, request: dict, user_message: str) -> str:
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result, user_message)
+
+
+async def _acomplete(config, request: dict, user_message: str) -> str:
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    )
+    return _parse(result, user_message)
+
 
 def rewrite_query(
     user_message: str,
@@ -34,39 +101,29 @@ def rewrite_query(
     entities: list[str],
     conversation_history: list[dict],
     context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
 ) -> str:
     """Return an optimized search query string."""
-    config = ai_client.completion_config(
-        "ld-bot-query-rewriter",
-        context,
-        DEFAULT_CONFIG,
-        variables={
-            "user_message": user_message,
-            "intent": intent,
-            "entities": ", ".join(entities),
-        },
-    )
+    config = _config(context, snapshot)
     if not config.enabled:
         return user_message
 
-    messages = [{"role": m.role, "content": m.content} for m in config.messages]
+    request = _build_request(config, user_message, intent, entities, conversation_history)
+    return _memo.call(config, request, lambda: _complete(config, request, user_message))
 
-    # Include recent conversation for context
-    for msg in conversation_history[-4:]:
-        messages.append({"role": msg["role"], "content": msg["content"]})
 
-    messages.append({"role": "user", "content": user_message})
-
-    result = config.tracker.track_openai_metrics(
-        lambda: openai_client.chat.completions.create(
-            model=config.model.name,
-            messages=messages,
-            temperature=config.model.get_parameter("temperature") or 0,
-            response_format={"type": "json_object"},
-        )
-    )
-
-    try:
-        return json.loads(result.choices[0].message.content).get("query", user_message)
-    except (json.JSONDecodeError, IndexError):
+async def arewrite_query(
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> str:
+    """Async variant of :func:`rewrite_query` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
         return user_message
+
+    request = _build_request(config, user_message, intent, entities, conversation_history)
+    return await _memo.acall(config, request, lambda: _acomplete(config, request, user_message))
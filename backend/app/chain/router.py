@@ -3,11 +3,23 @@
 from __future__ import annotations
 
 import json
+from typing import TYPE_CHECKING
 
 from ldclient.context import Context
 from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
 
-from app.config import ai_client, openai_client
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate
+from app.chain.memo import step_memo
+from app.chain.history import fit_history, history_budget
+from app.chain.tracking import atrack_openai_metrics, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-router"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ("user_message", "intent", "entities")
 
 DEFAULT_CONFIG = AICompletionConfigDefault(
     enabled=True,
@@ -33,33 +45,29 @@ DEFAULT_CONFIG = AICompletionConfigDefault(
     ],
 )
 
+# Default history token budget; override with the AI Config's history_token_budget parameter
+HISTORY_TOKEN_BUDGET = 600
 
-def route_query(
+_memo = step_memo("router")
+
+
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
+
+def _build_request(
+    config,
     user_message: str,
     intent: str,
     entities: list[str],
     conversation_history: list[dict],
-    context: Context,
 ) -> dict:
-    """Return {"route": "search"|"clarify"|"direct", "message": str}."""
-    config = ai_client.completion_config(
-        "ld-bot-router",
-        context,
-        DEFAULT_CONFIG,
-        variables={
-            "user_message": user_message,
-            "intent": intent,
-            "entities": ", ".join(entities),
-        },
-    )
-    if not config.enabled:
-        return {"route": "search", "message": ""}
-
-    messages = [{"role": m.role, "content": m.content} for m in config.messages]
+    messages = config.render(user_message=user_message, intent=intent, entities=", ".join(entities))
 
-    # Include recent conversation for context
-    for msg in conversation_history[-4:]:
-        messages.append({"role": msg["role"], "content": msg["content"]})
+    # Include as much recent conversation as fits the token budget
+    messages.extend(fit_history(conversation_history, history_budget(config, HISTORY_TOKEN_BUDGET)))
 
     messages.append(
         {
@@ -67,17 +75,66 @@ def route_query(
             "content": f"Intent: {intent}\nEntities: {', '.join(entities)}\n\nUser message: {user_message}",
         }
     )
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0,
+        "response_format": {"type": "json_object"},
+    }
 
-    result = config.tracker.track_openai_metrics(
-        lambda: openai_client.chat.completions.create(
-            model=config.model.name,
-            messages=messages,
-            temperature=config.model.get_parameter("temperature") or 0,
-            response_format={"type": "json_object"},
-        )
-    )
 
+def _parse(result) -> dict:
     try:
         return json.loads(result.choices[0].message.content)
     except (json.JSONDecodeError, IndexError):
         return {"route": "search", "message": ""}
+
+
+def _complete(config, request: dict) -> dict:
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
+async def _acomplete(config, request: dict) -> dict:
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    )
+    return _parse(result)
+
+
+def route_query(
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> dict:
+    """Return {"route": "search"|"clarify"|"direct", "message": str}."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return {"route": "search", "message": ""}
+
+    request = _build_request(config, user_message, intent, entities, conversation_history)
+    return _memo.call(config, request, lambda: _complete(config, request))
+
+
+async def aroute_query(
+    user_message: str,
+    intent: str,
+    entities: list[str],
+    conversation_history: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> dict:
+    """Async variant of :func:`route_query` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return {"route": "search", "message": ""}
+
+    request = _build_request(config, user_message, intent, entities, conversation_history)
+    return await _memo.acall(config, request, lambda: _acomplete(config, request))
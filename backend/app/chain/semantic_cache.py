@@ -0,0 +1,125 @@
+"""Semantic answer cache: serve stored replies for near-duplicate questions."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from opentelemetry import trace
+
+from app.chain.embeddings import Embedder
+
+
+@dataclass(slots=True)
+class CachedAnswer:
+    reply: str
+    documents: list[dict]  # title/url only, content is not kept
+    quality: dict
+
+
+class SemanticCache:
+    """Fixed-capacity NumPy vector index over judged answers.
+
+    Entries are keyed on an embedding of "(intent, rewritten query)" and tagged
+    with the generator AI Config version that produced them; an entry is only
+    served to lookups for the same version, so a config change invalidates it.
+    When full, empty or expired slots are reused first, then the least recently
+    used entry is evicted.
+    """
+
+    def __init__(self, embedder: Embedder, capacity: int, threshold: float, ttl: float):
+        self.embedder = embedder
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._vectors = np.zeros((capacity, embedder.dim), dtype=np.float32)
+        self._versions = np.full(capacity, -1, dtype=np.int32)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._answers: list[CachedAnswer | None] = [None] * capacity
+        # Version string -> small int code in _versions; codes of versions no
+        # slot holds any more are reused, so there are never more than capacity
+        self._version_codes: dict[str, int] = {}
+        self._free_codes: list[int] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _text(query: str, intent: str) -> str:
+        return f"{intent}\n{query}"
+
+    def lookup(self, query: str, intent: str, version: str) -> tuple[CachedAnswer | None, np.ndarray]:
+        """Return (answer or None, query vector); keep the vector to store() later."""
+        vector = self.embedder.embed([self._text(query, intent)])[0]
+        return self._search(vector, version), vector
+
+    async def alookup(self, query: str, intent: str, version: str) -> tuple[CachedAnswer | None, np.ndarray]:
+        vector = (await self.embedder.aembed([self._text(query, intent)]))[0]
+        return self._search(vector, version), vector
+
+    def _search(self, vector: np.ndarray, version: str) -> CachedAnswer | None:
+        span = trace.get_current_span()
+        now = time.monotonic()
+        with self._lock:
+            code = self._version_codes.get(version)
+            live = (self._versions == code) & (self._expires > now) if code is not None else None
+            if live is None or not live.any():
+                self.misses += 1
+                span.set_attribute("semantic_cache.hit", False)
+                return None
+
+            scores = self._vectors @ vector
+            scores[~live] = -np.inf
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            span.set_attribute("semantic_cache.similarity", similarity)
+            if similarity < self.threshold:
+                self.misses += 1
+                span.set_attribute("semantic_cache.hit", False)
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            span.set_attribute("semantic_cache.hit", True)
+            return self._answers[best]
+
+    def record_failure(self) -> None:
+        """Count a lookup whose embedding failed as a miss."""
+        with self._lock:
+            self.misses += 1
+
+    def store(self, vector: np.ndarray, version: str, answer: CachedAnswer) -> None:
+        now = time.monotonic()
+        with self._lock:
+            code = self._version_codes.get(version)
+            if code is None:
+                code = self._free_codes.pop() if self._free_codes else len(self._version_codes)
+                self._version_codes[version] = code
+            free = np.flatnonzero((self._versions == -1) | (self._expires <= now))
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            replaced = int(self._versions[slot])
+            self._vectors[slot] = vector
+            self._versions[slot] = code
+            if replaced not in (-1, code) and not (self._versions == replaced).any():
+                self._release_code(replaced)
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._answers[slot] = answer
+
+    def _release_code(self, code: int) -> None:
+        for version, existing in self._version_codes.items():
+            if existing == code:
+                del self._version_codes[version]
+                self._free_codes.append(code)
+                return
+
+    def __len__(self) -> int:
+        return int(((self._versions != -1) & (self._expires > time.monotonic())).sum())
@@ -0,0 +1,44 @@
+"""Per-request snapshot of every chain AI Config."""
+
+from __future__ import annotations
+
+from ldclient.context import Context
+
+from app.chain import classify_route, generator, intent, judge, rewriter, router, summarizer
+from app.chain.prompts import StepConfig, evaluate
+
+# Every AI Config the chain may use, by key
+_CHAIN_STEPS = {
+    step.CONFIG_KEY: step for step in (intent, router, classify_route, rewriter, generator, judge, summarizer)
+}
+
+
+class ChainConfigSnapshot:
+    """The chain AI Configs for one LD context, each evaluated at most once.
+
+    Steps take their message prefix, model and tracker from here instead of
+    evaluating their own config. A config is evaluated on its first step()
+    and cached for the rest of the request, so steps the request never runs
+    (e.g. the router after a fast-path hit) cost no evaluation.
+    """
+
+    __slots__ = ("context", "_steps")
+
+    def __init__(self, context: Context):
+        self.context = context
+        self._steps: dict[str, StepConfig] = {}
+
+    def step(self, key: str) -> StepConfig:
+        config = self._steps.get(key)
+        if config is None:
+            step = _CHAIN_STEPS[key]
+            # Steps may run on executor threads; if two race, both use the first stored
+            config = self._steps.setdefault(
+                key, evaluate(key, step.DEFAULT_CONFIG, step.VARIABLES, self.context)
+            )
+        return config
+
+    def versions(self, evaluated_only: bool = False) -> dict[str, str]:
+        """Config key -> variation version for every chain config, or only those evaluated so far."""
+        keys = list(self._steps) if evaluated_only else _CHAIN_STEPS
+        return {key: self.step(key).version for key in keys}
@@ -0,0 +1,326 @@
+"""Stores for conversation history and feedback trackers.
+
+``memory`` (the default) keeps them in memory-bounded, process-local LRU
+stores. ``sqlite`` and ``redis`` share them between worker processes and
+replicas, so a follow-up turn or a ``/feedback`` call can land on any worker;
+values are then serialized to JSON by per-store codecs. The store interface
+is async: SQLite calls run on a worker thread and Redis uses its asyncio
+client, so a store round trip never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from app.config import STATE_BACKEND, STATE_REDIS_URL, STATE_SQLITE_PATH
+from app.chain.cache import SqliteCache, TTLCache
+
+try:
+    import redis.asyncio as redis
+    from redis.exceptions import WatchError
+except ImportError:  # only needed for STATE_BACKEND=redis
+    redis = None
+
+
+class Turn:
+    """One conversation message; slotted to keep long histories compact."""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+
+    def as_dict(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+
+class Store(Protocol):
+    """The async key/value interface of every STATE_BACKEND.
+
+    Reads refresh an entry's expiry. update() is an atomic read-modify-write,
+    also across worker processes for the shared backends.
+    """
+
+    name: str
+
+    async def get(self, key: str, default: Any = None) -> Any: ...
+
+    async def set(self, key: str, value: Any) -> None: ...
+
+    async def update(self, key: str, fn: Callable[[Any], Any]) -> Any: ...
+
+    async def pop(self, key: str, default: Any = None) -> Any: ...
+
+    async def stats(self) -> dict: ...
+
+    async def close(self) -> None: ...
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class BoundedStore:
+    """Process-local store: a sliding-TTL :class:`TTLCache` with entry and byte budgets.
+
+    Values are kept as they are; sizeof(value) counts against max_bytes
+    (0 means no byte budget).
+    """
+
+    def __init__(
+        self, name: str, ttl: float, max_entries: int, max_bytes: int = 0, sizeof: Callable[[Any], int] | None = None
+    ):
+        self.name = name
+        self.cache = TTLCache(max_entries, ttl, max_bytes, sliding=True, sizeof=sizeof)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return self.cache.get(key, default)
+
+    async def set(self, key: str, value: Any) -> None:
+        self.cache.put(key, value)
+
+    async def update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        return self.cache.update(key, fn)
+
+    async def pop(self, key: str, default: Any = None) -> Any:
+        return self.cache.pop(key, default)
+
+    async def stats(self) -> dict:
+        stats = self.cache.stats()
+        del stats["hits"], stats["misses"]
+        return stats
+
+    async def close(self) -> None:
+        self.cache.clear()
+
+
+class SqliteStore:
+    """Store in a SQLite database in WAL mode, shared by worker processes on one host.
+
+    A sliding-expiry :class:`SqliteCache`, called on a worker thread; update()
+    runs in a BEGIN IMMEDIATE transaction.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        ttl: float,
+        max_entries: int,
+        encode: Callable[[Any], Any] = _identity,
+        decode: Callable[[Any], Any] = _identity,
+        purge_every: int = 256,
+    ):
+        self.name = name
+        self._encode = encode
+        self._decode = decode
+        self.cache = SqliteCache(path, name, ttl, max_entries, sliding=True, purge_every=purge_every)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        data = await asyncio.to_thread(self.cache.get, key)
+        return default if data is None else self._decode(data)
+
+    async def set(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self.cache.put, key, self._encode(value))
+
+    async def update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        result = []
+
+        def apply(data: Any) -> Any:
+            result.append(fn(None if data is None else self._decode(data)))
+            return self._encode(result[0])
+
+        await asyncio.to_thread(self.cache.update, key, apply)
+        return result[0]
+
+    async def pop(self, key: str, default: Any = None) -> Any:
+        data = await asyncio.to_thread(self.cache.pop, key)
+        return default if data is None else self._decode(data)
+
+    async def stats(self) -> dict:
+        stats = await asyncio.to_thread(self.cache.stats)
+        del stats["hits"], stats["misses"]
+        return stats
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.cache.close)
+
+
+class RedisStore:
+    """Store in Redis (or anything speaking its protocol), shared across hosts.
+
+    Keys expire through Redis TTLs, refreshed on read with GETEX; pop uses
+    GETDEL so exactly one worker gets a popped value, and update() is an
+    optimistic WATCH/MULTI/EXEC transaction, retried on conflict. Size limits
+    are left to the server's maxmemory policy. Needs Redis 6.2+ and the redis
+    package (requirements-redis.txt).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        ttl: float,
+        encode: Callable[[Any], Any] = _identity,
+        decode: Callable[[Any], Any] = _identity,
+    ):
+        if redis is None:
+            raise RuntimeError("STATE_BACKEND=redis requires the redis package (pip install -r requirements-redis.txt)")
+        self.name = name
+        self.ttl = max(1, int(ttl))
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+        self._prefix = f"ld-bot:{name}:"
+        self._encode = encode
+        self._decode = decode
+        self._client = redis.Redis.from_url(url)
+
+    def _result(self, raw: bytes | None, default: Any) -> Any:
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return self._decode(json.loads(raw))
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return self._result(await self._client.getex(self._prefix + key, ex=self.ttl), default)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._client.set(self._prefix + key, json.dumps(self._encode(value)), ex=self.ttl)
+
+    async def update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        key = self._prefix + key
+        async with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    value = fn(None if raw is None else self._decode(json.loads(raw)))
+                    pipe.multi()
+                    pipe.set(key, json.dumps(self._encode(value)), ex=self.ttl)
+                    await pipe.execute()
+                    return value
+                except WatchError:
+                    # Another worker wrote the key in between; re-read and retry
+                    self.conflicts += 1
+
+    async def pop(self, key: str, default: Any = None) -> Any:
+        return self._result(await self._client.getdel(self._prefix + key), default)
+
+    async def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "conflicts": self.conflicts}
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def open_store(
+    name: str,
+    ttl: float,
+    max_entries: int,
+    max_bytes: int = 0,
+    encode: Callable[[Any], Any] = _identity,
+    decode: Callable[[Any], Any] = _identity,
+    sizeof: Callable[[Any], int] | None = None,
+) -> Store:
+    """A store on the configured STATE_BACKEND.
+
+    encode/decode convert values to and from JSON-serializable data for the
+    shared backends; the memory backend keeps values as they are and budgets
+    max_bytes by sizeof.
+    """
+    if STATE_BACKEND == "sqlite":
+        return SqliteStore(name, STATE_SQLITE_PATH, ttl, max_entries, encode, decode)
+    if STATE_BACKEND == "redis":
+        return RedisStore(name, STATE_REDIS_URL, ttl, encode, decode)
+    return BoundedStore(name, ttl, max_entries, max_bytes, sizeof)
+
+
+# Rough per-turn overhead on top of the content characters
+_TURN_OVERHEAD = 64
+
+
+class Session:
+    """A session's stored turns; start counts the earlier turns trimmed off the front."""
+
+    __slots__ = ("start", "turns")
+
+    def __init__(self, start: int, turns: tuple[Turn, ...]):
+        self.start = start
+        self.turns = turns
+
+
+def _session_bytes(session: Session) -> int:
+    return sum(len(t.content) + _TURN_OVERHEAD for t in session.turns)
+
+
+def _encode_session(session: Session) -> dict:
+    return {"start": session.start, "turns": [[t.role, t.content] for t in session.turns]}
+
+
+def _decode_session(data: dict | list) -> Session:
+    if isinstance(data, list):  # stored before sessions recorded their start
+        data = {"start": 0, "turns": data}
+    return Session(data["start"], tuple(Turn(role, content) for role, content in data["turns"]))
+
+
+def history_version(history: list[dict]) -> str:
+    """Digest identifying a conversation history, for clients that send only new messages."""
+    digest = hashlib.blake2b(digest_size=16)
+    for message in history:
+        content = message["content"].encode()
+        digest.update(b"%s:%d:" % (message["role"].encode(), len(content)))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+class SessionStore:
+    """Conversation history per session_id, capped at max_turns messages each.
+
+    Each session also records the absolute index of its first stored turn, so
+    positions stay stable (e.g. for rolling summaries) once old turns are trimmed.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, max_turns: int):
+        self.max_turns = max_turns
+        self.store = open_store(
+            "sessions", ttl, max_entries, max_bytes, _encode_session, _decode_session, _session_bytes
+        )
+
+    async def history(self, session_id: str) -> tuple[list[dict], int]:
+        """(stored turns, absolute index of the first one in the conversation)."""
+        session = await self.store.get(session_id)
+        if session is None:
+            return [], 0
+        return [t.as_dict() for t in session.turns], session.start
+
+    async def append(self, session_id: str, *turns: Turn, base: list[dict] | None = None) -> str:
+        """Add turns to the stored history, or to base (replacing it); returns the new history's version.
+
+        The read-modify-write is atomic, so concurrent appends to one session
+        (e.g. from two workers) don't lose turns.
+        """
+
+        def extend(session: Session | None) -> Session:
+            if base is None:
+                start, stored = (session.start, list(session.turns)) if session else (0, [])
+            else:
+                start, stored = 0, [Turn(m["role"], m["content"]) for m in base]
+            stored.extend(turns)
+            trimmed = max(0, len(stored) - self.max_turns)
+            return Session(start + trimmed, tuple(stored[trimmed:]))
+
+        session = await self.store.update(session_id, extend)
+        return history_version([t.as_dict() for t in session.turns])
+
+    async def stats(self) -> dict:
+        return await self.store.stats()
+
+    async def close(self) -> None:
+        await self.store.close()
@@ -0,0 +1,104 @@
+"""Background step: fold older conversation turns into a rolling summary."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from ldclient.context import Context
+from ldai import AICompletionConfigDefault, LDMessage, ModelConfig, ProviderConfig
+
+from app.config import async_openai_client, openai_client
+from app.chain.prompts import StepConfig, evaluate
+from app.chain.tracking import atrack_openai_metrics, track_openai_metrics
+
+if TYPE_CHECKING:
+    from app.chain.snapshot import ChainConfigSnapshot
+
+CONFIG_KEY = "ld-bot-history-summarizer"
+# Template variables, substituted per request from the pre-compiled prompt
+VARIABLES = ()
+
+DEFAULT_CONFIG = AICompletionConfigDefault(
+    enabled=True,
+    model=ModelConfig(name="gpt-4o-mini", parameters={"temperature": 0}),
+    provider=ProviderConfig("openai"),
+    messages=[
+        LDMessage(
+            role="system",
+            content=(
+                "You maintain a running summary of a conversation between a user and a "
+                "LaunchDarkly support assistant. Update the existing summary with the new "
+                "messages. Keep the user's goals, products/SDKs/languages mentioned, "
+                "decisions and unresolved questions. Drop pleasantries. "
+                "Respond with the updated summary only, at most 150 words."
+            ),
+        ),
+    ],
+)
+
+
+def _config(context: Context, snapshot: ChainConfigSnapshot | None = None) -> StepConfig:
+    if snapshot is not None:
+        return snapshot.step(CONFIG_KEY)
+    return evaluate(CONFIG_KEY, DEFAULT_CONFIG, VARIABLES, context)
+
+
+def _build_request(config: StepConfig, previous_summary: str, turns: list[dict]) -> dict:
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+    messages = config.render()
+    messages.append(
+        {
+            "role": "user",
+            "content": (
+                f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+                f"New messages:\n{transcript}"
+            ),
+        }
+    )
+    return {
+        "model": config.model.name,
+        "messages": messages,
+        "temperature": config.model.get_parameter("temperature") or 0,
+    }
+
+
+def _parse(result, previous_summary: str) -> str:
+    return (result.choices[0].message.content or "").strip() or previous_summary
+
+
+def summarize_history(
+    previous_summary: str,
+    turns: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> str | None:
+    """Return the updated summary, or None if summarization is disabled."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return None
+
+    request = _build_request(config, previous_summary, turns)
+    result = track_openai_metrics(
+        config.tracker,
+        lambda: openai_client.chat.completions.create(**request),
+    )
+    return _parse(result, previous_summary)
+
+
+async def asummarize_history(
+    previous_summary: str,
+    turns: list[dict],
+    context: Context,
+    snapshot: ChainConfigSnapshot | None = None,
+) -> str | None:
+    """Async variant of :func:`summarize_history` on the shared AsyncOpenAI client."""
+    config = _config(context, snapshot)
+    if not config.enabled:
+        return None
+
+    request = _build_request(config, previous_summary, turns)
+    result = await atrack_openai_metrics(
+        config.tracker,
+        lambda: async_openai_client.chat.completions.create(**request),
+    )
+    return _parse(result, previous_summary)
@@ -0,0 +1,175 @@
+"""LaunchDarkly AI Config metric tracking for async OpenAI calls."""
+
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import TypeVar
+
+from ldai.tracker import LDAIConfigTracker, TokenUsage
+from ldclient.context import Context
+from opentelemetry import trace
+
+from app.config import ld_client
+from app.chain.metrics import record_usage
+
+T = TypeVar("T")
+
+# LD custom metric (numeric) receiving prompt tokens served from the provider's
+# prompt cache; TokenUsage has no field for them
+CACHED_TOKENS_METRIC = "ld-bot-cached-input-tokens"
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
+
+
+def token_usage(usage) -> TokenUsage | None:
+    """Convert an OpenAI usage object into an LD TokenUsage, if present."""
+    if usage is None:
+        return None
+    return TokenUsage(
+        total=usage.total_tokens or 0,
+        input=usage.prompt_tokens or 0,
+        output=usage.completion_tokens or 0,
+    )
+
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens the provider served from its prompt cache."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def _track_data(tracker) -> dict:
+    """The event data a tracker attaches to its own LD events.
+
+    ldai keeps this behind a name-mangled private method, so it is rebuilt here
+    from the tracker's attributes.
+    """
+    data = {
+        "configKey": getattr(tracker, "_config_key", ""),
+        "version": getattr(tracker, "_version", 0),
+        "modelName": getattr(tracker, "_model_name", ""),
+        "providerName": getattr(tracker, "_provider_name", ""),
+    }
+    variation_key = getattr(tracker, "_variation_key", "")
+    if variation_key:
+        data["variationKey"] = variation_key
+    run_id = getattr(tracker, "_run_id", None)
+    if run_id:
+        data["runId"] = run_id
+    return data
+
+
+def _record_usage(tracker, usage) -> None:
+    """Count usage in ``/metrics`` and report cached prompt tokens to the span and LD."""
+    record_usage(config_key(tracker), usage)
+    if usage is None:
+        return
+    cached = cached_tokens(usage)
+    trace.get_current_span().set_attribute("gen_ai.usage.cache_read_input_tokens", cached)
+    context = getattr(tracker, "_context", None)
+    if cached and context is not None:
+        ld_client.track(CACHED_TOKENS_METRIC, context, _track_data(tracker), cached)
+
+
+def track_openai_metrics(tracker, func: Callable[[], T]) -> T:
+    """``tracker.track_openai_metrics`` that also records token usage (see :func:`_record_usage`)."""
+
+    def call() -> T:
+        result = func()
+        _record_usage(tracker, getattr(result, "usage", None))
+        return result
+
+    return tracker.track_openai_metrics(call)
+
+
+async def atrack_openai_metrics(tracker, func: Callable[[], Awaitable[T]]) -> T:
+    """Async counterpart of ``tracker.track_openai_metrics``.
+
+    Records duration, success/error and token usage for an awaited OpenAI call.
+    """
+    start = time.perf_counter()
+    try:
+        result = await func()
+    except Exception:
+        tracker.track_duration(_elapsed_ms(start))
+        tracker.track_error()
+        raise
+
+    tracker.track_duration(_elapsed_ms(start))
+    tracker.track_success()
+    _record_usage(tracker, getattr(result, "usage", None))
+    usage = token_usage(getattr(result, "usage", None))
+    if usage is not None:
+        tracker.track_tokens(usage)
+    return result
+
+
+async def atrack_openai_stream(tracker, func: Callable[[], Awaitable]) -> AsyncIterator:
+    """Yield chunks from a ``stream=True`` chat completion while tracking LD metrics.
+
+    Records time to first content token, total duration, success/error and the
+    token usage reported in the final chunk (requires ``include_usage``).
+    """
+    start = time.perf_counter()
+    first_token = True
+    usage = None
+    stream = None
+    try:
+        stream = await func()
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if first_token and chunk.choices and chunk.choices[0].delta.content:
+                tracker.track_time_to_first_token(_elapsed_ms(start))
+                first_token = False
+            yield chunk
+    except Exception:
+        tracker.track_duration(_elapsed_ms(start))
+        tracker.track_error()
+        raise
+    finally:
+        # Release the connection even if the consumer stops early (e.g. a deadline)
+        if stream is not None:
+            await stream.close()
+
+    tracker.track_duration(_elapsed_ms(start))
+    tracker.track_success()
+    _record_usage(tracker, usage)
+    tokens = token_usage(usage)
+    if tokens is not None:
+        tracker.track_tokens(tokens)
+
+
+def config_key(tracker) -> str:
+    """The AI Config key a tracker reports against."""
+    return _track_data(tracker)["configKey"]
+
+
+def config_version(config) -> str:
+    """Identify an evaluated AI Config variation as "<variationKey>:<version>"."""
+    data = _track_data(config.tracker)
+    return f"{data.get('variationKey', '')}:{data['version']}"
+
+
+def serialize_tracker(tracker) -> dict:
+    """JSON-serializable form of a tracker, for feedback submitted on another worker."""
+    data = _track_data(tracker)
+    data.setdefault("variationKey", "")
+    data["context"] = getattr(tracker, "_context").to_dict()
+    return data
+
+
+def restore_tracker(data: dict) -> LDAIConfigTracker:
+    """Rebuild a tracker from :func:`serialize_tracker`, reporting through this process's LD client."""
+    return LDAIConfigTracker(
+        ld_client=ld_client.get(),
+        variation_key=data.get("variationKey", ""),
+        config_key=data.get("configKey", ""),
+        version=data.get("version", 0),
+        model_name=data.get("modelName", ""),
+        provider_name=data.get("providerName", ""),
+        context=Context.from_dict(data["context"]),
+    )
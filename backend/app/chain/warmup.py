@@ -0,0 +1,88 @@
+"""Startup warm-up, so the first requests don't pay for cold clients and connections.
+
+Clients are built lazily (see :class:`app.config.LazyClient`); :func:`warm_up`
+runs in the background after the server starts. It waits for the LD SDK to
+initialize, evaluates every chain AI Config once, opens a few pooled
+connections to the OpenAI API and loads the local index if one is configured.
+``/ready`` reports not-ready until it finishes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+
+from ldclient.context import Context
+
+from app.config import CHAIN_EXECUTION_MODE, async_openai_client, ld_client, openai_client
+from app.chain.retrieval import local_backend
+from app.chain.snapshot import ChainConfigSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class WarmupState:
+    status: str = "pending"  # "pending", "running", "done", "failed" or "skipped"
+    configs: int = 0
+    connections: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "skipped")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+state = WarmupState()
+
+
+async def _open_connections(count: int) -> int:
+    """Issue count concurrent cheap requests so the pool holds that many warm connections."""
+    client = async_openai_client.with_options(max_retries=0)
+    results = await asyncio.gather(*(client.models.list() for _ in range(count)), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        logger.warning("warm-up: %d of %d OpenAI connections failed: %s", len(failures), count, failures[0])
+    return count - len(failures)
+
+
+def _open_sync_connection() -> None:
+    try:
+        openai_client.with_options(max_retries=0).models.list()
+    except Exception as exc:
+        logger.warning("warm-up: sync OpenAI connection failed: %s", exc)
+
+
+async def warm_up(connections: int) -> None:
+    """Initialize clients and warm caches and connections; never raises."""
+    state.status = "running"
+    start = time.monotonic()
+    try:
+        # Blocks for up to the SDK's start_wait while it fetches flag data
+        await asyncio.to_thread(ld_client.get)
+        context = Context.builder("startup-warmup").anonymous(True).build()
+        snapshot = await asyncio.to_thread(ChainConfigSnapshot, context)
+        state.configs = len(snapshot.versions())
+
+        await asyncio.to_thread(async_openai_client.get)
+        if connections > 0:
+            state.connections = await _open_connections(connections)
+            if CHAIN_EXECUTION_MODE == "thread":
+                await asyncio.to_thread(_open_sync_connection)
+
+        if local_backend.available:
+            await asyncio.to_thread(local_backend._load)
+        state.status = "done"
+    except Exception as exc:
+        # The app still serves; requests just build whatever is missing on first use
+        logger.warning("warm-up failed: %s", exc)
+        state.status = "failed"
+        state.error = str(exc)
+    finally:
+        state.seconds = round(time.monotonic() - start, 3)
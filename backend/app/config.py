@@ -1,33 +1,297 @@
 import os
+import threading
+from collections.abc import Callable
+from typing import Any
 
 from dotenv import load_dotenv
+import httpx
 import ldclient
 from ldclient.config import Config
+from ldclient.integrations import Files
 from ldobserve import ObservabilityConfig, ObservabilityPlugin
 from ldai import LDAIClient
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
 
 load_dotenv()
 
+
+class LazyClient:
+    """Builds a client on first use, so importing the app needs no credentials.
+
+    Attribute access is forwarded to the client, so call sites use it as the
+    client itself. Use :meth:`set` to inject a client (tests, tooling) before
+    first use, and :attr:`initialized` to check without building it.
+    """
+
+    __slots__ = ("name", "_factory", "_instance", "_lock")
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def set(self, instance: Any) -> None:
+        self._instance = instance
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
+
+
 # --- LaunchDarkly SDK with Observability ---
 
-ldclient.set_config(
-    Config(
-        os.environ["LAUNCHDARKLY_SDK_KEY"],
-        plugins=[
-            ObservabilityPlugin(
-                ObservabilityConfig(
-                    service_name="ld-support-chatbot",
-                    service_version="0.1.0",
+# Optional local flag/AI Config data file (JSON); evaluates offline with no LD connection
+LD_DATA_FILE = os.environ.get("LD_DATA_FILE", "")
+LD_OBSERVABILITY_ENABLED = os.environ.get("LD_OBSERVABILITY_ENABLED", "true").lower() != "false"
+
+
+def _make_ld_client():
+    """Configure the LD SDK and wait (up to its start_wait) for it to initialize."""
+    ld_options = {}
+    if LD_DATA_FILE:
+        ld_options = {
+            "update_processor_class": Files.new_data_source(paths=[LD_DATA_FILE]),
+            "send_events": False,
+        }
+    ldclient.set_config(
+        Config(
+            os.environ["LAUNCHDARKLY_SDK_KEY"],
+            plugins=[
+                ObservabilityPlugin(
+                    ObservabilityConfig(
+                        service_name="ld-support-chatbot",
+                        service_version="0.1.0",
+                    )
                 )
-            )
-        ],
+            ]
+            if LD_OBSERVABILITY_ENABLED
+            else [],
+            **ld_options,
+        )
     )
-)
+    return ldclient.get()
+
 
-ld_client = ldclient.get()
-ai_client = LDAIClient(ld_client)
+ld_client = LazyClient("ld_client", _make_ld_client)
+ai_client = LazyClient("ai_client", lambda: LDAIClient(ld_client.get()))
 
 # --- OpenAI client (auto-instrumented by ObservabilityPlugin's OpenLLMetry) ---
 
-openai_client = OpenAI()
+# SDK-level retries bypass the chain's retry budget (STEP_MAX_RETRIES), so they
+# default to off
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "0"))
+
+
+def _make_openai_client() -> OpenAI:
+    # The LD Observability plugin instruments OpenAI calls, so set it up first
+    ld_client.get()
+    return OpenAI(max_retries=OPENAI_MAX_RETRIES)
+
+
+openai_client = LazyClient("openai_client", _make_openai_client)
+
+# --- Async OpenAI client with a shared, tunable connection pool ---
+
+# "async" runs every chain step natively on the event loop; "thread" keeps the
+# original asyncio.to_thread execution on the sync client.
+CHAIN_EXECUTION_MODE = os.environ.get("CHAIN_EXECUTION_MODE", "async")
+
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "200"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "50"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "30"))
+
+
+def _make_async_openai_client() -> AsyncOpenAI:
+    ld_client.get()
+    return AsyncOpenAI(
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            ),
+        ),
+    )
+
+
+async_openai_client = LazyClient("async_openai_client", _make_async_openai_client)
+
+# --- Background judge queue ---
+
+JUDGE_QUEUE_SIZE = int(os.environ.get("JUDGE_QUEUE_SIZE", "100"))
+JUDGE_WORKERS = int(os.environ.get("JUDGE_WORKERS", "4"))
+# How long /chat/stream stays open after the result to push a deferred quality score
+JUDGE_DEFERRED_STREAM_TIMEOUT = float(os.environ.get("JUDGE_DEFERRED_STREAM_TIMEOUT", "30"))
+
+# --- Retrieval cache ---
+
+RETRIEVAL_CACHE_TTL = float(os.environ.get("RETRIEVAL_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+# Empty disables the persistent tier
+RETRIEVAL_CACHE_SQLITE_PATH = os.environ.get("RETRIEVAL_CACHE_SQLITE_PATH", "")
+
+# --- Semantic answer cache ---
+
+# "" disables the cache; "openai" or "hashing" (local, deterministic) selects the embedder
+SEMANTIC_CACHE_EMBEDDER = os.environ.get("SEMANTIC_CACHE_EMBEDDER", "")
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SEMANTIC_CACHE_CAPACITY", "2048"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "86400"))
+
+# --- Local documentation index ---
+
+# Directory built by `python -m app.ingest_docs`; empty disables the local backend
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "")
+LOCAL_INDEX_TOP_K = int(os.environ.get("LOCAL_INDEX_TOP_K", "5"))
+
+# --- Memoization of deterministic (temperature 0) chain steps ---
+
+
+def _memo_settings(step: str, ttl: float = 3600, max_entries: int = 4096) -> tuple[float, int]:
+    """(ttl seconds, max entries) for a step, overridable via MEMO_<STEP>_TTL / _MAX_ENTRIES."""
+    prefix = f"MEMO_{step.upper()}"
+    return (
+        float(os.environ.get(f"{prefix}_TTL", ttl)),
+        int(os.environ.get(f"{prefix}_MAX_ENTRIES", max_entries)),
+    )
+
+
+# A TTL of 0 disables memoization for that step
+MEMO_SETTINGS = {
+    "intent": _memo_settings("intent"),
+    "router": _memo_settings("router"),
+    "rewriter": _memo_settings("rewriter"),
+    "intent_router": _memo_settings("intent_router"),
+}
+
+# --- Session and feedback-tracker stores ---
+
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "3600"))
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_MAX_TURNS = int(os.environ.get("SESSION_MAX_TURNS", "40"))
+# How long a response stays eligible for /feedback
+TRACKER_TTL = float(os.environ.get("TRACKER_TTL", "3600"))
+TRACKER_MAX_ENTRIES = int(os.environ.get("TRACKER_MAX_ENTRIES", "50000"))
+
+# --- Conversation history budgeting and summarization ---
+
+# Summarize once the unsummarized history exceeds this many tokens...
+HISTORY_SUMMARY_TRIGGER_TOKENS = int(os.environ.get("HISTORY_SUMMARY_TRIGGER_TOKENS", "1500"))
+# ...keeping roughly this many recent tokens verbatim
+HISTORY_KEEP_RECENT_TOKENS = int(os.environ.get("HISTORY_KEEP_RECENT_TOKENS", "600"))
+SUMMARY_QUEUE_SIZE = int(os.environ.get("SUMMARY_QUEUE_SIZE", "100"))
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", "2"))
+
+# --- Single-flight coalescing of identical concurrent requests ---
+
+# Comma-separated steps to coalesce: "chain" (whole pipeline for identical
+# message + history), "intent", "retrieval"; empty disables coalescing
+COALESCE_STEPS = frozenset(
+    step.strip() for step in os.environ.get("COALESCE_STEPS", "chain,retrieval").split(",") if step.strip()
+)
+
+# --- Batch replay (/chat/batch and python -m app.batch) ---
+
+BATCH_DEFAULT_CONCURRENCY = int(os.environ.get("BATCH_DEFAULT_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "32"))
+# Directory for /chat/batch?batch_id=... checkpoints; empty disables server-side resume
+BATCH_CHECKPOINT_DIR = os.environ.get("BATCH_CHECKPOINT_DIR", "")
+
+# --- Fast path for trivial messages ---
+
+# Model written by `python -m app.train_fast_path`; empty disables the fast path
+FAST_PATH_MODEL = os.environ.get("FAST_PATH_MODEL", "")
+
+# --- Deadlines, hedging and retries ---
+
+# End-to-end budget for one chain execution, in seconds
+CHAIN_DEADLINE = float(os.environ.get("CHAIN_DEADLINE", "75"))
+
+
+def _step_timeout(step: str, default: float) -> float:
+    return float(os.environ.get(f"STEP_TIMEOUT_{step.upper()}", default))
+
+
+# Per-step caps, further bounded by what is left of CHAIN_DEADLINE; the
+# defaults for the search path fit within the default deadline
+STEP_TIMEOUTS = {
+    "intent": _step_timeout("intent", 5),
+    "router": _step_timeout("router", 5),
+    "intent_router": _step_timeout("intent_router", 8),
+    "rewriter": _step_timeout("rewriter", 5),
+    "semantic_cache": _step_timeout("semantic_cache", 2),
+    "retrieval": _step_timeout("retrieval", 15),
+    "generator": _step_timeout("generator", 30),
+    "judge": _step_timeout("judge", 10),
+}
+
+# Steps that send a duplicate request once they run slower than HEDGE_PERCENTILE
+# of their recent latencies (e.g. "intent,router,intent_router,rewriter")
+HEDGE_STEPS = frozenset(
+    step.strip() for step in os.environ.get("HEDGE_STEPS", "").split(",") if step.strip()
+)
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "50"))
+
+# Retries of transient OpenAI errors per step, bounded globally by a token
+# bucket: every call earns RETRY_BUDGET_RATIO of a retry, plus a floor of
+# RETRY_BUDGET_MIN_PER_SECOND. Hedged requests spend from the same budget.
+STEP_MAX_RETRIES = int(os.environ.get("STEP_MAX_RETRIES", "2"))
+RETRY_BUDGET_RATIO = float(os.environ.get("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.environ.get("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+
+# --- Admission control and stage concurrency ---
+
+# Chains admitted at once; further requests wait in a bounded priority queue
+MAX_CONCURRENT_CHAINS = int(os.environ.get("MAX_CONCURRENT_CHAINS", "64"))
+# Requests beyond this many waiting are rejected with 429
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "128"))
+# Requests still waiting after this many seconds are rejected with 503
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10"))
+# Concurrent upstream calls (and executor threads in "thread" mode) per stage:
+# "fast" = classification/rewrite/judge steps, "slow" = retrieval and generation
+FAST_STAGE_CONCURRENCY = int(os.environ.get("FAST_STAGE_CONCURRENCY", "64"))
+SLOW_STAGE_CONCURRENCY = int(os.environ.get("SLOW_STAGE_CONCURRENCY", "32"))
+
+# --- Prompt layout ---
+
+# "inline" substitutes per-request variables into the prompt template; "prefix"
+# keeps templates byte-stable and sends the variables in a trailing context
+# message so provider prompt caching applies. An AI Config's prompt_layout
+# parameter overrides this.
+PROMPT_LAYOUT = os.environ.get("PROMPT_LAYOUT", "inline")
+
+# --- Response compression ---
+
+# Gzip /chat/stream and /chat/batch for clients that accept it, flushed per event;
+# leave off when a proxy in front already compresses
+RESPONSE_GZIP = os.environ.get("RESPONSE_GZIP", "false").lower() == "true"
+
+# --- Shared state for multiple workers ---
+
+# Where sessions and feedback trackers live: "memory" (per process), "sqlite"
+# (processes on one host) or "redis" (across hosts; needs the redis package)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_SQLITE_PATH = os.environ.get("STATE_SQLITE_PATH", "state.db")
+STATE_REDIS_URL = os.environ.get("STATE_REDIS_URL", "redis://localhost:6379/0")
+
+# --- Startup warm-up ---
+
+# Warm up in the background after startup: initialize LD, evaluate the chain's AI
+# Configs and open pooled OpenAI connections; /ready reports 503 until it finishes
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "true").lower() != "false"
+# Connections to pre-open in the async client's pool
+WARMUP_CONNECTIONS = int(os.environ.get("WARMUP_CONNECTIONS", "8"))
@@ -0,0 +1,39 @@
+"""Build the local documentation index used by the "local" retrieval backend.
+
+Usage::
+
+    python -m app.ingest_docs DOCS_DIR INDEX_DIR --base-url https://launchdarkly.com/docs
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from app.chain.local_index import build_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("docs_dir", type=Path, help="Directory of markdown/HTML docs")
+    parser.add_argument("index_dir", type=Path, help="Output directory for index files")
+    parser.add_argument("--base-url", default="", help="URL prefix for doc paths in citations")
+    parser.add_argument(
+        "--embedder",
+        default="",
+        choices=["", "hashing", "openai"],
+        help="Also build a dense-vector matrix with this embedder",
+    )
+    parser.add_argument("--chunk-words", type=int, default=200, help="Max words per chunk")
+    args = parser.parse_args()
+    if args.chunk_words < 1:
+        parser.error("--chunk-words must be at least 1")
+
+    start = time.perf_counter()
+    count = build_index(args.docs_dir, args.index_dir, args.base_url, args.embedder, args.chunk_words)
+    print(f"Indexed {count} chunks into {args.index_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
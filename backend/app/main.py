@@ -1,18 +1,65 @@
+import asyncio
+import re
+import time
+from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from app.config import ld_client
+from app.config import (
+    BATCH_CHECKPOINT_DIR,
+    BATCH_DEFAULT_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    RESPONSE_GZIP,
+    STARTUP_WARMUP,
+    WARMUP_CONNECTIONS,
+    async_openai_client,
+    ld_client,
+)
 from app.models import ChatRequest, ChatResponse, FeedbackRequest
-from app.chain.orchestrator import run_chain, run_chain_stream, submit_feedback
+from app.chain.orchestrator import (
+    ResyncRequired,
+    admission,
+    close_stores,
+    judge_queue,
+    request_priority,
+    resolve_history,
+    run_chain,
+    run_chain_stream,
+    shutdown_stages,
+    store_stats,
+    submit_feedback,
+    summary_queue,
+)
+from app.chain.admission import Rejected, Ticket
+from app.chain.batch import BatchError, parse_batch, stream_batch
+from app.chain.events import gzip_stream
+from app.chain.metrics import registry, sse_duration
+from app.chain import warmup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Warm up in the background so the server accepts connections (and /health
+    # answers) immediately; /ready turns 200 once it's done
+    task = asyncio.create_task(warmup.warm_up(WARMUP_CONNECTIONS)) if STARTUP_WARMUP else None
+    if task is None:
+        warmup.state.status = "skipped"
     yield
-    ld_client.close()
+    if task is not None and not task.done():
+        task.cancel()
+    await judge_queue.close()
+    await summary_queue.close()
+    shutdown_stages()
+    await close_stores()
+    # Only close clients that were actually built
+    if async_openai_client.initialized:
+        await async_openai_client.close()
+    if ld_client.initialized:
+        ld_client.close()
 
 
 app = FastAPI(title="LD Support Chatbot", lifespan=lifespan)
@@ -25,26 +72,144 @@ app.add_middleware(
 )
 
 
+async def _admit(priority: int) -> Ticket:
+    try:
+        return await admission.acquire(priority)
+    except Rejected as exc:
+        raise HTTPException(
+            status_code=exc.status_code, detail=exc.reason, headers={"Retry-After": str(exc.retry_after)}
+        )
+
+
+async def _history(req: ChatRequest) -> tuple[list[dict], int]:
+    try:
+        return await resolve_history(req)
+    except ResyncRequired as exc:
+        # Cheap to answer; the client retries once with its full history
+        raise HTTPException(status_code=409, detail={"code": "resync_required", "message": str(exc)})
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
-    return await run_chain(req)
+    history = await _history(req)
+    ticket = await _admit(request_priority(req))
+    try:
+        return await run_chain(req, history)
+    finally:
+        ticket.release()
+
+
+def _streaming_response(
+    request: Request, body: AsyncIterator[bytes | str], media_type: str, headers: dict | None = None
+) -> StreamingResponse:
+    headers = dict(headers or {})
+    if RESPONSE_GZIP and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+async def _timed_stream(events: AsyncIterator[bytes], ticket: Ticket) -> AsyncIterator[bytes]:
+    start = time.perf_counter()
+    try:
+        async for event in events:
+            yield event
+    finally:
+        # Usually released at the result already; this covers errors and disconnects
+        ticket.release()
+        sse_duration.observe(time.perf_counter() - start)
 
 
 @app.post("/chat/stream")
-async def chat_stream(req: ChatRequest):
-    return StreamingResponse(
-        run_chain_stream(req),
-        media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+async def chat_stream(req: ChatRequest, request: Request):
+    # Resolve history and admit before responding, so a stale history or
+    # overload surfaces as a status code, not a broken stream
+    history = await _history(req)
+    ticket = await _admit(request_priority(req))
+    return _streaming_response(
+        request,
+        # The ticket covers the chain up to its result; a deferred quality
+        # score is then awaited outside admission
+        _timed_stream(run_chain_stream(req, history, on_result=ticket.release), ticket),
+        "text/event-stream",
+        {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.post("/chat/batch")
+async def chat_batch(request: Request, concurrency: int = BATCH_DEFAULT_CONCURRENCY, batch_id: str = ""):
+    """Run a JSONL body of ChatRequests; stream NDJSON results in completion order.
+
+    With batch_id (and BATCH_CHECKPOINT_DIR set), results are checkpointed and
+    re-posting the same batch skips items that already completed.
+    """
+    try:
+        items = parse_batch((await request.body()).decode().splitlines())
+    except BatchError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    checkpoint = None
+    if batch_id:
+        if not BATCH_CHECKPOINT_DIR:
+            raise HTTPException(status_code=400, detail="batch_id requires BATCH_CHECKPOINT_DIR")
+        if not re.fullmatch(r"[\w-]{1,128}", batch_id):
+            raise HTTPException(status_code=422, detail="batch_id may only contain letters, digits, '_' and '-'")
+        Path(BATCH_CHECKPOINT_DIR).mkdir(parents=True, exist_ok=True)
+        checkpoint = Path(BATCH_CHECKPOINT_DIR) / f"{batch_id}.ndjson"
+
+    # Batch items share MAX_CONCURRENT_CHAINS with /chat. Admit the first one
+    # now, so a server at capacity answers 429/503 instead of streaming errors;
+    # every later item waits for its own ticket.
+    first = await _admit(0)
+
+    async def admit(chat_request: ChatRequest) -> Ticket:
+        nonlocal first
+        ticket, first = first, None
+        if ticket is None:
+            ticket = await admission.acquire(request_priority(chat_request))
+        return ticket
+
+    async def body() -> AsyncIterator[str]:
+        try:
+            async for line in stream_batch(items, max(1, min(concurrency, BATCH_MAX_CONCURRENCY)), checkpoint, admit):
+                yield line
+        finally:
+            # Unused if every item was already checkpointed
+            if first is not None:
+                first.release()
+
+    return _streaming_response(request, body(), "application/x-ndjson")
+
+
 @app.post("/feedback")
 async def feedback(req: FeedbackRequest):
-    tracked = submit_feedback(req.response_id, req.kind)
+    tracked = await submit_feedback(req.response_id, req.kind)
     return {"tracked": tracked}
 
 
+def _ld_initialized() -> bool:
+    return ld_client.initialized and ld_client.is_initialized()
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "ld_initialized": ld_client.is_initialized()}
+    """Liveness: answers as soon as the server is up, without building any client."""
+    return {"status": "ok", "ld_initialized": _ld_initialized(), "stores": await store_stats()}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until startup warm-up has finished and the LD SDK has initialized.
+
+    With STARTUP_WARMUP off, clients are built by the first request, so the
+    app reports ready straight away.
+    """
+    is_ready = warmup.state.status == "skipped" or (warmup.state.finished and _ld_initialized())
+    body = {"ready": is_ready, "ld_initialized": _ld_initialized(), "warmup": warmup.state.to_dict()}
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -12,12 +12,17 @@ class ChatRequest(BaseModel):
     message: str
     session_id: str = "default"
     conversation_history: list[ChatMessage] = Field(default_factory=list)
+    # Instead of conversation_history: the history_version of the previous
+    # response. The server then uses its stored history, or answers 409 if
+    # that no longer matches and the client must resend the full history.
+    history_version: str | None = None
 
 
 class QualityMetadata(BaseModel):
     relevance: float = 0.0
     faithfulness: float = 0.0
     passed: bool = True
+    status: str = "complete"  # "complete", "pending" (deferred judge) or "skipped"
 
 
 class ChatResponse(BaseModel):
@@ -27,6 +32,20 @@ class ChatResponse(BaseModel):
     entities: list[str] = Field(default_factory=list)
     quality: QualityMetadata = Field(default_factory=QualityMetadata)
     sources: list[dict] = Field(default_factory=list)
+    history_version: str = ""  # send back with the next message instead of the history
+
+
+class BatchItem(ChatRequest):
+    id: str = ""  # defaults to the 1-based line number in the batch file
+    session_id: str = ""  # empty: a fresh session per item and run
+
+
+class BatchResult(BaseModel):
+    id: str
+    response: ChatResponse | None = None
+    error: str | None = None
+    result_ms: float = 0.0  # until the result event
+    elapsed_ms: float = 0.0  # including any deferred quality score
 
 
 class FeedbackRequest(BaseModel):
@@ -0,0 +1,107 @@
+"""Train the fast-path classifier from labeled messages and logged router decisions.
+
+Usage::
+
+    python -m app.train_fast_path fast_path.npz --data router_decisions.jsonl
+
+Each data line is JSON with "message" and either "label" (a template name
+from app.chain.fast_path.TEMPLATES, or "llm") or a logged "route"
+("search" maps to "llm"; "direct"/"clarify" use their generic templates).
+The bundled seed set is included unless --no-seed is given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from app.chain.fast_path import LLM_LABEL, SEED_DATA, TEMPLATES, FastPathClassifier, hash_features, phrase_vocabulary
+
+
+def _load(path: Path) -> list[tuple[str, str]]:
+    examples = []
+    with path.open() as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            label = row.get("label") or row.get("route", "")
+            label = LLM_LABEL if label == "search" else label
+            if label != LLM_LABEL and label not in TEMPLATES:
+                raise SystemExit(f"{path}: unknown label {label!r}")
+            examples.append((row["message"], label))
+    return examples
+
+
+def _matrix(messages: list[str], dim: int) -> np.ndarray:
+    x = np.zeros((len(messages), dim), dtype=np.float32)
+    for row, message in enumerate(messages):
+        indices, signs = hash_features(message, dim)
+        np.add.at(x[row], indices, signs)
+    return x
+
+
+def train(
+    examples: list[tuple[str, str]], dim: int, epochs: int, learning_rate: float, l2: float, max_words: int
+) -> FastPathClassifier:
+    """Full-batch gradient descent on softmax cross-entropy with L2 regularization."""
+    labels = sorted({label for _, label in examples})
+    x = _matrix([message for message, _ in examples], dim)
+    y = np.zeros((len(examples), len(labels)), dtype=np.float32)
+    y[np.arange(len(examples)), [labels.index(label) for _, label in examples]] = 1.0
+
+    weights = np.zeros((dim, len(labels)), dtype=np.float32)
+    bias = np.zeros(len(labels), dtype=np.float32)
+    for _ in range(epochs):
+        logits = x @ weights + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        error = (probs - y) / len(examples)
+        weights -= learning_rate * (x.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+    return FastPathClassifier(weights, bias, labels, max_words, phrase_vocabulary(examples))
+
+
+def _accuracy(model: FastPathClassifier, examples: list[tuple[str, str]]) -> float:
+    correct = sum(model.labels[int(model.probabilities(m).argmax())] == label for m, label in examples)
+    return correct / len(examples) if examples else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path, help="Model file to write (.npz)")
+    parser.add_argument("--data", type=Path, action="append", default=[], help="JSONL training data (repeatable)")
+    parser.add_argument("--no-seed", action="store_true", help="Don't include the bundled seed examples")
+    parser.add_argument("--dim", type=int, default=4096, help="Hashed feature dimension")
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--learning-rate", type=float, default=2.0)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--max-words", type=int, default=12, help="Longer messages always take the LLM path")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction held out to report accuracy")
+    args = parser.parse_args()
+
+    examples = [] if args.no_seed else _load(SEED_DATA)
+    for path in args.data:
+        examples.extend(_load(path))
+    if not examples:
+        parser.error("no training data")
+
+    order = np.random.default_rng(0).permutation(len(examples))
+    cut = int(len(examples) * args.holdout)
+    held_out = [examples[i] for i in order[:cut]]
+    train_set = [examples[i] for i in order[cut:]]
+    model = train(train_set, args.dim, args.epochs, args.learning_rate, args.l2, args.max_words)
+    print(f"train accuracy {_accuracy(model, train_set):.3f}, held-out accuracy {_accuracy(model, held_out):.3f}")
+
+    # Ship a model trained on everything
+    model = train(examples, args.dim, args.epochs, args.learning_rate, args.l2, args.max_words)
+    model.save(args.output)
+    print(f"Wrote {args.output} ({len(examples)} examples, labels: {', '.join(model.labels)})")
+
+
+if __name__ == "__main__":
+    main()
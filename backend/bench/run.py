@@ -0,0 +1,255 @@
+"""Offline load test of /chat and /chat/stream against the OpenAI stub.
+
+Starts ``bench.stub_openai`` in a subprocess, serves the FastAPI app with
+uvicorn in a background thread (LaunchDarkly offline, flags from
+``bench/flags.json``), drives it at a fixed concurrency and reports per-span
+p50/p95/p99 latency, time to first SSE event, throughput and peak RSS.
+
+    python -m bench.run --concurrency 32 --requests 500 --out bench/baselines/stream-c32.json
+    python -m bench.run --concurrency 32 --requests 500 --compare bench/baselines/stream-c32.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+DEFAULT_MESSAGES = [
+    "How do I set up feature flags in Python?",
+    "How do I evaluate a flag in the Node.js server SDK?",
+    "What is a context in LaunchDarkly?",
+    "How do percentage rollouts work?",
+    "Why is my flag always returning the fallback value?",
+    "How do I connect LaunchDarkly to Datadog?",
+    "thanks!",
+    "hello",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no samples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def _install_span_collector() -> dict[str, list[float]]:
+    """Record every finished span's duration (seconds) by name."""
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+
+    durations: dict[str, list[float]] = defaultdict(list)
+
+    class Collector(SpanProcessor):
+        def on_end(self, span) -> None:
+            durations[span.name].append((span.end_time - span.start_time) / 1e9)
+
+    provider = TracerProvider()
+    provider.add_span_processor(Collector())
+    trace.set_tracer_provider(provider)
+    return durations
+
+
+def _start_stub(port: int, stub_args: list[str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.stub_openai", "--port", str(port), *stub_args],
+        cwd=BENCH_DIR.parent,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=0.5).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("OpenAI stub did not start")
+
+
+def _start_app(port: int):
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, message: str, session_id: str, stats: dict) -> None:
+    body = {"message": message, "session_id": session_id}
+    start = time.perf_counter()
+    try:
+        if endpoint == "stream":
+            first_event = None
+            async with client.stream("POST", "/chat/stream", json=body) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if first_event is None and line:
+                        first_event = time.perf_counter() - start
+                    if line == "event: result":
+                        # Later events (e.g. deferred quality) are not user-visible latency
+                        stats["result"].append(time.perf_counter() - start)
+            stats["first_event"].append(first_event or 0.0)
+        else:
+            response = await client.post("/chat", json=body)
+            response.raise_for_status()
+            stats["result"].append(time.perf_counter() - start)
+        stats["total"].append(time.perf_counter() - start)
+    except httpx.HTTPError:
+        stats["errors"] += 1
+
+
+async def _drive(base_url: str, args, messages: list[str], durations: dict) -> tuple[dict, float]:
+    def new_stats() -> dict:
+        return {"first_event": [], "result": [], "total": [], "errors": 0}
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+
+        async def phase(offset: int, count: int) -> dict:
+            stats = new_stats()
+            counter = iter(range(offset, offset + count))
+
+            async def worker(worker_id: int) -> None:
+                for i in counter:
+                    session_id = f"bench-{worker_id}-{i}" if args.fresh_sessions else f"bench-{worker_id}"
+                    await _one_request(client, args.endpoint, messages[i % len(messages)], session_id, stats)
+
+            await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+            return stats
+
+        await phase(0, args.warmup)
+        durations.clear()
+        start = time.perf_counter()
+        stats = await phase(args.warmup, args.requests)
+        elapsed = time.perf_counter() - start
+    return stats, elapsed
+
+
+def _print_report(report: dict, baseline: dict | None) -> None:
+    def row(name: str, s: dict, base: dict | None) -> str:
+        line = f"{name:<28} {s['count']:>6} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['p99_ms']:>10.1f}"
+        if base:
+            line += f"   p95 {s['p95_ms'] - base['p95_ms']:+.1f} ms"
+        return line
+
+    print(f"\n{'':<28} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name in ("first_event", "result", "total"):
+        base = (baseline or {}).get("requests", {}).get(name)
+        print(row(f"request.{name}", report["requests"][name], base))
+    for name, s in sorted(report["spans"].items()):
+        base = (baseline or {}).get("spans", {}).get(name)
+        print(row(name, s, base))
+    print(
+        f"\nthroughput {report['throughput_rps']:.1f} req/s, errors {report['errors']}, "
+        f"peak RSS {report['peak_rss_mb']:.0f} MB"
+    )
+    if baseline:
+        print(
+            f"baseline   {baseline['throughput_rps']:.1f} req/s, "
+            f"peak RSS {baseline['peak_rss_mb']:.0f} MB"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline chain load test")
+    parser.add_argument("--endpoint", choices=["stream", "chat"], default="stream")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--messages", type=Path, help="File with one message per line")
+    parser.add_argument("--fresh-sessions", action="store_true", help="New session_id per request")
+    parser.add_argument("--flags", type=Path, default=BENCH_DIR / "flags.json")
+    parser.add_argument("--out", type=Path, help="Write the report as JSON (e.g. a baseline)")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to diff against")
+    args, stub_args = parser.parse_known_args()
+
+    messages = (
+        [line.strip() for line in args.messages.read_text().splitlines() if line.strip()]
+        if args.messages
+        else DEFAULT_MESSAGES
+    )
+
+    stub_port, app_port = _free_port(), _free_port()
+    os.environ.update(
+        {
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+            "OPENAI_API_KEY": "bench",
+            "LAUNCHDARKLY_SDK_KEY": "bench-offline",
+            "LD_DATA_FILE": str(args.flags),
+            "LD_OBSERVABILITY_ENABLED": "false",
+        }
+    )
+    sys.path.insert(0, str(BENCH_DIR.parent))
+
+    durations = _install_span_collector()
+    stub = _start_stub(stub_port, stub_args)
+    try:
+        server, thread = _start_app(app_port)
+        stats, elapsed = asyncio.run(_drive(f"http://127.0.0.1:{app_port}", args, messages, durations))
+        server.should_exit = True
+        thread.join(timeout=10)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report = {
+        "settings": {
+            "endpoint": args.endpoint,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "stub_args": stub_args,
+        },
+        "requests": {name: _summary(stats[name]) for name in ("first_event", "result", "total")},
+        "spans": {name: _summary(values) for name, values in durations.items()},
+        "errors": stats["errors"],
+        "throughput_rps": round(len(stats["total"]) / elapsed, 2) if elapsed else 0.0,
+        # ru_maxrss is KiB on Linux; covers the app and the load generator
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    _print_report(report, baseline)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
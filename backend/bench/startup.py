@@ -0,0 +1,148 @@
+"""Offline cold-start benchmark: import time, time to ready and first-request latency.
+
+Starts ``bench.stub_openai`` (with a per-connection setup delay standing in for
+TCP/TLS handshakes), then for each warm-up setting launches the app under
+uvicorn in a fresh process and measures:
+
+- how long ``import app.main`` takes (no clients are built at import time)
+- time from process start to ``/health`` answering and to ``/ready`` returning 200
+- latency of the first and second ``/chat`` requests
+
+    python -m bench.startup --runs 3 --connect-latency-ms 150
+    python -m bench.startup --warmup on --out bench/baselines/startup.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from bench.run import BENCH_DIR, _free_port, _start_stub
+
+_IMPORT_PROBE = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def _wait_for(url: str, deadline: float, status: int = 200) -> float | None:
+    """Poll url until it returns status; the time it did, or None on timeout."""
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=0.5).status_code == status:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def _import_seconds(env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE], cwd=BENCH_DIR.parent, env=env, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _chat_seconds(base_url: str, message: str, session_id: str, timeout: float) -> float:
+    start = time.perf_counter()
+    response = httpx.post(f"{base_url}/chat", json={"message": message, "session_id": session_id}, timeout=timeout)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def _one_run(env: dict, warmup: bool, args) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**env, "STARTUP_WARMUP": "true" if warmup else "false"}
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BENCH_DIR.parent,
+        env=env,
+    )
+    try:
+        deadline = start + args.timeout
+        live = _wait_for(f"{base_url}/health", deadline)
+        ready = _wait_for(f"{base_url}/ready", deadline)
+        if live is None or ready is None:
+            raise RuntimeError("app did not become ready")
+        warmup_state = httpx.get(f"{base_url}/ready").json()["warmup"]
+        first = _chat_seconds(base_url, args.message, "startup-1", args.timeout)
+        second = _chat_seconds(base_url, args.message, "startup-2", args.timeout)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "live_s": round(live - start, 3),
+        "ready_s": round(ready - start, 3),
+        "first_request_ms": round(first * 1000, 1),
+        "second_request_ms": round(second * 1000, 1),
+        "warmup": warmup_state,
+    }
+
+
+def _mean(runs: list[dict], key: str) -> float:
+    return round(sum(r[key] for r in runs) / len(runs), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="App launches per warm-up setting")
+    parser.add_argument("--warmup", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--message", default="How do I set up feature flags in Python?")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--flags", type=Path, default=BENCH_DIR / "flags.json")
+    parser.add_argument("--out", type=Path, help="Write the report as JSON")
+    args, stub_args = parser.parse_known_args()
+    if not any(a.startswith("--connect-latency-ms") for a in stub_args):
+        stub_args += ["--connect-latency-ms", "100"]
+
+    stub_port = _free_port()
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "OPENAI_API_KEY": "bench",
+        "LAUNCHDARKLY_SDK_KEY": "bench-offline",
+        "LD_DATA_FILE": str(args.flags),
+        "LD_OBSERVABILITY_ENABLED": "false",
+    }
+    settings = {"on": [True], "off": [False], "both": [False, True]}[args.warmup]
+
+    stub = _start_stub(stub_port, stub_args)
+    try:
+        import_s = [_import_seconds(env) for _ in range(args.runs)]
+        results = {}
+        for warmup in settings:
+            runs = [_one_run(env, warmup, args) for _ in range(args.runs)]
+            results["warmup" if warmup else "no_warmup"] = {
+                "runs": runs,
+                **{key: _mean(runs, key) for key in ("live_s", "ready_s", "first_request_ms", "second_request_ms")},
+            }
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report = {
+        "settings": {"runs": args.runs, "stub_args": stub_args},
+        "import_s": round(sum(import_s) / len(import_s), 3),
+        "results": results,
+    }
+    print(f"\nimport app.main {report['import_s'] * 1000:.0f} ms (mean of {args.runs})")
+    print(f"\n{'':<12} {'live s':>8} {'ready s':>8} {'1st req ms':>11} {'2nd req ms':>11}")
+    for name, r in results.items():
+        print(
+            f"{name:<12} {r['live_s']:>8.2f} {r['ready_s']:>8.2f} "
+            f"{r['first_request_ms']:>11.1f} {r['second_request_ms']:>11.1f}"
+        )
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Local stand-in for the OpenAI endpoints the chain uses.
+
+Serves ``/v1/chat/completions`` (JSON and streaming), ``/v1/responses`` (web
+search shaped output with URL citations), ``/v1/embeddings`` and
+``/v1/models`` with configurable latency distributions, streaming token rate,
+error injection and a per-connection setup cost.
+Replies are picked from the system prompt so every chain step gets a
+well-formed answer.
+
+    python -m bench.stub_openai --port 8100 --chat-latency-ms 400 --error-rate 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubSettings:
+    chat_latency_ms: float = 400.0
+    responses_latency_ms: float = 2500.0
+    embeddings_latency_ms: float = 80.0
+    # Lognormal sigma; 0 makes latency constant at the median
+    latency_sigma: float = 0.5
+    tokens_per_sec: float = 60.0
+    reply_tokens: int = 180
+    error_rate: float = 0.0
+    # Fraction of router/intent-router calls answered "direct"
+    direct_ratio: float = 0.1
+    seed: int | None = None
+    # Extra delay on each connection's first request, standing in for TCP/TLS setup
+    connect_latency_ms: float = 0.0
+
+
+settings = StubSettings()
+_rng = random.Random()
+
+_REPLY_WORDS = (
+    "To evaluate a feature flag in the Python SDK, initialize the client with your SDK key, "
+    "build a context, and call variation with the flag key and a fallback value. "
+).split()
+
+_DOC_URLS = [
+    ("Python SDK reference", "https://launchdarkly.com/docs/sdk/server-side/python"),
+    ("Evaluating flags", "https://launchdarkly.com/docs/sdk/features/evaluating"),
+    ("Contexts", "https://launchdarkly.com/docs/home/observability/contexts"),
+]
+
+
+def _latency(median_ms: float) -> float:
+    """Seconds to wait, drawn from a lognormal with the given median."""
+    if settings.latency_sigma <= 0:
+        return median_ms / 1000
+    return median_ms / 1000 * math.exp(_rng.gauss(0, settings.latency_sigma))
+
+
+def _error() -> JSONResponse | None:
+    if settings.error_rate and _rng.random() < settings.error_rate:
+        status = _rng.choice((429, 500, 503))
+        return JSONResponse(
+            {"error": {"message": "injected error", "type": "server_error", "code": status}},
+            status_code=status,
+        )
+    return None
+
+
+# Hashes of prompt prefixes seen so far, mimicking OpenAI's prompt caching:
+# prefixes of at least 1024 tokens, matched in 128-token increments
+_prompt_prefixes: set[int] = set()
+_CACHE_MIN_CHARS = 1024 * 4
+_CACHE_STEP_CHARS = 128 * 4
+
+
+def _cached_tokens(model: str, prompt: str) -> int:
+    cached = 0
+    for end in range(_CACHE_MIN_CHARS, len(prompt) + 1, _CACHE_STEP_CHARS):
+        digest = zlib.crc32(f"{model}\0{prompt[:end]}".encode())
+        if digest in _prompt_prefixes:
+            cached = end // 4
+        else:
+            if len(_prompt_prefixes) > 100_000:
+                _prompt_prefixes.clear()
+            _prompt_prefixes.add(digest)
+    return cached
+
+
+def _usage(prompt: str, completion_tokens: int, model: str = "") -> dict:
+    prompt_tokens = max(1, len(prompt) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": _cached_tokens(model, prompt)},
+    }
+
+
+def _chat_content(system: str) -> str:
+    direct = _rng.random() < settings.direct_ratio
+    if "intent classifier" in system:
+        return json.dumps({"intent": "feature-question", "entities": ["python", "feature flags"]})
+    if "intake assistant" in system:
+        return json.dumps(
+            {
+                "intent": "general" if direct else "feature-question",
+                "entities": [] if direct else ["python", "feature flags"],
+                "route": "direct" if direct else "search",
+                "message": "Hi! How can I help with LaunchDarkly today?" if direct else "",
+            }
+        )
+    if "routing assistant" in system:
+        if direct:
+            return json.dumps({"route": "direct", "message": "Hi! How can I help with LaunchDarkly today?"})
+        return json.dumps({"route": "search", "message": ""})
+    if "search query optimizer" in system:
+        return json.dumps({"query": "python sdk evaluate feature flags"})
+    if "quality judge" in system:
+        return json.dumps({"relevance": 0.9, "faithfulness": 0.85, "pass": True})
+    if "running summary" in system:
+        return "The user is setting up LaunchDarkly feature flags in the Python SDK."
+    return " ".join(_REPLY_WORDS[i % len(_REPLY_WORDS)] for i in range(settings.reply_tokens))
+
+
+def _completion_chunk(chunk_id: str, model: str, delta: dict, finish: str | None = None) -> str:
+    body = {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+app = FastAPI(title="OpenAI stub")
+
+_seen_connections: set[tuple] = set()
+
+
+@app.middleware("http")
+async def connection_setup(request: Request, call_next):
+    peer = request.scope.get("client")
+    if settings.connect_latency_ms and peer and tuple(peer) not in _seen_connections:
+        _seen_connections.add(tuple(peer))
+        await asyncio.sleep(settings.connect_latency_ms / 1000)
+    return await call_next(request)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(_latency(settings.chat_latency_ms))
+    if (error := _error()) is not None:
+        return error
+
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    prompt = "".join(str(m.get("content", "")) for m in messages)
+    content = _chat_content(system)
+    model = body.get("model", "gpt-4o")
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    if not body.get("stream"):
+        return {
+            "id": chunk_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": _usage(prompt, max(1, len(content) // 4), model),
+        }
+
+    words = content.split(" ")
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def stream():
+        yield _completion_chunk(chunk_id, model, {"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            await asyncio.sleep(1 / settings.tokens_per_sec)
+            yield _completion_chunk(chunk_id, model, {"content": word if i == 0 else f" {word}"})
+        yield _completion_chunk(chunk_id, model, {}, "stop")
+        if include_usage:
+            usage_chunk = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": _usage(prompt, len(words), model),
+            }
+            yield f"data: {json.dumps(usage_chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/responses")
+async def responses(request: Request):
+    body = await request.json()
+    await asyncio.sleep(_latency(settings.responses_latency_ms))
+    if (error := _error()) is not None:
+        return error
+
+    text = " ".join(_REPLY_WORDS * 6)
+    annotations = [
+        {"type": "url_citation", "title": title, "url": url, "start_index": 0, "end_index": len(text)}
+        for title, url in _DOC_URLS
+    ]
+    return {
+        "id": f"resp_{uuid.uuid4().hex[:12]}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "status": "completed",
+        "output": [
+            {"type": "web_search_call", "id": f"ws_{uuid.uuid4().hex[:8]}", "status": "completed"},
+            {
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex[:8]}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": annotations}],
+            },
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": body.get("tools", []),
+        "usage": {
+            "input_tokens": 50,
+            "output_tokens": len(text) // 4,
+            "total_tokens": 50 + len(text) // 4,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens_details": {"reasoning_tokens": 0},
+        },
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    await asyncio.sleep(_latency(settings.embeddings_latency_ms))
+    if (error := _error()) is not None:
+        return error
+
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dim = body.get("dimensions") or 1536
+    data = []
+    for i, text in enumerate(inputs):
+        rng = random.Random(zlib.crc32(str(text).encode()))
+        data.append({"object": "embedding", "index": i, "embedding": [rng.gauss(0, 1) for _ in range(dim)]})
+    tokens = sum(len(str(t)) // 4 for t in inputs)
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "text-embedding-3-small"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@app.get("/v1/models")
+async def models():
+    names = ("gpt-4o", "gpt-4o-mini", "text-embedding-3-small")
+    return {"object": "list", "data": [{"id": n, "object": "model", "created": 0, "owned_by": "stub"} for n in names]}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI API stub for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    for field, value in vars(StubSettings()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=float if field != "reply_tokens" else int, default=value)
+    args = parser.parse_args()
+
+    for field in vars(settings):
+        setattr(settings, field, getattr(args, field))
+    if settings.seed is not None:
+        _rng.seed(int(settings.seed))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Minimal in-memory Redis stand-in for trying STATE_BACKEND=redis locally.
+
+Implements only the commands the state store and redis-py's connection
+handshake use (HELLO, GET, GETEX, GETDEL, SET with EX/PX, DEL, EXPIRE, TTL,
+DBSIZE, FLUSHALL, PING, SELECT, and WATCH/UNWATCH/MULTI/EXEC/DISCARD
+transactions); anything else gets an error reply, as a real server would for
+an unknown command. Replies are RESP2, apart from HELLO's map and nulls on
+connections that switched to RESP3.
+
+    python -m bench.stub_redis --port 6390
+    STATE_BACKEND=redis STATE_REDIS_URL=redis://localhost:6390/0 uvicorn app.main:app --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+_data: dict[bytes, tuple[bytes, float | None]] = {}
+# Bumped on every change to a key, so EXEC can tell whether a WATCHed key was touched
+_versions: dict[bytes, int] = {}
+
+
+def _touch(key: bytes) -> None:
+    _versions[key] = _versions.get(key, 0) + 1
+
+
+def _live(key: bytes) -> bytes | None:
+    entry = _data.get(key)
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if expires_at is not None and expires_at <= time.monotonic():
+        del _data[key]
+        _touch(key)
+        return None
+    return value
+
+
+def _bulk(value: bytes | None) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _int(n: int) -> bytes:
+    return b":%d\r\n" % n
+
+
+def _expiry(args: list[bytes]) -> float | None:
+    """Absolute expiry from trailing EX/PX options."""
+    options = [a.upper() for a in args[::2]]
+    for option, amount in zip(options, args[1::2]):
+        if option == b"EX":
+            return time.monotonic() + int(amount)
+        if option == b"PX":
+            return time.monotonic() + int(amount) / 1000
+    return None
+
+
+def _hello(protocol: int) -> bytes:
+    fields = [(b"server", b"$5\r\nredis\r\n"), (b"version", b"$5\r\n7.2.0\r\n"), (b"proto", _int(protocol))]
+    header = b"%%%d\r\n" % len(fields) if protocol == 3 else b"*%d\r\n" % (2 * len(fields))
+    return header + b"".join(_bulk(name) + value for name, value in fields)
+
+
+def execute(command: list[bytes]) -> bytes:
+    name, args = command[0].upper(), command[1:]
+    if name == b"HELLO":
+        return _hello(int(args[0]) if args else 2)
+    if name == b"PING":
+        return b"+PONG\r\n"
+    if name == b"SELECT":
+        return b"+OK\r\n"
+    if name == b"GET":
+        return _bulk(_live(args[0]))
+    if name == b"GETEX":
+        value = _live(args[0])
+        if value is not None and len(args) > 1:
+            _data[args[0]] = (value, _expiry(args[1:]))
+            _touch(args[0])
+        return _bulk(value)
+    if name == b"GETDEL":
+        value = _live(args[0])
+        if value is not None:
+            del _data[args[0]]
+            _touch(args[0])
+        return _bulk(value)
+    if name == b"SET":
+        _data[args[0]] = (args[1], _expiry(args[2:]))
+        _touch(args[0])
+        return b"+OK\r\n"
+    if name == b"DEL":
+        deleted = [key for key in args if _live(key) is not None]
+        for key in deleted:
+            del _data[key]
+            _touch(key)
+        return _int(len(deleted))
+    if name == b"EXPIRE":
+        value = _live(args[0])
+        if value is None:
+            return _int(0)
+        _data[args[0]] = (value, time.monotonic() + int(args[1]))
+        _touch(args[0])
+        return _int(1)
+    if name == b"TTL":
+        if _live(args[0]) is None:
+            return _int(-2)
+        expires_at = _data[args[0]][1]
+        return _int(-1 if expires_at is None else int(expires_at - time.monotonic()))
+    if name == b"DBSIZE":
+        return _int(sum(_live(key) is not None for key in list(_data)))
+    if name == b"FLUSHALL":
+        for key in _data:
+            _touch(key)
+        _data.clear()
+        return b"+OK\r\n"
+    return b"-ERR unknown command '%s'\r\n" % command[0]
+
+
+class Transaction:
+    """A connection's WATCHed key versions and, inside MULTI, its queued commands."""
+
+    def __init__(self):
+        self.watched: dict[bytes, int] = {}
+        self.queued: list[list[bytes]] | None = None
+
+    def execute(self, command: list[bytes]) -> bytes:
+        name = command[0].upper()
+        if name == b"WATCH":
+            if self.queued is not None:
+                return b"-ERR WATCH inside MULTI is not allowed\r\n"
+            for key in command[1:]:
+                _live(key)
+                self.watched.setdefault(key, _versions.get(key, 0))
+            return b"+OK\r\n"
+        if name == b"UNWATCH":
+            self.watched.clear()
+            return b"+OK\r\n"
+        if name == b"MULTI":
+            if self.queued is not None:
+                return b"-ERR MULTI calls can not be nested\r\n"
+            self.queued = []
+            return b"+OK\r\n"
+        if name in (b"EXEC", b"DISCARD"):
+            if self.queued is None:
+                return b"-ERR %s without MULTI\r\n" % name
+            queued, self.queued = self.queued, None
+            watched, self.watched = self.watched, {}
+            if name == b"DISCARD":
+                return b"+OK\r\n"
+            for key in watched:
+                _live(key)  # an expired key counts as changed
+            if any(_versions.get(key, 0) != version for key, version in watched.items()):
+                return b"*-1\r\n"
+            return b"*%d\r\n" % len(queued) + b"".join(execute(c) for c in queued)
+        if self.queued is not None:
+            self.queued.append(command)
+            return b"+QUEUED\r\n"
+        return execute(command)
+
+
+async def _read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, e.g. from redis-cli or telnet
+        return line.split()
+    parts = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        parts.append((await reader.readexactly(size + 2))[:-2])
+    return parts
+
+
+async def _serve_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    resp3 = False
+    transaction = Transaction()
+    try:
+        while (command := await _read_command(reader)) is not None:
+            if not command:
+                continue
+            reply = transaction.execute(command)
+            if command[0].upper() == b"HELLO" and not reply.startswith(b"-"):
+                resp3 = command[1:2] == [b"3"]
+            elif resp3 and reply in (b"$-1\r\n", b"*-1\r\n"):
+                reply = b"_\r\n"
+            writer.write(reply)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    server = await asyncio.start_server(_serve_client, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
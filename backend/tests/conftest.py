@@ -0,0 +1,73 @@
+"""Shared fixtures: the chain run against the in-process OpenAI stub."""
+
+from __future__ import annotations
+
+import dataclasses
+
+import httpx
+import pytest
+from ldclient.client import LDClient
+from ldclient.config import Config
+from ldclient.integrations.test_data import TestData
+from ldai import LDAIClient
+from openai import AsyncOpenAI
+
+from app.config import ai_client, async_openai_client, ld_client, openai_client
+from bench import stub_openai
+
+
+class _NoSyncClient:
+    def __getattr__(self, name):
+        raise AssertionError(f"the sync OpenAI client was used (.{name}) in async execution mode")
+
+
+@pytest.fixture
+def chain_flags(monkeypatch):
+    """Run the chain on LaunchDarkly test data and the bench OpenAI stub, without latency.
+
+    Returns a function setting a flag's value for every context. Every stub
+    chat completion's system prompt is appended to chain_flags.calls.
+    """
+    monkeypatch.setattr(
+        stub_openai,
+        "settings",
+        dataclasses.replace(
+            stub_openai.settings,
+            chat_latency_ms=0,
+            responses_latency_ms=0,
+            embeddings_latency_ms=0,
+            latency_sigma=0,
+            tokens_per_sec=1e6,
+            reply_tokens=24,
+            direct_ratio=0,
+            error_rate=0,
+        ),
+    )
+    calls: list[str] = []
+    chat_content = stub_openai._chat_content
+
+    def record(system: str) -> str:
+        calls.append(system)
+        return chat_content(system)
+
+    monkeypatch.setattr(stub_openai, "_chat_content", record)
+
+    td = TestData.data_source()
+    client = LDClient(Config("test-sdk-key", update_processor_class=td, send_events=False))
+    ld_client.set(client)
+    ai_client.set(LDAIClient(client))
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub_openai.app))
+    async_openai_client.set(AsyncOpenAI(api_key="test", base_url="http://stub/v1", http_client=http_client))
+    openai_client.set(_NoSyncClient())
+
+    def set_flag(key: str, value) -> None:
+        td.update(td.flag(key).value_for_all(value))
+
+    set_flag.calls = calls
+    yield set_flag
+
+    openai_client.set(None)
+    async_openai_client.set(None)
+    ai_client.set(None)
+    ld_client.set(None)
+    client.close()
@@ -0,0 +1,50 @@
+"""Admission tickets on the streaming and batch paths."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.models import BatchItem, ChatRequest, ChatResponse, QualityMetadata
+from app.chain import batch, orchestrator
+from app.chain.admission import AdmissionController
+from app.chain.events import QualityEvent, ResultEvent
+
+
+def _deferred_quality_events(admission: AdmissionController, active: list[int]):
+    async def chain_events(request, history=None, persist=True):
+        yield ResultEvent(ChatResponse(reply="ok", response_id="r-1"))
+        # The deferred judge is still running
+        await asyncio.sleep(0.01)
+        active.append(admission.active)
+        yield QualityEvent("r-1", QualityMetadata(relevance=0.9, faithfulness=0.9))
+
+    return chain_events
+
+
+def test_stream_releases_ticket_at_result(monkeypatch):
+    admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+    active = []
+    monkeypatch.setattr(orchestrator, "chain_events", _deferred_quality_events(admission, active))
+
+    async def run() -> list[bytes]:
+        ticket = await admission.acquire()
+        return [frame async for frame in orchestrator.run_chain_stream(ChatRequest(message="hi"), on_result=ticket.release)]
+
+    frames = asyncio.run(run())
+    assert [f.split(b"\n", 1)[0] for f in frames] == [b"event: result", b"event: quality"]
+    assert active == [0]
+
+
+def test_batch_item_releases_ticket_at_result(monkeypatch):
+    admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+    active = []
+    monkeypatch.setattr(batch, "chain_events", _deferred_quality_events(admission, active))
+
+    async def run() -> list:
+        admit = lambda request: admission.acquire()
+        return [result async for result in batch.run_batch([BatchItem(id="1", message="hi")], 1, admit)]
+
+    (result,) = asyncio.run(run())
+    assert result.response.quality.relevance == 0.9
+    assert active == [0]
+    assert admission.active == 0
@@ -0,0 +1,75 @@
+"""Batch items go through admission control."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.models import BatchItem, ChatResponse
+from app.chain import batch
+from app.chain.admission import AdmissionController
+from app.chain.events import ResultEvent
+
+
+def _items(n: int) -> list[BatchItem]:
+    return [BatchItem(id=str(i), message=f"question {i}") for i in range(n)]
+
+
+def test_batch_items_hold_admission_tickets(monkeypatch):
+    admission = AdmissionController(max_concurrent=2, max_queue=16, queue_timeout=5)
+    peak = 0
+
+    async def chain_events(request, persist=True):
+        nonlocal peak
+        peak = max(peak, admission.active)
+        await asyncio.sleep(0.01)
+        yield ResultEvent(ChatResponse(reply="ok", response_id=request.session_id))
+
+    monkeypatch.setattr(batch, "chain_events", chain_events)
+
+    async def run() -> list:
+        admit = lambda request: admission.acquire()
+        return [result async for result in batch.run_batch(_items(6), 8, admit)]
+
+    results = asyncio.run(run())
+    assert [r.error for r in results] == [None] * 6
+    assert peak == 2
+    assert admission.active == 0
+    assert admission.admitted == 6
+
+
+def test_rejected_batch_item_is_an_error_result(monkeypatch):
+    admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+
+    async def chain_events(request, persist=True):
+        await asyncio.sleep(0.01)
+        yield ResultEvent(ChatResponse(reply="ok", response_id=request.session_id))
+
+    monkeypatch.setattr(batch, "chain_events", chain_events)
+
+    async def run() -> list:
+        admit = lambda request: admission.acquire()
+        return [result async for result in batch.run_batch(_items(2), 2, admit)]
+
+    results = asyncio.run(run())
+    assert sorted(r.error is None for r in results) == [False, True]
+    assert any(r.error and r.error.startswith("Rejected: ") for r in results)
+    assert admission.active == 0
+
+
+def test_items_without_a_session_are_not_persisted(monkeypatch):
+    persisted = {}
+
+    async def chain_events(request, persist=True):
+        persisted[request.message] = (request.session_id, persist)
+        yield ResultEvent(ChatResponse(reply="ok"))
+
+    monkeypatch.setattr(batch, "chain_events", chain_events)
+    items = [BatchItem(id="1", message="fresh"), BatchItem(id="2", message="ongoing", session_id="s-1")]
+
+    async def run() -> list:
+        return [result async for result in batch.run_batch(items, 2)]
+
+    asyncio.run(run())
+    assert persisted["fresh"][0].startswith("batch-")
+    assert persisted["fresh"][1] is False
+    assert persisted["ongoing"] == ("s-1", True)
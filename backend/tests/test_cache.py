@@ -0,0 +1,55 @@
+"""Retrieval cache tiers."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.chain.cache import SqliteCache
+from app.chain.metrics import registry
+from app.chain.retrieval import RetrievalCache
+
+
+def test_sqlite_cache_purges_expired_entries_on_write(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"), "t", ttl=0.01, purge_every=4)
+    for i in range(3):
+        cache.put(f"k{i}", i)
+    time.sleep(0.02)
+    cache.put("k3", 3)
+
+    assert cache.expirations == 3
+    assert cache._conn.execute("SELECT key FROM t").fetchall() == [("k3",)]
+
+
+def test_async_retrieval_cache_reads_through_sqlite(tmp_path):
+    path = str(tmp_path / "cache.db")
+    documents = [{"title": "Flags", "url": "https://docs.launchdarkly.com/flags", "content": "..."}]
+
+    async def run():
+        await RetrievalCache(10, 60, path).aput("How do I create a flag?", documents)
+        # A fresh process: empty memory tier, same SQLite file
+        cache = RetrievalCache(10, 60, path)
+        return cache, await cache.aget("how do i create a flag"), await cache.aget("how do i create a flag")
+
+    cache, first, second = asyncio.run(run())
+    assert first == second == documents
+    assert cache.stats()["sqlite_hits"] == 1
+    assert cache.stats()["hits"] == 1
+    rendered = registry.render()
+    assert 'chain_retrieval_cache_lookups_total{result="sqlite"}' in rendered
+    assert 'chain_retrieval_cache_lookups_total{result="memory"}' in rendered
+
+
+def test_promoted_disk_hit_keeps_its_remaining_ttl(tmp_path):
+    path = str(tmp_path / "cache.db")
+    documents = [{"title": "Flags", "url": "https://docs.launchdarkly.com/flags", "content": "..."}]
+    RetrievalCache(10, 0.2, path).put("flags", documents)
+    time.sleep(0.15)
+
+    cache = RetrievalCache(10, 0.2, path)
+    assert cache.get("flags") == documents
+    time.sleep(0.1)
+    # Expired in memory with the disk row, not 0.2s after the promotion
+    assert cache.memory.get("flags") is None
+    assert cache.get("flags") is None
+    cache.close()
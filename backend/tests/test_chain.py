@@ -0,0 +1,79 @@
+"""The chain executed natively on the async OpenAI client."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.models import ChatRequest
+from app.chain import orchestrator, tracking
+from app.chain.events import ResultEvent, StepEvent
+from bench import stub_openai
+
+
+def _events(*requests: ChatRequest) -> list[list]:
+    async def run(request):
+        return [event async for event in orchestrator.chain_events(request)]
+
+    async def run_all():
+        return await asyncio.gather(*(run(request) for request in requests))
+
+    return asyncio.run(run_all())
+
+
+def test_search_chain_runs_every_step_on_the_async_client(chain_flags):
+    (events,) = _events(ChatRequest(message="How do I evaluate a flag in Python?", session_id="chain-1"))
+
+    done = [e.step for e in events if isinstance(e, StepEvent) and e.status == "done"]
+    assert done == ["intent", "router", "rewrite", "retrieval", "generate", "judge"]
+    result = events[-1]
+    assert isinstance(result, ResultEvent)
+    assert result.response.intent == "feature-question"
+    assert result.response.reply.startswith("To evaluate a feature flag")
+    assert {s["url"] for s in result.response.sources} == {url for _, url in stub_openai._DOC_URLS}
+    # The conftest's sync client raises if any step falls back to it
+    assert len(chain_flags.calls) == 5
+
+
+def test_concurrent_chains_overlap_on_one_event_loop(chain_flags, monkeypatch):
+    monkeypatch.setattr(stub_openai, "settings", dataclasses.replace(stub_openai.settings, chat_latency_ms=100))
+    requests = [ChatRequest(message=f"How do I use flag type {i}?", session_id=f"chain-{i}") for i in range(4)]
+
+    start = time.perf_counter()
+    results = _events(*requests)
+    elapsed = time.perf_counter() - start
+
+    assert all(isinstance(events[-1], ResultEvent) for events in results)
+    # 4 chains x 5 calls x 100 ms would take 2 s if the steps blocked each other
+    assert elapsed < 1.2
+
+
+def test_async_tracker_records_success_and_usage():
+    tracker = MagicMock()
+    usage = SimpleNamespace(total_tokens=30, prompt_tokens=20, completion_tokens=10, prompt_tokens_details=None)
+
+    async def call():
+        return SimpleNamespace(usage=usage)
+
+    asyncio.run(tracking.atrack_openai_metrics(tracker, call))
+    tracker.track_success.assert_called_once()
+    tracker.track_duration.assert_called_once()
+    (tokens,), _ = tracker.track_tokens.call_args
+    assert (tokens.total, tokens.input, tokens.output) == (30, 20, 10)
+
+
+def test_async_tracker_records_errors():
+    tracker = MagicMock()
+
+    async def call():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(tracking.atrack_openai_metrics(tracker, call))
+    tracker.track_error.assert_called_once()
+    tracker.track_success.assert_not_called()
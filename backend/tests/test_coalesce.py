@@ -0,0 +1,133 @@
+"""Single-flight coalescing of identical in-flight work."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.models import ChatRequest
+from app.chain import orchestrator
+from app.chain.coalesce import SingleFlight, flight_key
+from app.chain.events import ResultEvent
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"route": "search"}
+
+    async def run():
+        results = await asyncio.gather(*(flights.call("k", work) for _ in range(5)))
+        # Forgotten once finished: a later call runs again
+        await flights.call("k", work)
+        return results
+
+    results = asyncio.run(run())
+    assert results == [{"route": "search"}] * 5
+    assert len(calls) == 2
+    assert flights.in_flight() == 0
+
+
+def test_cancelled_follower_does_not_cancel_the_shared_call():
+    flights = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flights.call("k", work))
+        follower = asyncio.ensure_future(flights.call("k", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_late_stream_subscriber_replays_every_event():
+    flights = SingleFlight("test")
+    started = []
+
+    async def events():
+        started.append(1)
+        for i in range(3):
+            yield i
+            await asyncio.sleep(0.005)
+
+    async def collect(delay: float):
+        await asyncio.sleep(delay)
+        return [item async for item in flights.stream("k", events)]
+
+    async def run():
+        return await asyncio.gather(collect(0), collect(0.007))
+
+    assert asyncio.run(run()) == [[0, 1, 2], [0, 1, 2]]
+    assert started == [1]
+
+
+def test_stream_is_cancelled_when_the_last_subscriber_leaves():
+    flights = SingleFlight("test")
+
+    async def run():
+        stopped = asyncio.Event()
+
+        async def events():
+            try:
+                yield "first"
+                await asyncio.sleep(10)
+                yield "never"
+            finally:
+                stopped.set()
+
+        subscribers = [flights.stream("k", events) for _ in range(2)]
+        for subscriber in subscribers:
+            assert await anext(subscriber) == "first"
+        await subscribers[0].aclose()
+        await asyncio.sleep(0.01)
+        assert not stopped.is_set()  # one subscriber is still listening
+        await subscribers[1].aclose()
+        await asyncio.wait_for(stopped.wait(), 1)
+        return flights.in_flight()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_stream_error_reaches_every_subscriber():
+    flights = SingleFlight("test")
+
+    async def events():
+        yield 1
+        raise RuntimeError("upstream failed")
+
+    async def collect():
+        return [item async for item in flights.stream("k", events)]
+
+    async def run():
+        return await asyncio.gather(collect(), collect(), return_exceptions=True)
+
+    assert [str(r) for r in asyncio.run(run())] == ["upstream failed", "upstream failed"]
+
+
+def test_flight_key_ignores_dict_order():
+    assert flight_key({"a": 1, "b": 2}, "q") == flight_key({"b": 2, "a": 1}, "q")
+    assert flight_key({"a": 1}, "q") != flight_key({"a": 1}, "r")
+
+
+def test_identical_concurrent_chains_run_once(chain_flags):
+    async def run(session_id: str):
+        request = ChatRequest(message="How do I coalesce two identical questions?", session_id=session_id)
+        return [event async for event in orchestrator.chain_events(request)]
+
+    async def both():
+        return await asyncio.gather(run("coalesce-1"), run("coalesce-2"))
+
+    first, second = asyncio.run(both())
+    assert first[-1].response.reply == second[-1].response.reply
+    # Each subscriber gets its own response id for feedback
+    assert first[-1].response.response_id != second[-1].response.response_id
+    assert isinstance(first[-1], ResultEvent)
+    assert sum("helpful LaunchDarkly support" in system for system in chain_flags.calls) == 1
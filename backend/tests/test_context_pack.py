@@ -0,0 +1,62 @@
+"""Packing retrieved documents into a ranked, token-budgeted context."""
+
+from __future__ import annotations
+
+from app.chain.context_pack import dedupe, pack_context, split_passages
+from app.chain.history import count_tokens
+
+_FILLER = "LaunchDarkly stores flag data and serves it to SDKs. " * 12
+
+
+def _docs() -> list[dict]:
+    return [
+        {"title": "Overview", "url": "https://docs.example.com/overview", "content": _FILLER},
+        {"title": "Segments", "url": "https://docs.example.com/segments",
+         "content": f"{_FILLER}\n\nTo target a segment, add a rule that matches segment membership."},
+        {"title": "Segments again", "url": "https://DOCS.example.com/segments/", "content": "Duplicate page."},
+        {"title": "Citation", "url": "https://docs.example.com/contexts", "content": ""},
+    ]
+
+
+def test_dedupe_drops_repeated_urls_and_content_and_fills_empty_citations():
+    documents = dedupe([
+        {"title": "A", "url": "https://docs.example.com/a", "content": ""},
+        {"title": "A again", "url": "https://docs.example.com/a/", "content": "Body of A."},
+        {"title": "Copy", "url": "https://mirror.example.com/a", "content": "body  of a."},
+    ])
+    assert documents == [{"title": "A", "url": "https://docs.example.com/a", "content": "Body of A."}]
+
+
+def test_passages_rank_against_the_query():
+    packed = pack_context("target a segment rule", _docs())
+
+    assert [d["title"] for d in packed.documents] == ["Overview", "Segments", "Citation"]
+    assert "segment membership" in packed.passages[0].text
+    # The repeated filler paragraph is packed once
+    assert sum(_FILLER.strip() in p.text for p in packed.passages) == 1
+
+
+def test_render_respects_its_budget():
+    packed = pack_context("target a segment rule", _docs())
+
+    for budget in (40, 120, 400):
+        selected, remaining = packed.select(budget)
+        assert sum(p.tokens for p in selected) <= budget
+        assert remaining >= 0
+    small = packed.render(40)
+    assert small.startswith("[Segments](https://docs.example.com/segments)")
+    assert "segment membership" in small
+    assert "stores flag data" not in small
+    # Bare citations are listed once there is room
+    assert "[Citation](https://docs.example.com/contexts)" in packed.render(400)
+    assert packed.render(400) is packed.render(400)
+
+
+def test_empty_context_renders_the_placeholder():
+    assert pack_context("anything", []).render(100, "No documents.") == "No documents."
+
+
+def test_long_paragraphs_split_near_the_passage_size():
+    passages = split_passages("word " * 1000, max_tokens=100)
+    assert len(passages) > 5
+    assert all(count_tokens(p) <= 110 for p in passages)
@@ -0,0 +1,94 @@
+"""Typed chain events, their SSE encoding and gzip streaming."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import zlib
+
+import httpx
+import pytest
+
+from app import main
+from app.models import ChatRequest, ChatResponse, QualityMetadata
+from app.chain import orchestrator
+from app.chain.events import DeltaEvent, QualityEvent, ResultEvent, StepEvent, encode_sse, gzip_stream
+
+
+def _parse(frame: bytes) -> tuple[str, dict]:
+    assert frame.endswith(b"\n\n")
+    name, data = frame[:-2].decode().split("\n")
+    return name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+def test_encode_sse_frames_every_event_type():
+    assert _parse(encode_sse(StepEvent("intent", "running", "Classifying intent..."))) == (
+        "step", {"step": "intent", "status": "running", "label": "Classifying intent..."}
+    )
+    assert _parse(encode_sse(StepEvent("intent", "done", "Intent: billing", {"intent": "billing"})))[1]["detail"] == {
+        "intent": "billing"
+    }
+    assert _parse(encode_sse(DeltaEvent('say "hi"\n'))) == ("delta", {"text": 'say "hi"\n'})
+    name, data = _parse(encode_sse(ResultEvent(ChatResponse(reply="ok", response_id="r-1"))))
+    assert (name, data["reply"], data["response_id"]) == ("result", "ok", "r-1")
+    assert _parse(encode_sse(QualityEvent("r-1", QualityMetadata(relevance=0.5))))[1] == {
+        "response_id": "r-1", "relevance": 0.5, "faithfulness": 0.0, "passed": True, "status": "complete"
+    }
+
+
+def test_repeated_step_frames_are_shared():
+    event = StepEvent("generate", "done", "Response ready")
+    assert encode_sse(event) is encode_sse(StepEvent("generate", "done", "Response ready"))
+
+
+def test_events_are_immutable_and_slotted():
+    event = DeltaEvent("x")
+    with pytest.raises(AttributeError):
+        event.text = "y"
+    assert not hasattr(event, "__dict__")
+
+
+def test_gzip_stream_flushes_every_chunk():
+    chunks = [b"event: delta\ndata: {}\n\n", "event: result\ndata: {}\n\n"]
+
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [part async for part in gzip_stream(source())]
+
+    parts = asyncio.run(run())
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each chunk is decodable as soon as it arrives
+    assert decompressor.decompress(parts[0]) == chunks[0]
+    assert decompressor.decompress(parts[1]) == chunks[1].encode()
+    assert gzip.decompress(b"".join(parts)) == chunks[0] + chunks[1].encode()
+
+
+def test_chat_returns_the_result_without_encoding_sse(chain_flags, monkeypatch):
+    def fail(event):
+        raise AssertionError("/chat must not encode SSE frames")
+
+    monkeypatch.setattr(orchestrator, "encode_sse", fail)
+    response = asyncio.run(orchestrator.run_chain(ChatRequest(message="How do I return a typed result?")))
+    assert isinstance(response, ChatResponse)
+    assert response.reply.startswith("To evaluate a feature flag")
+
+
+def test_stream_endpoint_gzips_when_accepted(chain_flags, monkeypatch):
+    monkeypatch.setattr(main, "RESPONSE_GZIP", True)
+
+    async def run() -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://app") as client:
+            return await client.post(
+                "/chat/stream",
+                json={"message": "How do I gzip a stream?", "session_id": "gzip-1"},
+                headers={"Accept-Encoding": "gzip"},
+            )
+
+    response = asyncio.run(run())
+    assert response.headers["content-encoding"] == "gzip"
+    # httpx decodes the body transparently
+    assert "event: result" in response.text
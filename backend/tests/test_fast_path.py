@@ -0,0 +1,43 @@
+"""Fast-path classifier: canned phrases only, never real questions."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.chain.fast_path import FastPathClassifier, phrase_vocabulary, seed_examples
+from app.train_fast_path import train
+
+
+@pytest.fixture(scope="module")
+def model() -> FastPathClassifier:
+    return train(seed_examples(), dim=4096, epochs=400, learning_rate=2.0, l2=1e-4, max_words=12)
+
+
+@pytest.mark.parametrize(
+    "message, label",
+    [("hi", "greeting"), ("thanks!", "thanks"), ("ok thanks", "thanks"), ("bye", "goodbye"), ("help me", "clarify")],
+)
+def test_canned_phrases_take_the_fast_path(model, message, label):
+    result = model.classify(message, 0.8)
+    assert result is not None and result.label == label
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "no thanks, that did not work",
+        "hello?? flags not evaluating",
+        "thanks, my SDK crashes",
+        "hi, where are the audit logs?",
+        "bye, and sorry but the flag is still off",
+    ],
+)
+def test_messages_with_a_problem_take_the_llm_path(model, message):
+    assert model.classify(message, 0.0) is None
+
+
+def test_vocabulary_round_trips(model, tmp_path):
+    model.save(tmp_path / "fast_path.npz")
+    loaded = FastPathClassifier.load(tmp_path / "fast_path.npz")
+    assert loaded.vocabulary == model.vocabulary == phrase_vocabulary(seed_examples())
+    assert "thanks" in loaded.vocabulary and "evaluating" not in loaded.vocabulary
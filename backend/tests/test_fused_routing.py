@@ -0,0 +1,55 @@
+"""Fused intent classification and routing (chain-fused-intent-routing)."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from types import SimpleNamespace
+
+from app.models import ChatRequest
+from app.chain import classify_route, orchestrator
+from app.chain.events import StepEvent
+from bench import stub_openai
+
+
+def _run(message: str) -> list:
+    async def run():
+        return [event async for event in orchestrator.chain_events(ChatRequest(message=message, session_id="fused"))]
+
+    return asyncio.run(run())
+
+
+def _roles(calls: list[str]) -> list[str]:
+    roles = ("intent classifier", "routing assistant", "intake assistant", "search query optimizer")
+    return [next((role for role in roles if role in system), "other") for system in calls]
+
+
+def test_one_call_replaces_intent_and_router(chain_flags):
+    chain_flags(orchestrator.FUSED_ROUTING_FLAG, True)
+    events = _run("How do I target a segment with a fused route?")
+
+    assert _roles(chain_flags.calls)[:2] == ["intake assistant", "search query optimizer"]
+    assert "intent classifier" not in _roles(chain_flags.calls)
+    assert "routing assistant" not in _roles(chain_flags.calls)
+    intent_done = next(e for e in events if isinstance(e, StepEvent) and e.step == "intent" and e.status == "done")
+    assert intent_done.detail == {"intent": "feature-question", "entities": ["python", "feature flags"]}
+    assert events[-1].response.intent == "feature-question"
+
+
+def test_fused_direct_route_answers_without_search(chain_flags, monkeypatch):
+    monkeypatch.setattr(stub_openai, "settings", dataclasses.replace(stub_openai.settings, direct_ratio=1))
+    chain_flags(orchestrator.FUSED_ROUTING_FLAG, True)
+    events = _run("Hello there, fused router!")
+
+    assert _roles(chain_flags.calls) == ["intake assistant"]
+    assert events[-1].response.reply == "Hi! How can I help with LaunchDarkly today?"
+
+
+def test_parse_fills_missing_fields_and_survives_bad_json():
+    def result(content: str):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    assert classify_route._parse(result('{"intent": "billing", "route": "direct", "message": "Hi"}')) == {
+        "intent": "billing", "entities": [], "route": "direct", "message": "Hi"
+    }
+    assert classify_route._parse(result("not json")) == classify_route._FALLBACK
@@ -0,0 +1,56 @@
+"""Rolling history summaries across session-store trims."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.chain.history import HistoryManager
+from app.chain.state import SessionStore, Turn
+
+
+def _turns(i: int) -> tuple[Turn, Turn]:
+    return Turn("user", f"question {i} " + "word " * 40), Turn("assistant", f"answer {i} " + "word " * 40)
+
+
+def test_summary_survives_store_trims():
+    sessions = SessionStore(ttl=600, max_entries=10, max_bytes=0, max_turns=20)
+    manager = HistoryManager(ttl=600, max_entries=10, trigger_tokens=300, keep_recent_tokens=120)
+    folds = []
+
+    for i in range(40):
+        user, assistant = _turns(i)
+        history, start = asyncio.run(sessions.history("s"))
+        prepared = manager.prepare("s", history, start)
+        if folds:
+            # The cached summary is always used, even after its turns were trimmed
+            assert prepared[0].get("summary")
+        asyncio.run(sessions.append("s", user, assistant))
+
+        pending = manager.pending_fold("s", [*history, user.as_dict(), assistant.as_dict()], start)
+        if pending is not None:
+            previous, turns, covered = pending
+            folds.append((previous, covered))
+            text = " ".join(filter(None, [previous, *(t["content"].split()[1] for t in turns)]))
+            manager.update("s", [*history, user.as_dict(), assistant.as_dict()], text, covered, start)
+
+    history, start = asyncio.run(sessions.history("s"))
+    assert start == 60  # 80 messages, 20 kept
+    # Every fold after the first extends the previous summary, and coverage only grows
+    assert all(previous for previous, _ in folds[1:])
+    coverage = [covered for _, covered in folds]
+    assert coverage == sorted(set(coverage))
+    assert coverage[-1] > 60
+    # The oldest, long-trimmed turns are still in the summary
+    summary = manager.prepare("s", history, start)[0]["content"]
+    assert summary.endswith(" ".join(str(n) for n in range(coverage[-1] // 2) for _ in "qa"))
+
+
+def test_replaced_history_invalidates_summary():
+    manager = HistoryManager(ttl=600, max_entries=10, trigger_tokens=10, keep_recent_tokens=5)
+    history = [t.as_dict() for i in range(3) for t in _turns(i)]
+    _, _, covered = manager.pending_fold("s", history)
+    manager.update("s", history, "summary", covered)
+    assert manager.prepare("s", history)[0].get("summary")
+
+    replaced = [{"role": m["role"], "content": m["content"].upper()} for m in history]
+    assert manager.prepare("s", replaced) == replaced
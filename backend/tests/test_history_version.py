@@ -0,0 +1,73 @@
+"""Follow-up messages that send a history_version instead of the full history."""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from app.models import ChatMessage, ChatRequest
+from app.chain import orchestrator
+from app.chain.state import Turn, history_version
+
+
+def _store(session_id: str) -> list[dict]:
+    user, assistant = Turn("user", "How do I create a flag?"), Turn("assistant", "Use the dashboard.")
+    asyncio.run(orchestrator._sessions.append(session_id, user, assistant))
+    return [user.as_dict(), assistant.as_dict()]
+
+
+def test_matching_version_uses_the_stored_history():
+    stored = _store("version-match")
+    req = ChatRequest(message="And delete one?", session_id="version-match", history_version=history_version(stored))
+    assert asyncio.run(orchestrator.resolve_history(req)) == (stored, 0)
+
+
+def test_mismatched_version_requires_a_resync():
+    stored = _store("version-mismatch")
+    stale = history_version(stored[:1])
+    req = ChatRequest(message="And delete one?", session_id="version-mismatch", history_version=stale)
+    with pytest.raises(orchestrator.ResyncRequired):
+        asyncio.run(orchestrator.resolve_history(req))
+    # An expired session is out of sync too
+    req = ChatRequest(message="And delete one?", session_id="version-expired", history_version=history_version(stored))
+    with pytest.raises(orchestrator.ResyncRequired):
+        asyncio.run(orchestrator.resolve_history(req))
+
+
+def test_full_history_wins_over_a_version():
+    _store("version-full")
+    history = [ChatMessage(role="user", content="Hi"), ChatMessage(role="assistant", content="Hello!")]
+    req = ChatRequest(message="Thanks", session_id="version-full", conversation_history=history, history_version="stale")
+    assert asyncio.run(orchestrator.resolve_history(req)) == (
+        [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello!"}],
+        0,
+    )
+
+
+def test_chat_follow_up_with_version_and_resync(chain_flags):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            first = await client.post("/chat", json={"message": "How do I version a flag?", "session_id": "version-chat"})
+            version = first.json()["history_version"]
+            follow_up = await client.post(
+                "/chat",
+                json={"message": "And how do I roll it back?", "session_id": "version-chat", "history_version": version},
+            )
+            # The first version is stale once the follow-up is stored
+            stale = await client.post(
+                "/chat",
+                json={"message": "And then?", "session_id": "version-chat", "history_version": version},
+            )
+            return version, follow_up, stale
+
+    version, follow_up, stale = asyncio.run(run())
+    assert version
+    assert follow_up.status_code == 200
+    assert follow_up.json()["history_version"] not in ("", version)
+    history, _ = asyncio.run(orchestrator._sessions.history("version-chat"))
+    assert [m["content"] for m in history[::2]] == ["How do I version a flag?", "And how do I roll it back?"]
+    assert stale.status_code == 409
+    assert stale.json()["detail"]["code"] == "resync_required"
@@ -0,0 +1,68 @@
+"""Local docs index search."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from app.chain.local_index import LocalIndex, build_index, chunk_text
+
+
+def test_asearch_embeds_the_query_asynchronously(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "flags.md").write_text("# Feature flags\n\nCreate a feature flag from the Flags page.\n")
+    (docs / "sdk.md").write_text("# Python SDK\n\nInitialize the Python SDK with your SDK key.\n")
+    build_index(docs, tmp_path / "index", "https://docs.example.com", embedder_name="hashing")
+    index = LocalIndex(tmp_path / "index")
+
+    calls = []
+    embed = index.embedder.embed
+
+    async def aembed(texts: list[str]) -> np.ndarray:
+        calls.append(texts)
+        return embed(texts)
+
+    index.embedder.embed = None  # the sync path must not be used
+    index.embedder.aembed = aembed
+    results = asyncio.run(index.asearch("python sdk key", k=1))
+
+    assert calls == [["python sdk key"]]
+    assert [r["title"] for r in results] == ["Python SDK"]
+    index.close()
+
+
+def test_index_tables_round_trip(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "flags.md").write_text("# Feature flags\n\n" + "Create a feature flag. " * 60)
+    (docs / "résumé.md").write_text("# Contexts\n\nContexts describe the user or device évaluating a flag.\n")
+    build_index(docs, tmp_path / "index", "https://docs.example.com", max_words=50)
+    index = LocalIndex(tmp_path / "index")
+
+    assert not (tmp_path / "index" / "vocab.json").exists()
+    assert index.vocab.index("évaluating") is not None
+    assert index.vocab.index("missing") is None
+    assert [r["url"] for r in index.search("évaluating contexts", k=1)] == ["https://docs.example.com/résumé"]
+    flags = index.search("create", k=10)
+    assert len(flags) > 1 and {r["title"] for r in flags} == {"Feature flags"}
+    index.close()
+
+
+def test_older_index_format_is_rejected(tmp_path):
+    (tmp_path / "meta.json").write_text(json.dumps({"n_chunks": 0, "n_terms": 0}))
+    with pytest.raises(ValueError, match="rebuild"):
+        LocalIndex(tmp_path)
+
+
+def test_chunk_text_rejects_overlap_not_below_max_words():
+    with pytest.raises(ValueError):
+        chunk_text("one two three", max_words=3, overlap=3)
+    with pytest.raises(ValueError):
+        chunk_text("one two three", max_words=0, overlap=0)
+    assert chunk_text("one two three four five", max_words=2, overlap=1) == [
+        "one two", "two three", "three four", "four five"
+    ]
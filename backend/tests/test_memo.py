@@ -0,0 +1,77 @@
+"""Memoized temperature-0 chain steps."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from app.models import ChatRequest
+from app.chain import orchestrator
+from app.chain.memo import StepMemo
+
+
+def _config(version: str = "v1:1"):
+    return SimpleNamespace(key="ld-bot-intent-classifier", version=version)
+
+
+def _request(content: str = "How do I create a flag?", temperature: float = 0) -> dict:
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}], "temperature": temperature}
+
+
+def test_identical_requests_call_once_and_get_copies():
+    memo = StepMemo("intent", ttl=60, max_entries=10)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {"intent": "feature-question", "entities": ["flags"]}
+
+    first = memo.call(_config(), _request(), fn)
+    first["entities"].append("mutated")
+    second = memo.call(_config(), _request(), fn)
+
+    assert len(calls) == 1
+    assert second == {"intent": "feature-question", "entities": ["flags"]}
+
+
+def test_config_version_prompt_and_temperature_change_the_key():
+    memo = StepMemo("intent", ttl=60, max_entries=10)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        return {"intent": "general"}
+
+    async def run():
+        await memo.acall(_config(), _request(), fn)
+        await memo.acall(_config("v1:2"), _request(), fn)
+        await memo.acall(_config(), _request("How do I delete a flag?"), fn)
+        await memo.acall(_config(), _request(temperature=0.7), fn)
+        await memo.acall(_config(), _request(temperature=0.7), fn)
+
+    asyncio.run(run())
+    assert len(calls) == 5
+    assert memo.key(_config(), _request(temperature=0.7)) is None
+
+
+def test_disabled_memo_never_caches():
+    memo = StepMemo("intent", ttl=0, max_entries=10)
+    assert memo.key(_config(), _request()) is None
+
+
+def test_repeated_question_skips_the_deterministic_steps(chain_flags):
+    async def run(session_id: str):
+        request = ChatRequest(message="How do I memoize a flag lookup?", session_id=session_id)
+        return [event async for event in orchestrator.chain_events(request)]
+
+    asyncio.run(run("memo-1"))
+    first = list(chain_flags.calls)
+    chain_flags.calls.clear()
+    asyncio.run(run("memo-2"))
+
+    assert any("intent classifier" in system for system in first)
+    # Intent, router and rewriter are memoized; generation and judging run again
+    assert not any(
+        role in system for system in chain_flags.calls for role in ("intent classifier", "routing assistant", "search query optimizer")
+    )
+    assert any("quality judge" in system for system in chain_flags.calls)
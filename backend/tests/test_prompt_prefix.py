@@ -0,0 +1,79 @@
+"""With the prefix layout, the generator's system prompt stays byte-identical across requests."""
+
+from __future__ import annotations
+
+import pytest
+from ldclient.client import LDClient
+from ldclient.config import Config
+from ldclient.context import Context
+from ldai import LDAIClient
+
+from app.config import ai_client, ld_client
+from app.chain import generator, prompts
+from app.chain.context_pack import pack_context
+
+
+@pytest.fixture(scope="module", autouse=True)
+def offline_clients():
+    client = LDClient(Config("test-sdk-key", offline=True))
+    ld_client.set(client)
+    ai_client.set(LDAIClient(client))
+    yield
+    client.close()
+    ai_client.set(None)
+    ld_client.set(None)
+
+
+@pytest.fixture
+def prefix_layout(monkeypatch):
+    monkeypatch.setattr(prompts, "PROMPT_LAYOUT", "prefix")
+
+
+def _request(message: str, intent: str, docs: list[dict], history: list[dict]) -> dict:
+    config = generator._config(Context.create("prefix-test"))
+    return generator._build_request(config, message, intent, ["flags"], pack_context(message, docs), history)
+
+
+def test_system_prefix_is_stable_across_requests(prefix_layout):
+    first = _request(
+        "How do I create a flag?",
+        "how-to",
+        [{"title": "Creating flags", "url": "https://docs.launchdarkly.com/flags", "content": "Click Create flag."}],
+        [],
+    )
+    second = _request(
+        "Why is my SDK not connecting?",
+        "troubleshooting",
+        [{"title": "SDK connection", "url": "https://docs.launchdarkly.com/sdk", "content": "Check the SDK key."}],
+        [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello! How can I help?"},
+        ],
+    )
+
+    prefix = first["messages"][0]
+    assert prefix["role"] == "system"
+    assert prefix["content"].encode() == second["messages"][0]["content"].encode()
+    assert "Check the SDK key." not in prefix["content"]
+    assert "troubleshooting" not in second["messages"][0]["content"]
+
+
+def test_request_context_follows_history(prefix_layout):
+    history = [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello! How can I help?"},
+    ]
+    messages = _request("How do I create a flag?", "how-to", [], history)["messages"]
+
+    assert messages[1:3] == history
+    assert messages[-2]["content"].startswith("Request context")
+    assert "how-to" in messages[-2]["content"]
+    assert messages[-1] == {"role": "user", "content": "How do I create a flag?"}
+
+
+def test_variables_are_inline_by_default():
+    messages = _request("How do I create a flag?", "how-to", [], [])["messages"]
+
+    assert len(messages) == 2
+    assert "how-to" in messages[0]["content"]
+    assert not any(m["content"].startswith("Request context") for m in messages)
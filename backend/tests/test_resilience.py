@@ -0,0 +1,32 @@
+"""Hedged step calls."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.chain import resilience
+
+
+def test_cancelled_hedged_call_cancels_its_request(monkeypatch):
+    monkeypatch.setattr(resilience.latencies, "threshold", lambda step: 1.0)
+    started, cancelled = [], []
+
+    async def call():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        try:
+            await asyncio.wait_for(resilience._hedged("router", call), 0.05)
+        except TimeoutError:
+            pass
+        await asyncio.sleep(0.01)
+        # Checked before asyncio.run() cancels leftover tasks itself
+        assert started == [1]
+        assert cancelled == [1]
+
+    asyncio.run(run())
@@ -0,0 +1,21 @@
+"""Semantic answer cache."""
+
+from __future__ import annotations
+
+from app.chain.embeddings import HashingEmbedder
+from app.chain.semantic_cache import CachedAnswer, SemanticCache
+
+
+def test_version_codes_are_reclaimed():
+    cache = SemanticCache(HashingEmbedder(), capacity=2, threshold=0.9, ttl=60)
+
+    for n in range(20):
+        _, vector = cache.lookup(f"question {n}", "how-to", f"v{n}")
+        cache.store(vector, f"v{n}", CachedAnswer(f"answer {n}", [], {}))
+
+    # Only the versions still held by a slot keep a code
+    assert set(cache._version_codes) == {"v18", "v19"}
+    assert sorted(cache._version_codes.values()) == [0, 1]
+    answer, _ = cache.lookup("question 19", "how-to", "v19")
+    assert answer.reply == "answer 19"
+    assert cache.lookup("question 17", "how-to", "v17")[0] is None
@@ -0,0 +1,35 @@
+"""Per-request AI Config snapshot."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from ldclient.context import Context
+
+from app.chain import generator, intent, snapshot
+from app.chain.snapshot import ChainConfigSnapshot
+
+
+def test_configs_are_evaluated_lazily_once(monkeypatch):
+    evaluated = []
+
+    def evaluate(key, default, variable_names, context):
+        evaluated.append(key)
+        return SimpleNamespace(key=key, version=f"{key}:1")
+
+    monkeypatch.setattr(snapshot, "evaluate", evaluate)
+    configs = ChainConfigSnapshot(Context.create("snapshot-test"))
+    assert evaluated == []
+
+    assert configs.step(intent.CONFIG_KEY) is configs.step(intent.CONFIG_KEY)
+    configs.step(generator.CONFIG_KEY)
+    assert evaluated == [intent.CONFIG_KEY, generator.CONFIG_KEY]
+    assert configs.versions(evaluated_only=True) == {
+        intent.CONFIG_KEY: f"{intent.CONFIG_KEY}:1",
+        generator.CONFIG_KEY: f"{generator.CONFIG_KEY}:1",
+    }
+
+    # All versions (e.g. for a coalescing key) evaluate the rest, still once each
+    assert len(configs.versions()) == 7
+    assert sorted(evaluated) == sorted(set(evaluated))
+    assert len(evaluated) == 7
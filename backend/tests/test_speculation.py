@@ -0,0 +1,69 @@
+"""Speculative retrieval alongside intent and routing (chain-speculative-retrieval)."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+
+from app.models import ChatRequest
+from app.chain import orchestrator
+from app.chain.events import StepEvent
+from app.chain.metrics import speculations
+from bench import stub_openai
+
+
+def _run(message: str, session_id: str) -> list:
+    async def run():
+        return [event async for event in orchestrator.chain_events(ChatRequest(message=message, session_id=session_id))]
+
+    return asyncio.run(run())
+
+
+def _count(mode: str, outcome: str) -> float:
+    series = f'chain_speculations_total{{mode="{mode}",outcome="{outcome}"}} '
+    return next((float(line.removeprefix(series)) for line in speculations.render() if line.startswith(series)), 0.0)
+
+
+def _query(events: list) -> str:
+    done = next(e for e in events if isinstance(e, StepEvent) and e.step == "rewrite" and e.status == "done")
+    return done.label.removeprefix("Query: ")
+
+
+def test_raw_mode_searches_the_message_without_a_rewrite(chain_flags):
+    chain_flags(orchestrator.SPECULATIVE_RETRIEVAL_FLAG, "raw")
+    used = _count("raw", "used")
+    message = "How do I speculate on a raw flag search?"
+    events = _run(message, "speculate-raw")
+
+    assert _query(events) == message
+    assert not any("search query optimizer" in system for system in chain_flags.calls)
+    assert events[-1].response.sources
+    assert _count("raw", "used") == used + 1
+
+
+def test_rewrite_mode_rewrites_once(chain_flags):
+    chain_flags(orchestrator.SPECULATIVE_RETRIEVAL_FLAG, "rewrite")
+    used = _count("rewrite", "used")
+    events = _run("How do I speculate on a rewritten flag search?", "speculate-rewrite")
+
+    assert _query(events) == "python sdk evaluate feature flags"
+    assert sum("search query optimizer" in system for system in chain_flags.calls) == 1
+    assert _count("rewrite", "used") == used + 1
+
+
+def test_direct_route_discards_the_speculation(chain_flags, monkeypatch):
+    monkeypatch.setattr(stub_openai, "settings", dataclasses.replace(stub_openai.settings, direct_ratio=1))
+    chain_flags(orchestrator.SPECULATIVE_RETRIEVAL_FLAG, "raw")
+    wasted = _count("raw", "wasted_route")
+    events = _run("Hello there, speculative router!", "speculate-direct")
+
+    assert events[-1].response.reply == "Hi! How can I help with LaunchDarkly today?"
+    assert events[-1].response.sources == []
+    assert not any(isinstance(e, StepEvent) and e.step == "rewrite" for e in events)
+    assert _count("raw", "wasted_route") == wasted + 1
+
+
+def test_speculation_is_off_by_default(chain_flags):
+    before = speculations.render()
+    _run("How do I search flags without speculating?", "speculate-off")
+    assert speculations.render() == before
@@ -0,0 +1,125 @@
+"""Session and tracker stores on the shared backends."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+
+import pytest
+
+from app.chain.state import BoundedStore, RedisStore, SqliteStore
+from bench import stub_redis
+
+
+@contextlib.asynccontextmanager
+async def _redis_stores(n: int, ttl: float = 60):
+    """n RedisStores (as if in separate workers) against a fresh stub server."""
+    stub_redis._data.clear()
+    server = await asyncio.start_server(stub_redis._serve_client, "127.0.0.1", 0)
+    url = "redis://127.0.0.1:%d/0" % server.sockets[0].getsockname()[1]
+    stores = [RedisStore("test", url, ttl) for _ in range(n)]
+    try:
+        yield stores
+    finally:
+        for store in stores:
+            await store.close()
+        server.close()
+
+
+@contextlib.asynccontextmanager
+async def _sqlite_stores(n: int, path: str, ttl: float = 60):
+    stores = [SqliteStore("test", path, ttl, max_entries=0) for _ in range(n)]
+    try:
+        yield stores
+    finally:
+        for store in stores:
+            await store.close()
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def shared_stores(request, tmp_path):
+    if request.param == "sqlite":
+        return lambda n: _sqlite_stores(n, str(tmp_path / "state.db"))
+    return _redis_stores
+
+
+def test_pop_returns_a_value_exactly_once(shared_stores):
+    async def run():
+        async with shared_stores(2) as (a, b):
+            await a.set("response-1", {"tracker": 1})
+            return await asyncio.gather(*(store.pop("response-1") for store in (a, b) * 4))
+
+    popped = asyncio.run(run())
+    assert [value for value in popped if value is not None] == [{"tracker": 1}]
+
+
+def test_concurrent_updates_are_not_lost(shared_stores):
+    async def run():
+        async with shared_stores(2) as (a, b):
+            await asyncio.gather(
+                *(store.update("session", lambda turns, i=i: [*(turns or []), i]) for i, store in enumerate((a, b) * 10))
+            )
+            return await a.get("session")
+
+    assert sorted(asyncio.run(run())) == list(range(20))
+
+
+def test_redis_get_refreshes_ttl():
+    async def run():
+        async with _redis_stores(1, ttl=60) as (store,):
+            await store.set("session", [1])
+            await store._client.expire("ld-bot:test:session", 5)
+            await store.get("session")
+            return await store._client.ttl("ld-bot:test:session")
+
+    assert asyncio.run(run()) > 5
+
+
+def test_sqlite_get_refreshes_ttl(tmp_path):
+    async def run():
+        async with _sqlite_stores(1, str(tmp_path / "state.db"), ttl=0.2) as (store,):
+            await store.set("session", [1])
+            for _ in range(3):
+                await asyncio.sleep(0.1)
+                assert await store.get("session") == [1]
+            await asyncio.sleep(0.25)
+            return await store.get("session")
+
+    assert asyncio.run(run()) is None
+
+
+def test_sqlite_store_evicts_least_recently_read_beyond_max_entries(tmp_path):
+    store = SqliteStore("test", str(tmp_path / "state.db"), 60, max_entries=3, purge_every=1)
+
+    async def run():
+        for key in ("a", "b", "c"):
+            await store.set(key, key)
+            time.sleep(0.001)
+        await store.get("a")
+        await store.set("d", "d")
+        return [await store.get(key) for key in ("a", "b", "c", "d")], await store.stats()
+
+    values, stats = asyncio.run(run())
+    assert values == ["a", None, "c", "d"]
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+
+
+def test_bounded_store_evicts_by_entries_and_bytes():
+    store = BoundedStore("test", 60, max_entries=3, max_bytes=10, sizeof=len)
+
+    async def run():
+        for key in ("a", "b", "c"):
+            await store.set(key, "xx")
+        await store.get("a")
+        await store.set("d", "xx")
+        after_entries = [await store.get(key) for key in ("a", "b", "c", "d")]
+        await store.set("e", "xxxxxx")
+        return after_entries, [await store.get(key) for key in ("a", "c", "d", "e")], await store.stats()
+
+    after_entries, after_bytes, stats = asyncio.run(run())
+    assert after_entries == ["xx", None, "xx", "xx"]
+    # 2 + 2 + 6 fits in 10 bytes only once the least recently read entry is gone
+    assert after_bytes == [None, "xx", "xx", "xxxxxx"]
+    assert stats["evictions"] == 2
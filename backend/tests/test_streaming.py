@@ -0,0 +1,80 @@
+"""Generator tokens streamed as delta events and SSE frames."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import httpx
+
+from app.main import app
+from app.models import ChatRequest
+from app.chain import orchestrator, tracking
+from app.chain.events import DeltaEvent, ResultEvent
+
+
+def _chunk(content: str | None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def test_stream_endpoint_sends_deltas_before_the_result(chain_flags):
+    async def run() -> str:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            response = await client.post(
+                "/chat/stream", json={"message": "How do I stream a flag answer?", "session_id": "stream-1"}
+            )
+            assert response.headers["content-type"].startswith("text/event-stream")
+            return response.text
+
+    frames = [frame.split("\n", 1) for frame in asyncio.run(run()).strip().split("\n\n")]
+    names = [name.removeprefix("event: ") for name, _ in frames]
+    deltas = [json.loads(data.removeprefix("data: "))["text"] for name, data in frames if name == "event: delta"]
+    result = json.loads(frames[names.index("result")][1].removeprefix("data: "))
+
+    assert len(deltas) > 1
+    assert names.index("delta") < names.index("result")
+    assert "".join(deltas) == result["reply"]
+
+
+def test_chain_deltas_add_up_to_the_reply(chain_flags):
+    async def run():
+        request = ChatRequest(message="How do I stream a second flag answer?", session_id="stream-2")
+        return [event async for event in orchestrator.chain_events(request)]
+
+    events = asyncio.run(run())
+    deltas = [e.text for e in events if isinstance(e, DeltaEvent)]
+    assert len(deltas) > 1
+    assert "".join(deltas) == next(e for e in events if isinstance(e, ResultEvent)).response.reply
+
+
+def test_stream_tracking_records_first_token_and_final_usage():
+    tracker = MagicMock()
+    usage = SimpleNamespace(total_tokens=12, prompt_tokens=10, completion_tokens=2, prompt_tokens_details=None)
+    stream = MagicMock()
+    chunks = [_chunk(""), _chunk("Hello"), _chunk(" world"), _chunk(None, usage)]
+
+    async def iterate():
+        for chunk in chunks:
+            yield chunk
+
+    async def close():
+        stream.closed = True
+
+    stream.__aiter__ = lambda self: iterate()
+    stream.close = close
+
+    async def create():
+        return stream
+
+    async def run():
+        return [chunk async for chunk in tracking.atrack_openai_stream(tracker, create)]
+
+    assert len(asyncio.run(run())) == 4
+    tracker.track_time_to_first_token.assert_called_once()
+    tracker.track_success.assert_called_once()
+    (tokens,), _ = tracker.track_tokens.call_args
+    assert (tokens.input, tokens.output) == (10, 2)
+    assert stream.closed
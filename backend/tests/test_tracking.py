@@ -0,0 +1,88 @@
+"""LaunchDarkly tracker helpers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from ldai.tracker import LDAIConfigTracker
+from ldclient.context import Context
+
+from app.config import ld_client
+from app.chain import tracking
+from app.chain.state import SqliteStore
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    ld_client.set(client)
+    yield client
+    ld_client.set(None)
+
+
+def _tracker(client) -> LDAIConfigTracker:
+    return LDAIConfigTracker(client, "v1", "ld-bot-response-generator", 3, "gpt-4o", "openai", Context.create("user-1"))
+
+
+def _usage(cached: int):
+    return SimpleNamespace(
+        total_tokens=1500,
+        prompt_tokens=1400,
+        completion_tokens=100,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached),
+    )
+
+
+def test_cached_tokens_are_tracked_with_config_data(client):
+    tracking._record_usage(_tracker(client), _usage(1024))
+
+    client.track.assert_called_once()
+    event, context, data, value = client.track.call_args.args
+    assert event == tracking.CACHED_TOKENS_METRIC
+    assert context.key == "user-1"
+    assert data == {
+        "variationKey": "v1",
+        "configKey": "ld-bot-response-generator",
+        "version": 3,
+        "modelName": "gpt-4o",
+        "providerName": "openai",
+    }
+    assert value == 1024
+
+
+def test_config_key_and_version(client):
+    tracker = _tracker(client)
+    assert tracking.config_key(tracker) == "ld-bot-response-generator"
+    assert tracking.config_version(SimpleNamespace(tracker=tracker)) == "v1:3"
+
+
+def test_serialize_restore_round_trip(client):
+    tracker = tracking.restore_tracker(json.loads(json.dumps(tracking.serialize_tracker(_tracker(client)))))
+
+    assert isinstance(tracker, LDAIConfigTracker)
+    assert tracking.serialize_tracker(tracker) == tracking.serialize_tracker(_tracker(client))
+    tracker.track_success()
+    event, context, data, _ = client.track.call_args.args
+    assert event == "$ld:ai:generation:success"
+    assert context.key == "user-1"
+    assert data["configKey"] == "ld-bot-response-generator"
+
+
+def test_sqlite_store_round_trips_tracker(client, tmp_path):
+    store = SqliteStore(
+        "trackers", str(tmp_path / "state.db"), 60, 100,
+        encode=tracking.serialize_tracker, decode=tracking.restore_tracker,
+    )
+
+    async def scenario():
+        await store.set("response-1", _tracker(client))
+        return await store.pop("response-1"), await store.pop("response-1")
+
+    tracker, again = asyncio.run(scenario())
+    assert tracking.config_version(SimpleNamespace(tracker=tracker)) == "v1:3"
+    assert tracker._context.key == "user-1"
+    assert again is None
@@ -0,0 +1,75 @@
+"""Lazy client construction, startup warm-up and the /ready probe."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import httpx
+
+from app.config import LazyClient
+from app.main import app
+from app.chain import warmup
+
+
+def test_lazy_client_builds_once_on_first_use():
+    built = []
+
+    def factory():
+        built.append(object())
+        return built[-1]
+
+    client = LazyClient("test", factory)
+    assert not client.initialized
+
+    threads = [threading.Thread(target=client.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert client.initialized
+    assert client.get() is built[0]
+
+
+def test_lazy_client_set_injects_and_resets():
+    client = LazyClient("test", lambda: "built")
+    client.set("injected")
+    assert client.initialized
+    assert client.get() == "injected"
+    assert client.upper() == "INJECTED"
+
+    client.set(None)
+    assert not client.initialized
+    assert client.get() == "built"
+
+
+def _ready() -> httpx.Response:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            return await client.get("/ready")
+
+    return asyncio.run(run())
+
+
+def test_ready_waits_for_warm_up(chain_flags, monkeypatch):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState())
+
+    before = _ready()
+    assert before.status_code == 503
+    assert before.json()["warmup"]["status"] == "pending"
+
+    asyncio.run(warmup.warm_up(2))
+
+    assert warmup.state.status == "done", warmup.state.error
+    assert warmup.state.configs == 7
+    assert warmup.state.connections == 2
+    after = _ready()
+    assert after.status_code == 200
+    assert after.json()["ready"] is True
+
+
+def test_ready_when_warm_up_is_skipped(monkeypatch):
+    monkeypatch.setattr(warmup, "state", warmup.WarmupState(status="skipped"))
+    assert _ready().status_code == 200
@@ -7,6 +7,11 @@ export interface QualityMetadata {
   relevance: number;
   faithfulness: number;
   passed: boolean;
+  status: "complete" | "pending" | "skipped";
+}
+
+export interface QualityEvent extends QualityMetadata {
+  response_id: string;
 }
 
 export interface ChatResponse {
@@ -16,6 +21,7 @@ export interface ChatResponse {
   entities: string[];
   quality: QualityMetadata;
   sources: { title: string; url: string }[];
+  history_version: string;
 }
 
 export async function sendFeedback(
@@ -36,21 +42,35 @@ export interface StepEvent {
   detail?: Record<string, unknown>;
 }
 
+export interface DeltaEvent {
+  text: string;
+}
+
 export async function sendMessageStream(
   message: string,
   sessionId: string,
   conversationHistory: ChatMessage[],
-  onStep: (step: StepEvent) => void
+  historyVersion: string | null,
+  onStep: (step: StepEvent) => void,
+  onDelta?: (text: string) => void,
+  onQuality?: (quality: QualityEvent) => void
 ): Promise<ChatResponse> {
-  const res = await fetch("/chat/stream", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({
-      message,
-      session_id: sessionId,
-      conversation_history: conversationHistory,
-    }),
-  });
+  const post = (history: Record<string, unknown>) =>
+    fetch("/chat/stream", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ message, session_id: sessionId, ...history }),
+    });
+
+  // With a version from the previous response, send only the new message;
+  // the server answers 409 if its copy of the history no longer matches.
+  let res =
+    historyVersion !== null
+      ? await post({ history_version: historyVersion })
+      : await post({ conversation_history: conversationHistory });
+  if (res.status === 409 && historyVersion !== null) {
+    res = await post({ conversation_history: conversationHistory });
+  }
 
   if (!res.ok) {
     throw new Error(`Chat request failed: ${res.status}`);
@@ -59,41 +79,55 @@ export async function sendMessageStream(
   const reader = res.body!.getReader();
   const decoder = new TextDecoder();
   let buffer = "";
-  let result: ChatResponse | null = null;
-
-  while (true) {
-    const { done, value } = await reader.read();
-    if (done) break;
-
-    buffer += decoder.decode(value, { stream: true });
-
-    // Parse SSE events from buffer
-    const parts = buffer.split("\n\n");
-    buffer = parts.pop()!; // keep incomplete chunk
-
-    for (const part of parts) {
-      const lines = part.split("\n");
-      let eventType = "";
-      let data = "";
-
-      for (const line of lines) {
-        if (line.startsWith("event: ")) eventType = line.slice(7);
-        else if (line.startsWith("data: ")) data = line.slice(6);
+  let result = null as ChatResponse | null;
+
+  // Read and dispatch events until the result arrives or the stream ends.
+  const pump = async (stopAtResult: boolean): Promise<void> => {
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) return;
+
+      buffer += decoder.decode(value, { stream: true });
+
+      // Parse SSE events from buffer
+      const parts = buffer.split("\n\n");
+      buffer = parts.pop()!; // keep incomplete chunk
+
+      for (const part of parts) {
+        const lines = part.split("\n");
+        let eventType = "";
+        let data = "";
+
+        for (const line of lines) {
+          if (line.startsWith("event: ")) eventType = line.slice(7);
+          else if (line.startsWith("data: ")) data = line.slice(6);
+        }
+
+        if (!eventType || !data) continue;
+
+        if (eventType === "step") {
+          onStep(JSON.parse(data) as StepEvent);
+        } else if (eventType === "delta") {
+          onDelta?.((JSON.parse(data) as DeltaEvent).text);
+        } else if (eventType === "quality") {
+          onQuality?.(JSON.parse(data) as QualityEvent);
+        } else if (eventType === "result") {
+          result = JSON.parse(data) as ChatResponse;
+        }
       }
 
-      if (!eventType || !data) continue;
-
-      if (eventType === "step") {
-        onStep(JSON.parse(data) as StepEvent);
-      } else if (eventType === "result") {
-        result = JSON.parse(data) as ChatResponse;
-      }
+      if (stopAtResult && result) return;
     }
-  }
+  };
+
+  await pump(true);
 
   if (!result) {
     throw new Error("No result received from stream");
   }
 
+  // A deferred quality score may follow the result; keep reading in the background.
+  pump(false).catch(() => undefined);
+
   return result;
 }
@@ -16,14 +16,17 @@ export default function ChatWindow() {
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
   const [steps, setSteps] = useState<StepEvent[]>([]);
+  const [streamingReply, setStreamingReply] = useState("");
   const bottomRef = useRef<HTMLDivElement>(null);
   const sessionId = useRef(
     `session-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`
   );
+  // Server's version of this conversation; null sends the full history
+  const historyVersion = useRef<string | null>(null);
 
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages, steps]);
+  }, [messages, steps, streamingReply]);
 
   const handleSend = async () => {
     const text = input.trim();
@@ -33,6 +36,7 @@ export default function ChatWindow() {
     setMessages((prev) => [...prev, { role: "user", content: text }]);
     setLoading(true);
     setSteps([]);
+    setStreamingReply("");
 
     try {
       const history: ChatMessage[] = messages.map((m) => ({
@@ -44,14 +48,27 @@ export default function ChatWindow() {
         text,
         sessionId.current,
         history,
-        (step) => setSteps((prev) => [...prev, step])
+        historyVersion.current,
+        (step) => setSteps((prev) => [...prev, step]),
+        (text) => setStreamingReply((prev) => prev + text),
+        (quality) =>
+          setMessages((prev) =>
+            prev.map((m) =>
+              m.metadata?.response_id === quality.response_id
+                ? { ...m, metadata: { ...m.metadata, quality } }
+                : m
+            )
+          )
       );
 
+      historyVersion.current = response.history_version || null;
       setMessages((prev) => [
         ...prev,
         { role: "assistant", content: response.reply, metadata: response },
       ]);
     } catch (err) {
+      // The error message joins the local history, so resend it in full next turn
+      historyVersion.current = null;
       setMessages((prev) => [
         ...prev,
         {
@@ -62,6 +79,7 @@ export default function ChatWindow() {
     } finally {
       setLoading(false);
       setSteps([]);
+      setStreamingReply("");
     }
   };
 
@@ -115,6 +133,9 @@ export default function ChatWindow() {
           </div>
         ))}
         {loading && <ChainProgress steps={steps} />}
+        {loading && streamingReply && (
+          <Message role="assistant" content={streamingReply} />
+        )}
         <div ref={bottomRef} />
       </div>
 
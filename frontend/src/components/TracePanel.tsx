@@ -34,11 +34,17 @@ export default function TracePanel({ metadata }: Props) {
         )}
         <div style={{ marginTop: 4 }}>
           <strong>Quality:</strong>{" "}
-          <span style={{ color: quality.passed ? "#16a34a" : "#dc2626" }}>
-            {quality.passed ? "PASS" : "FAIL"}
-          </span>{" "}
-          — relevance: {quality.relevance.toFixed(2)}, faithfulness:{" "}
-          {quality.faithfulness.toFixed(2)}
+          {quality.status === "pending" || quality.status === "skipped" ? (
+            <span style={{ color: "#6b7280" }}>{quality.status}</span>
+          ) : (
+            <>
+              <span style={{ color: quality.passed ? "#16a34a" : "#dc2626" }}>
+                {quality.passed ? "PASS" : "FAIL"}
+              </span>{" "}
+              — relevance: {quality.relevance.toFixed(2)}, faithfulness:{" "}
+              {quality.faithfulness.toFixed(2)}
+            </>
+          )}
         </div>
       </div>
     </details>